@@ -0,0 +1,320 @@
+# route_planner/batch.py
+
+import argparse
+import contextlib
+import csv
+import itertools
+import json
+import os
+import sys
+
+from route_planner.benchmark import RouteBenchmark
+from route_planner.logger import logger
+from route_planner.geocoder import GeoCoder, GeocodeCache, GazetteerBackend
+from route_planner.graph_cache import GraphCache
+from route_planner.poi_cache import POICache
+from route_planner.pipeline import RoutePipeline
+from route_planner.results_store import ResultsStore, TIME_COLUMNS, algorithm_label, algorithm_results
+from route_planner.route_calculator import STATS_COLUMNS
+
+# Execução sem interface gráfica: nenhum módulo deste arquivo importa tkinter ou folium.
+#
+# Uso:
+#     python -m route_planner.batch cenarios.json -o resultados_lote.csv --workers 8
+#
+# Com --store, cada cenário também é gravado no banco de resultados (ver ResultsStore),
+# com o tempo de cada rota; vários lotes podem gravar no mesmo banco ao mesmo tempo.
+#
+# Com --repetitions, cada rota é também medida por RouteBenchmark ('--warmup' execuções
+# de aquecimento e '--repetitions' medidas), e a mediana e o p95 por algoritmo entram nas
+# colunas 'Tempo Mediano ... (s)' e 'Tempo P95 ... (s)' e no banco de resultados:
+#     python -m route_planner.batch cenarios.json --repetitions 20 --warmup 2 --store resultados.sqlite
+#
+# Formato do arquivo de cenários (listas são expandidas em todas as combinações):
+#     {
+#         "defaults": {"algorithms": ["dijkstra", "astar"], "num_destinations": 10},
+#         "scenarios": [
+#             {"address": "Praça XV, Rio de Janeiro", "radius": [1000, 2000],
+#              "cuisine": ["pizza", "burger"], "num_destinations": [5, 20]},
+#             {"origin": [-22.9068, -43.1729], "radius": 1500, "cuisine": "japanese",
+#              "source_file": "dados/rio.osm.pbf", "weight": ["length", "travel_time", "evita_locais"]}
+#         ],
+#         "weight_profiles": {"evita_locais": "travel_time + 15 * (highway == 'residential')"}
+#     }
+#
+# 'weight' escolhe o perfil de peso das arestas ('length', 'travel_time' ou um dos perfis
+# personalizados de 'weight_profiles', definidos por expressões de custo). Perfis com custos
+# negativos (bônus) só podem ser usados com o 'bellman_ford'; os destinos mais próximos são
+# então escolhidos pela distância ('length').
+
+DEFAULT_ALGORITHMS = ['dijkstra', 'astar', 'bellman_ford', 'bidirectional_dijkstra', 'bidirectional_a_star']
+
+# Campos cujo valor pode ser uma lista a expandir
+SWEEP_FIELDS = ('radius', 'cuisine', 'num_destinations', 'weight')
+
+def load_scenarios(path):
+    """
+    Lê o arquivo de cenários e expande as listas de raios, cozinhas, números de destinos
+    e perfis de peso. As expressões de 'weight_profiles' são copiadas para cada cenário.
+
+    Args:
+        path (str): Caminho do arquivo JSON.
+
+    Returns:
+        list: Cenários individuais (dicionários), na ordem do arquivo.
+
+    Raises:
+        ValueError: Se um cenário não tiver origem ('origin' ou 'address'), raio ou cozinha.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        content = json.load(f)
+    if isinstance(content, list):
+        content = {'scenarios': content}
+    defaults = {'algorithms': DEFAULT_ALGORITHMS, 'num_destinations': 10, 'network_type': 'drive',
+                'weight': 'length', 'weight_profiles': content.get('weight_profiles', {})}
+    defaults.update(content.get('defaults', {}))
+
+    expanded = []
+    for position, entry in enumerate(content.get('scenarios', [])):
+        scenario = dict(defaults, **entry)
+        if 'origin' not in scenario and 'address' not in scenario:
+            raise ValueError(f"Cenário {position}: informe 'origin' ou 'address'.")
+        for field in ('radius', 'cuisine'):
+            if field not in scenario:
+                raise ValueError(f"Cenário {position}: campo '{field}' ausente.")
+        values = [scenario[field] if isinstance(scenario[field], list) else [scenario[field]] for field in SWEEP_FIELDS]
+        for combination in itertools.product(*values):
+            single = dict(scenario, **dict(zip(SWEEP_FIELDS, combination)))
+            single['scenario'] = position
+            if single['weight'] not in ('length', 'travel_time') and single['weight'] not in single['weight_profiles']:
+                raise ValueError(f"Cenário {position}: perfil de peso '{single['weight']}' não definido.")
+            expanded.append(single)
+    return expanded
+
+class BatchRunner:
+    """
+    Executa o pipeline GraphHandler -> POIFinder -> RouteCalculator para uma lista de
+    cenários, sem interface gráfica, entregando uma linha de resultado por cenário.
+
+    O grafo de cada (origem, raio) e os POIs de cada cozinha são reaproveitados entre
+    cenários consecutivos que diferem apenas nos parâmetros seguintes, e o cache local
+    de grafos é compartilhado por todas as execuções. Cada área é tratada por um
+    RoutePipeline (grafo e POIs obtidos em paralelo, seleção dos destinos e
+    pré-processamentos), mantido enquanto os cenários não mudam de área.
+
+    Args:
+        cache (GraphCache): Cache de grafos (padrão: o mesmo diretório usado pela interface).
+        workers (int): Número de processos para o cálculo das rotas.
+        poi_cache (POICache): Cache de POIs (padrão: o mesmo diretório usado pela interface).
+        geocoder (GeoCoder): Geocodificador dos endereços (padrão: GeoCoder.default()).
+        store (ResultsStore): Banco onde gravar também os resultados de cada cenário (opcional).
+        repetitions (int): Execuções medidas por rota com RouteBenchmark (None para apenas
+            a medição única de 'calculate_routes').
+        warmup (int): Execuções de aquecimento por rota antes das medidas.
+    """
+    def __init__(self, cache=None, workers=None, poi_cache=None, geocoder=None, store=None, repetitions=None,
+                 warmup=1):
+        self.cache = GraphCache() if cache is None else cache
+        self.poi_cache = POICache() if poi_cache is None else poi_cache
+        self.geocoder = GeoCoder.default() if geocoder is None else geocoder
+        self.workers = workers
+        self.store = store
+        self.repetitions = repetitions
+        self.warmup = warmup
+        self._area_key = None
+        self._pipeline = None
+        self._origins = {}
+
+    def resolve_origin(self, scenario):
+        """
+        Retorna (latitude, longitude, endereço) da origem do cenário, geocodificando o
+        endereço quando necessário (o primeiro resultado é usado).
+        """
+        if 'origin' in scenario:
+            lat, lon = scenario['origin']
+            return float(lat), float(lon), scenario.get('address', '')
+        address = scenario['address']
+        if address not in self._origins:
+            self.geocode([address])
+        return self._origins[address]
+
+    def geocode(self, addresses):
+        """
+        Geocodifica em lote os endereços ainda não resolvidos (o primeiro resultado de cada
+        endereço é usado).
+        """
+        pending = [address for address in dict.fromkeys(addresses) if address not in self._origins]
+        for address, result in self.geocoder.geocode_many(pending).items():
+            if isinstance(result, list):
+                result = result[0]
+            self._origins[address] = result
+
+    def pipeline(self, origin_point, scenario):
+        """
+        Retorna o RoutePipeline com a área do cenário carregada, reaproveitado (com o grafo,
+        os POIs e os pré-processamentos) enquanto origem, raio e malha não mudam.
+        """
+        key = (origin_point, scenario['radius'], scenario['network_type'], scenario.get('source_file'))
+        if key != self._area_key:
+            # Grafo e feições da área obtidos em paralelo; as feições ficam na sessão do POIFinder
+            pipeline = RoutePipeline(graph_cache=self.cache, poi_cache=self.poi_cache, workers=self.workers,
+                                     network_type=scenario['network_type'], source_file=scenario.get('source_file'))
+            pipeline.locate(origin_point=origin_point)
+            pipeline.load_area(scenario['radius'])
+            self._area_key, self._pipeline = key, pipeline
+        return self._pipeline
+
+    def weight_profile(self, handler, scenario):
+        """
+        Garante que o perfil de peso do cenário esteja no grafo compacto, calculando (ou lendo
+        do cache) os perfis personalizados uma vez por grafo. Perfis com custos negativos são
+        aceitos; os algoritmos que não os suportam são rejeitados por RouteCalculator.
+        """
+        weight = scenario['weight']
+        if weight not in handler.compact_graph.weights:
+            handler.weight_profile(weight, scenario['weight_profiles'][weight], allow_negative=True)
+        return weight
+
+    def run_scenario(self, scenario, algorithms):
+        """
+        Executa um cenário.
+
+        Args:
+            scenario (dict): Cenário expandido (ver 'load_scenarios').
+            algorithms (list): Colunas de algoritmos da saída (tempos ausentes ficam vazios).
+
+        Returns:
+            dict: Linha de resultado, com as mesmas colunas de RoutePlannerGUI.save_results
+            acrescidas dos parâmetros do cenário.
+        """
+        row = {'Cenário': scenario['scenario']}
+        origin = self.resolve_origin(scenario)
+        if origin is None:
+            row['Erro'] = 'Endereço não encontrado'
+            return row
+        lat, lon, address = origin
+        pipeline = self.pipeline((lat, lon), scenario)
+        handler = pipeline.graph_handler
+        weight = pipeline.weight = self.weight_profile(handler, scenario)
+
+        row.update({
+            'Endereço de Origem': address,
+            'Latitude': lat,
+            'Longitude': lon,
+            'Raio de Busca (m)': scenario['radius'],
+            'Tipo de Estabelecimento': scenario['cuisine'],
+            'Número de Vértices': handler.G_projected.number_of_nodes(),
+            'Número de Arestas': handler.G_projected.number_of_edges(),
+            'Densidade do Grafo': handler.graph_density,
+            'Perfil de Peso': weight,
+        })
+
+        selected_nodes = pipeline.select_destinations(scenario['cuisine'], scenario['num_destinations'])
+        row['Número de Destinos'] = len(selected_nodes)
+        if selected_nodes:
+            calculator = pipeline.calculate_routes(scenario['algorithms'])
+            results = algorithm_results(calculator, scenario['algorithms'])
+            if self.repetitions:
+                rows = RouteBenchmark(calculator, repetitions=self.repetitions, warmup=self.warmup) \
+                    .run(scenario['algorithms'])
+                for alg, summary in RouteBenchmark.by_algorithm(rows).items():
+                    results[alg].update(median_seconds=summary['median_s'], p95_seconds=summary['p95_s'])
+            for alg in scenario['algorithms']:
+                for field, pattern in time_columns(self.repetitions).items():
+                    row[pattern.format(algorithm_label(alg))] = results[alg].get(field)
+            row.update(calculator.stats_row(scenario['algorithms']))
+            if self.store is not None:
+                self.store.add_run(
+                    {'scenario': scenario['scenario'], 'address': address, 'latitude': lat, 'longitude': lon,
+                     'radius': scenario['radius'], 'cuisine': scenario['cuisine'],
+                     'num_nodes': row['Número de Vértices'], 'num_edges': row['Número de Arestas'],
+                     'density': row['Densidade do Grafo'], 'num_destinations': len(selected_nodes),
+                     'weight': weight},
+                    results, source='batch'
+                )
+
+        for alg in algorithms:
+            for pattern in time_columns(self.repetitions).values():
+                row.setdefault(pattern.format(algorithm_label(alg)), None)
+        return row
+
+    def run(self, scenarios):
+        """
+        Executa os cenários em sequência, gerando as linhas de resultado à medida que ficam
+        prontas. Falhas em um cenário são registradas na coluna 'Erro' sem interromper os demais.
+        """
+        algorithms = list(dict.fromkeys(alg for scenario in scenarios for alg in scenario['algorithms']))
+        self.geocode(scenario['address'] for scenario in scenarios if 'origin' not in scenario)
+        for scenario in scenarios:
+            try:
+                row = self.run_scenario(scenario, algorithms)
+            except Exception as e:
+                logger.exception(f"Erro no cenário {scenario['scenario']}")
+                row = {'Cenário': scenario['scenario'], 'Erro': str(e)}
+            yield row
+
+def time_columns(benchmark=False):
+    # A mediana e o p95 só existem com RouteBenchmark (--repetitions)
+    return dict(TIME_COLUMNS) if benchmark else {'avg_seconds': TIME_COLUMNS['avg_seconds']}
+
+def result_columns(algorithms, benchmark=False):
+    patterns = time_columns(benchmark).values()
+    return [
+        'Cenário', 'Endereço de Origem', 'Latitude', 'Longitude', 'Raio de Busca (m)',
+        'Tipo de Estabelecimento', 'Número de Vértices', 'Número de Arestas', 'Densidade do Grafo',
+        'Número de Destinos', 'Perfil de Peso',
+    ] + [pattern.format(algorithm_label(alg)) for pattern in patterns for alg in algorithms] + [
+        f"{label} {alg.replace('_', ' ').capitalize()}" for alg in algorithms for label in STATS_COLUMNS.values()
+    ] + ['Erro']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Execução em lote dos cenários do planejador de rotas.")
+    parser.add_argument('scenarios', help="Arquivo JSON com os cenários.")
+    parser.add_argument('-o', '--output', default='-', help="Arquivo de saída ('-' para a saída padrão).")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), default='csv', help="Formato das linhas de resultado.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Processos para o cálculo das rotas.")
+    parser.add_argument('--cache-dir', default='cache/grafos', help="Diretório do cache de grafos.")
+    parser.add_argument('--poi-cache-dir', default='cache/pois', help="Diretório do cache de POIs.")
+    parser.add_argument('--geocode-cache', default='cache/geocodificacao.sqlite',
+                        help="Arquivo SQLite do cache de geocodificação.")
+    parser.add_argument('--gazetteer', help="Arquivo JSON de endereços conhecidos, usado no lugar do Nominatim.")
+    parser.add_argument('--store', help="Banco SQLite de resultados onde gravar também cada cenário.")
+    parser.add_argument('--repetitions', type=int,
+                        help="Execuções medidas por rota (RouteBenchmark), com mediana e p95 por algoritmo.")
+    parser.add_argument('--warmup', type=int, default=1, help="Execuções de aquecimento por rota com --repetitions.")
+    args = parser.parse_args(argv)
+
+    scenarios = load_scenarios(args.scenarios)
+    algorithms = list(dict.fromkeys(alg for scenario in scenarios for alg in scenario['algorithms']))
+    backend = GazetteerBackend.from_file(args.gazetteer) if args.gazetteer else None
+    runner = BatchRunner(cache=GraphCache(args.cache_dir), workers=args.workers,
+                         poi_cache=POICache(args.poi_cache_dir),
+                         geocoder=GeoCoder(backend=backend, cache=GeocodeCache(args.geocode_cache)),
+                         store=ResultsStore(args.store) if args.store else None,
+                         repetitions=args.repetitions, warmup=args.warmup)
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'a', newline='', encoding='utf-8')
+    write_header = args.output == '-' or output.tell() == 0
+    writer = None
+    if args.format == 'csv':
+        writer = csv.DictWriter(output, fieldnames=result_columns(algorithms, benchmark=bool(args.repetitions)),
+                                extrasaction='ignore')
+        if write_header:
+            writer.writeheader()
+    try:
+        # As mensagens do pipeline vão para stderr, deixando a saída padrão só com os resultados
+        with contextlib.redirect_stdout(sys.stderr):
+            for row in runner.run(scenarios):
+                if writer is not None:
+                    writer.writerow(row)
+                else:
+                    output.write(json.dumps(row, ensure_ascii=False) + '\n')
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if runner.store is not None:
+            runner.store.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+# route_planner/benchmark.py
+
+import gc
+import time
+from contextlib import contextmanager
+
+import networkx as nx
+import numpy as np
+
+from route_planner.compact_search import SearchStats
+from route_planner.logger import logger
+
+def summarize(samples_ns):
+    """
+    Resume as amostras de tempo de uma consulta.
+
+    Args:
+        samples_ns (list): Tempos em nanossegundos.
+
+    Returns:
+        dict: Mínimo, mediana, percentil 95, média e desvio padrão (amostral), em segundos.
+    """
+    samples = np.asarray(samples_ns, dtype=np.float64) / 1e9
+    return {
+        'min_s': float(samples.min()),
+        'median_s': float(np.median(samples)),
+        'p95_s': float(np.percentile(samples, 95)),
+        'mean_s': float(samples.mean()),
+        'stddev_s': float(samples.std(ddof=1)) if len(samples) > 1 else 0.0,
+    }
+
+class RouteBenchmark:
+    """
+    Medição estatística das consultas de um RouteCalculator, substituindo a amostra
+    única de 'calculate_routes'. Cada par (algoritmo, destino) é executado 'warmup' vezes
+    sem medição (aquecendo caches de heurística e pré-processamentos preguiçosos) e depois
+    'repetitions' vezes com time.perf_counter_ns. Com 'disable_gc', o coletor de lixo é
+    executado antes de cada bloco de repetições e desligado durante as medições.
+
+    Os algoritmos de busca compartilhada (RouteCalculator.SHARED_SEARCH_ALGORITHMS) são
+    medidos como em 'calculate_routes': a cada repetição, uma busca a partir da origem,
+    cujo tempo é dividido entre os destinos, mais a extração de cada rota.
+
+    Args:
+        calculator (RouteCalculator): Calculadora com origem e destinos definidos.
+        repetitions (int): Número de execuções medidas por consulta.
+        warmup (int): Número de execuções de aquecimento por consulta.
+        disable_gc (bool): Desligar o coletor de lixo durante as medições.
+    """
+    def __init__(self, calculator, repetitions=5, warmup=1, disable_gc=True):
+        if repetitions < 1:
+            raise ValueError("O número de repetições deve ser pelo menos 1.")
+        self.calculator = calculator
+        self.repetitions = repetitions
+        self.warmup = warmup
+        self.disable_gc = disable_gc
+
+    def measure(self, alg, target):
+        """
+        Mede uma consulta (algoritmo, destino).
+
+        Returns:
+            dict: Linha de resultado com as estatísticas de tempo e de esforço da busca,
+            ou None se não houver rota.
+        """
+        calculator = self.calculator
+        stats = SearchStats()
+        try:
+            for _ in range(self.warmup):
+                calculator.route(alg, target)
+            # Uma execução extra, fora da medição, só para os contadores de esforço
+            route = calculator.route(alg, target, stats=stats)
+        except (nx.NetworkXNoPath, nx.NetworkXUnbounded):
+            return None
+
+        samples = []
+        with self._measuring():
+            for _ in range(self.repetitions):
+                start = time.perf_counter_ns()
+                calculator.route(alg, target)
+                samples.append(time.perf_counter_ns() - start)
+        return self._row(alg, target, route, stats, samples)
+
+    def measure_shared(self, alg, targets):
+        """
+        Mede as consultas de um algoritmo de busca compartilhada para todos os destinos.
+
+        Returns:
+            list: Linhas de resultado (ver 'measure') dos destinos com rota; os contadores
+            de esforço de cada linha são os da busca compartilhada.
+        """
+        calculator = self.calculator
+        stats = SearchStats()
+        for _ in range(self.warmup):
+            calculator.route_finder(alg)
+        # Uma execução extra, fora da medição, só para os contadores de esforço e as rotas
+        find_route, _ = calculator.route_finder(alg, stats=stats)
+        routes = {}
+        for target in targets:
+            try:
+                routes[target] = find_route(alg, target)
+            except (nx.NetworkXNoPath, nx.NetworkXUnbounded):
+                logger.warning(f"Nenhuma rota encontrada para o nó {target} usando {alg}.")
+
+        samples = {target: [] for target in routes}
+        with self._measuring():
+            for _ in range(self.repetitions):
+                start = time.perf_counter_ns()
+                find_route, _ = calculator.route_finder(alg)
+                shared_ns = (time.perf_counter_ns() - start) / len(targets)
+                for target in routes:
+                    start = time.perf_counter_ns()
+                    find_route(alg, target)
+                    samples[target].append(time.perf_counter_ns() - start + shared_ns)
+        return [self._row(alg, target, route, stats, samples[target], shared_search=True)
+                for target, route in routes.items()]
+
+    @contextmanager
+    def _measuring(self):
+        # Com 'disable_gc', coleta antes do bloco e desliga o coletor durante as medições
+        gc_was_enabled = gc.isenabled()
+        if self.disable_gc:
+            gc.collect()
+            gc.disable()
+        try:
+            yield
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def _row(self, alg, target, route, stats, samples, shared_search=False):
+        row = {
+            'algorithm': alg,
+            'target': target,
+            'repetitions': self.repetitions,
+            'route_nodes': len(route),
+            'shared_search': shared_search,
+        }
+        compact = self.calculator.engine == 'compact'
+        for field in ('settled', 'relaxed', 'pushes', 'pops', 'peak_frontier'):
+            row[field] = getattr(stats, field) if compact else None
+        row['meeting_position'] = stats.meeting_position if compact else None
+        row.update(summarize(samples))
+        return row
+
+    def run(self, algorithms, targets=None):
+        """
+        Mede todas as consultas dos algoritmos informados.
+
+        Args:
+            algorithms (list): Nomes dos algoritmos.
+            targets (list): Nós de destino (padrão: os destinos da calculadora).
+
+        Returns:
+            list: Linhas de resultado (ver 'measure'), na ordem algoritmo x destino.
+        """
+        targets = self.calculator.destination_nodes if targets is None else targets
+        rows = []
+        for alg in algorithms:
+            if alg in self.calculator.SHARED_SEARCH_ALGORITHMS and self.calculator.engine == 'compact':
+                rows.extend(self.measure_shared(alg, targets))
+                continue
+            for target in targets:
+                row = self.measure(alg, target)
+                if row is None:
+                    logger.warning(f"Nenhuma rota encontrada para o nó {target} usando {alg}.")
+                    continue
+                rows.append(row)
+        return rows
+
+    @staticmethod
+    def by_algorithm(rows):
+        """
+        Agrega as linhas por algoritmo: mediana das medianas e do p95, totais de esforço e
+        o maior pico da fila. Com busca compartilhada, o esforço é o de uma única busca.
+
+        Returns:
+            dict: Estatísticas por nome de algoritmo.
+        """
+        summary = {}
+        for alg in dict.fromkeys(row['algorithm'] for row in rows):
+            selected = [row for row in rows if row['algorithm'] == alg]
+            # As linhas de uma busca compartilhada repetem os mesmos contadores
+            effort = selected[:1] if selected[0].get('shared_search') else selected
+            summary[alg] = {
+                'queries': len(selected),
+                'median_s': float(np.median([row['median_s'] for row in selected])),
+                'p95_s': float(np.median([row['p95_s'] for row in selected])),
+                'min_s': min(row['min_s'] for row in selected),
+                'settled': sum(row['settled'] or 0 for row in effort),
+                'relaxed': sum(row['relaxed'] or 0 for row in effort),
+                'pushes': sum(row['pushes'] or 0 for row in effort),
+                'pops': sum(row['pops'] or 0 for row in effort),
+                'peak_frontier': max((row['peak_frontier'] or 0 for row in selected), default=0),
+            }
+        return summary
@@ -0,0 +1,253 @@
+# route_planner/compact_graph.py
+
+import numpy as np
+
+class CompactGraph:
+    """
+    Representação compacta (CSR) do grafo rodoviário projetado, utilizada pelos
+    algoritmos de caminho mínimo no lugar do MultiDiGraph do NetworkX.
+
+    Os nós são mapeados para índices inteiros contíguos (0..n-1). As arestas de saída
+    de cada nó ficam em 'indices[indptr[u]:indptr[u + 1]]', com os pesos alinhados em
+    'weights'. Arestas paralelas são mantidas como entradas distintas, de modo que os
+    algoritmos escolhem naturalmente a de menor peso. A estrutura reversa (predecessores)
+    guarda, para cada entrada, a posição da aresta correspondente na estrutura direta,
+    permitindo reutilizar qualquer vetor de pesos nos dois sentidos.
+    """
+    def __init__(self, node_ids, x, y, indptr, indices, lengths, crs=None):
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.x = np.ascontiguousarray(x, dtype=np.float64)
+        self.y = np.ascontiguousarray(y, dtype=np.float64)
+        self.indptr = np.ascontiguousarray(indptr, dtype=np.int64)
+        self.indices = np.ascontiguousarray(indices, dtype=np.int32)
+        self.weights = {'length': np.ascontiguousarray(lengths, dtype=np.float64)}
+        self.crs = crs
+        self.node_index = {int(node): idx for idx, node in enumerate(self.node_ids.tolist())}
+        self._edge_sources = None
+        self._reverse_weights = {}
+        self._cost_per_meter = {}
+        self._build_reverse()
+
+    @classmethod
+    def from_networkx(cls, G, weight='length'):
+        """
+        Constrói a representação compacta a partir de um grafo do NetworkX.
+
+        Args:
+            G (networkx.MultiDiGraph): Grafo projetado com atributos 'x' e 'y' nos nós.
+            weight (str): Atributo das arestas utilizado como comprimento.
+
+        Returns:
+            CompactGraph: Grafo compacto equivalente.
+        """
+        node_ids = list(G.nodes)
+        node_index = {node: idx for idx, node in enumerate(node_ids)}
+        x = np.fromiter((G.nodes[node]['x'] for node in node_ids), dtype=np.float64, count=len(node_ids))
+        y = np.fromiter((G.nodes[node]['y'] for node in node_ids), dtype=np.float64, count=len(node_ids))
+
+        num_edges = G.number_of_edges()
+        tails = np.empty(num_edges, dtype=np.int64)
+        heads = np.empty(num_edges, dtype=np.int32)
+        lengths = np.empty(num_edges, dtype=np.float64)
+        # Arestas sem o atributo recebem peso 1, como no NetworkX
+        for pos, (u, v, length) in enumerate(G.edges(data=weight, default=1)):
+            tails[pos] = node_index[u]
+            heads[pos] = node_index[v]
+            lengths[pos] = length
+
+        # Ordenar as arestas pelo nó de origem (ordem estável) para montar o CSR
+        order = np.argsort(tails, kind='stable')
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tails, minlength=len(node_ids)), out=indptr[1:])
+
+        return cls(node_ids, x, y, indptr, heads[order], lengths[order], crs=G.graph.get('crs'))
+
+    def to_arrays(self):
+        """
+        Retorna os vetores que definem o grafo compacto, pelo nome usado no arquivo .npz.
+        A estrutura reversa não é incluída, pois é reconstruída a partir da direta.
+        """
+        arrays = {
+            'node_ids': self.node_ids,
+            'x': self.x,
+            'y': self.y,
+            'indptr': self.indptr,
+            'indices': self.indices,
+            'crs': np.array('' if self.crs is None else str(self.crs)),
+        }
+        arrays.update({f'weight_{name}': values for name, values in self.weights.items()})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Reconstrói o grafo compacto a partir dos vetores retornados por 'to_arrays'.
+
+        Args:
+            arrays (Mapping): Vetores pelo nome (dicionário, arquivo .npz aberto ou
+                memória compartilhada).
+
+        Returns:
+            CompactGraph: Grafo compacto.
+        """
+        cg = cls(arrays['node_ids'], arrays['x'], arrays['y'], arrays['indptr'], arrays['indices'],
+                 arrays['weight_length'], crs=str(arrays['crs']) or None)
+        for key in arrays:
+            if key.startswith('weight_') and key != 'weight_length':
+                cg.weights[key[len('weight_'):]] = np.ascontiguousarray(arrays[key])
+        return cg
+
+    def save(self, path):
+        """
+        Salva os vetores do grafo compacto em um arquivo .npz (formato binário do NumPy).
+
+        Args:
+            path (str): Caminho do arquivo de saída.
+        """
+        with open(path, 'wb') as f:
+            np.savez(f, **self.to_arrays())
+
+    @classmethod
+    def load(cls, path):
+        """
+        Carrega um grafo compacto salvo com 'save'.
+
+        Args:
+            path (str): Caminho do arquivo .npz.
+
+        Returns:
+            CompactGraph: Grafo compacto carregado.
+        """
+        with np.load(path) as data:
+            return cls.from_arrays(data)
+
+    def _build_reverse(self):
+        """
+        Monta a estrutura CSR reversa (arestas de entrada de cada nó).
+        """
+        n = self.number_of_nodes()
+        heads = self.indices
+        self.rev_edge = np.argsort(heads, kind='stable').astype(np.int64)
+        self.rev_indices = self.edge_sources()[self.rev_edge]
+        self.rev_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(heads, minlength=n), out=self.rev_indptr[1:])
+
+    def number_of_nodes(self):
+        return len(self.node_ids)
+
+    def number_of_edges(self):
+        return len(self.indices)
+
+    def edge_sources(self):
+        """
+        Retorna o nó de origem de cada aresta, na ordem da estrutura direta.
+        """
+        if self._edge_sources is None:
+            self._edge_sources = np.repeat(
+                np.arange(self.number_of_nodes(), dtype=np.int32),
+                np.diff(self.indptr)
+            )
+        return self._edge_sources
+
+    def edge_weights(self, weight='length'):
+        """
+        Retorna o vetor de pesos das arestas, na ordem da estrutura direta.
+
+        Raises:
+            KeyError: Se o perfil de peso não estiver disponível.
+        """
+        if weight not in self.weights:
+            raise KeyError(f"Perfil de peso '{weight}' não disponível no grafo compacto.")
+        return self.weights[weight]
+
+    def set_weights(self, weight, values):
+        """
+        Registra (ou substitui) um perfil de peso, alinhado com a estrutura direta
+        (ver route_planner.weight_profiles).
+
+        Raises:
+            ValueError: Se o vetor não tiver um valor por aresta.
+        """
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        if values.shape != (self.number_of_edges(),):
+            raise ValueError(f"O perfil '{weight}' deve ter um peso por aresta ({self.number_of_edges()}).")
+        self.weights[weight] = values
+        self._reverse_weights.pop(weight, None)
+        self._cost_per_meter.pop(weight, None)
+
+    def has_negative_weights(self, weight='length'):
+        """
+        Indica se o perfil tem arestas de custo negativo (aceitas apenas pelo Bellman-Ford).
+        """
+        return bool(self.edge_weights(weight).min(initial=0.0) < 0)
+
+    def cost_per_meter(self, weight='length'):
+        """
+        Menor custo por metro de comprimento entre as arestas do perfil. Multiplicado pela
+        distância em linha reta, dá um limite inferior do custo que mantém admissíveis as
+        heurísticas geométricas em qualquer perfil (ex.: 1 / velocidade máxima no tempo
+        de percurso).
+        """
+        if weight == 'length':
+            return 1.0
+        if weight not in self._cost_per_meter:
+            lengths = self.weights['length']
+            positive = lengths > 0
+            ratios = self.edge_weights(weight)[positive] / lengths[positive]
+            self._cost_per_meter[weight] = float(ratios.min()) if ratios.size else 0.0
+        return self._cost_per_meter[weight]
+
+    def reverse_weights(self, weight='length'):
+        """
+        Retorna o vetor de pesos alinhado com a estrutura reversa.
+        """
+        if weight not in self._reverse_weights:
+            self._reverse_weights[weight] = np.ascontiguousarray(self.edge_weights(weight)[self.rev_edge])
+        return self._reverse_weights[weight]
+
+    def forward(self, weight='length'):
+        """
+        Retorna (indptr, indices, pesos) da estrutura direta como memoryviews, que permitem
+        indexação rápida a partir de código Python sem copiar os vetores.
+        """
+        return memoryview(self.indptr), memoryview(self.indices), memoryview(self.edge_weights(weight))
+
+    def backward(self, weight='length'):
+        """
+        Retorna (indptr, indices, pesos) da estrutura reversa como memoryviews.
+        """
+        return memoryview(self.rev_indptr), memoryview(self.rev_indices), memoryview(self.reverse_weights(weight))
+
+    def index_of(self, node):
+        """
+        Converte o identificador de um nó do grafo original para o índice compacto.
+        """
+        return self.node_index[int(node)]
+
+    def to_node_ids(self, path):
+        """
+        Converte uma sequência de índices compactos para os identificadores originais.
+        """
+        return self.node_ids[np.asarray(path, dtype=np.int64)].tolist()
+
+    def path_length(self, path, weight='length'):
+        """
+        Soma os pesos das arestas de um caminho (índices compactos), usando a aresta de
+        menor peso entre arestas paralelas.
+        """
+        weights = self.edge_weights(weight)
+        total = 0.0
+        for u, v in zip(path[:-1], path[1:]):
+            start, end = self.indptr[u], self.indptr[u + 1]
+            total += weights[start:end][self.indices[start:end] == v].min()
+        return float(total)
+
+    @property
+    def nbytes(self):
+        """
+        Memória ocupada pelos vetores do grafo compacto, em bytes.
+        """
+        arrays = [self.node_ids, self.x, self.y, self.indptr, self.indices,
+                  self.rev_edge, self.rev_indices, self.rev_indptr]
+        arrays.extend(self.weights.values())
+        return sum(arr.nbytes for arr in arrays)
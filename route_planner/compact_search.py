@@ -0,0 +1,793 @@
+# route_planner/compact_search.py
+
+import os
+import heapq
+from collections import deque
+
+import networkx as nx
+import numpy as np
+
+# Algoritmos de caminho mínimo sobre o CompactGraph. Todas as funções recebem e
+# retornam índices compactos (0..n-1); a conversão para os identificadores do OSM
+# fica a cargo de quem chama (ver CompactGraph.to_node_ids).
+
+# Instrumentação das buscas. Lida uma única vez na importação, como uma opção de
+# compilação: com ROUTE_PLANNER_STATS=0 a RouteCalculator deixa de passar 'stats' aos
+# algoritmos, e os contadores locais nem chegam a ser publicados.
+STATS_ENABLED = os.environ.get('ROUTE_PLANNER_STATS', '1') != '0'
+
+class SearchStats:
+    """
+    Contadores de esforço de uma ou mais buscas:
+
+        searches: buscas registradas.
+        settled: nós fixados (retirados da fila pela primeira vez).
+        relaxed: arestas relaxadas (examinadas a partir dos nós fixados).
+        pushes / pops: inserções e retiradas da fila de prioridade (ou da fila do Bellman-Ford).
+        peak_frontier: maior tamanho da fila observado (máximo entre as buscas).
+        meetings / meeting_position: buscas bidirecionais que se encontraram e a soma da
+            posição do nó de encontro no custo do caminho (0 na origem, 1 no destino).
+
+    Os algoritmos acumulam os valores em variáveis locais e os somam ao objeto apenas ao
+    terminar, de modo que informar 'stats' não altera o laço principal. As inserções são
+    obtidas no fim da busca (retiradas mais o que restou na fila), sem contagem no laço.
+
+    Com 'search_space', cada busca também guarda os nós fixados em cada sentido, como
+    bitsets, para visualização (ver route_planner.search_space).
+
+    Args:
+        search_space (SearchSpace): Destino da captura dos espaços de busca (opcional).
+    """
+    FIELDS = ('searches', 'settled', 'relaxed', 'pushes', 'pops', 'peak_frontier', 'meeting_position')
+
+    def __init__(self, search_space=None):
+        self.search_space = search_space
+        self.searches = 0
+        self.settled = 0
+        self.relaxed = 0
+        self.pushes = 0
+        self.pops = 0
+        self.peak_frontier = 0
+        self.meetings = 0
+        self.meeting_position_sum = 0.0
+
+    def record(self, settled, relaxed, pushes=0, pops=0, peak_frontier=0, meeting_position=None, space=None):
+        """
+        Soma os contadores de uma busca.
+
+        Args:
+            settled (int): Nós fixados.
+            relaxed (int): Arestas relaxadas.
+            pushes (int): Inserções na fila.
+            pops (int): Retiradas da fila.
+            peak_frontier (int): Maior tamanho da fila.
+            meeting_position (float): Posição do nó de encontro (buscas bidirecionais).
+            space (callable): Chamado apenas com 'search_space', retorna os nós fixados em
+                cada sentido (índices ou máscaras), para que a busca não precise montá-los
+                quando não há captura.
+        """
+        self.searches += 1
+        self.settled += settled
+        self.relaxed += relaxed
+        self.pushes += pushes
+        self.pops += pops
+        if peak_frontier > self.peak_frontier:
+            self.peak_frontier = peak_frontier
+        if meeting_position is not None:
+            self.meetings += 1
+            self.meeting_position_sum += meeting_position
+        if self.search_space is not None and space is not None:
+            self.search_space.add(*space())
+
+    def merge(self, other):
+        """
+        Acrescenta os contadores (e os espaços de busca) de outro SearchStats.
+        """
+        self.searches += other.searches
+        self.settled += other.settled
+        self.relaxed += other.relaxed
+        self.pushes += other.pushes
+        self.pops += other.pops
+        self.peak_frontier = max(self.peak_frontier, other.peak_frontier)
+        self.meetings += other.meetings
+        self.meeting_position_sum += other.meeting_position_sum
+        if self.search_space is not None and other.search_space is not None:
+            self.search_space.extend(other.search_space)
+        return self
+
+    @property
+    def meeting_position(self):
+        """
+        Posição média do nó de encontro das buscas bidirecionais, ou None se não houve encontro.
+        """
+        return self.meeting_position_sum / self.meetings if self.meetings else None
+
+    def summary(self):
+        """
+        Resume os contadores por busca, para gravação junto com os tempos.
+
+        Returns:
+            dict: Número de buscas, médias por busca de nós fixados, arestas relaxadas,
+            inserções e retiradas, o pico da fila e a posição média do encontro.
+        """
+        searches = self.searches or 1
+        return {
+            'searches': self.searches,
+            'settled': self.settled / searches,
+            'relaxed': self.relaxed / searches,
+            'pushes': self.pushes / searches,
+            'pops': self.pops / searches,
+            'peak_frontier': self.peak_frontier,
+            'meeting_position': self.meeting_position,
+        }
+
+    def __repr__(self):
+        return (f"SearchStats(searches={self.searches}, settled={self.settled}, relaxed={self.relaxed}, "
+                f"pushes={self.pushes}, pops={self.pops}, peak_frontier={self.peak_frontier})")
+
+def _reconstruct(parents, target):
+    """
+    Reconstrói o caminho a partir do dicionário de pais, terminando em 'target'.
+    """
+    path = []
+    node = target
+    while node is not None:
+        path.append(node)
+        node = parents[node]
+    path.reverse()
+    return path
+
+def euclidean_heuristic(cg, target, weight='length'):
+    """
+    Retorna a heurística euclidiana h[v] = distância em linha reta de v até 'target',
+    calculada de uma vez para todos os nós a partir das coordenadas projetadas e convertida
+    para o perfil de peso (ver CompactGraph.cost_per_meter).
+    Usada quando nenhum provedor de heurística (ver route_planner.heuristics) é informado.
+    """
+    return memoryview(cg.cost_per_meter(weight) * np.hypot(cg.x - cg.x[target], cg.y - cg.y[target]))
+
+def dijkstra(cg, source, target, weight='length', stats=None):
+    """
+    Dijkstra unidirecional com parada antecipada ao fixar o destino.
+
+    Args:
+        cg (CompactGraph): Grafo compacto.
+        source (int): Índice do nó de origem.
+        target (int): Índice do nó de destino.
+        weight (str): Perfil de peso das arestas.
+        stats (SearchStats): Contadores de esforço a atualizar (opcional).
+
+    Returns:
+        list: Índices dos nós do caminho mínimo.
+
+    Raises:
+        nx.NetworkXNoPath: Se não houver caminho entre source e target.
+    """
+    indptr, indices, weights = cg.forward(weight)
+    dist = {source: 0.0}
+    parents = {source: None}
+    settled = set()
+    relaxed = pops = 0
+    peak = 1
+    queue = [(0.0, source)]
+    while queue:
+        d, u = heapq.heappop(queue)
+        pops += 1
+        if u in settled:
+            continue
+        if u == target:
+            if stats is not None:
+                settled.add(u)
+                stats.record(len(settled), relaxed, pops + len(queue), pops, peak, space=lambda: (settled, ()))
+            return _reconstruct(parents, target)
+        settled.add(u)
+        relaxed += indptr[u + 1] - indptr[u]
+        for i in range(indptr[u], indptr[u + 1]):
+            v = indices[i]
+            nd = d + weights[i]
+            if nd < dist.get(v, float('inf')):
+                dist[v] = nd
+                parents[v] = u
+                heapq.heappush(queue, (nd, v))
+        if len(queue) > peak:
+            peak = len(queue)
+    if stats is not None:
+        stats.record(len(settled), relaxed, pops, pops, peak, space=lambda: (settled, ()))
+    raise nx.NetworkXNoPath(f"Nenhuma rota encontrada entre {source} e {target} usando Dijkstra.")
+
+def astar(cg, source, target, weight='length', heuristic=None, stats=None):
+    """
+    A* unidirecional. Sem provedor de heurística, usa a distância euclidiana.
+
+    Args:
+        cg (CompactGraph): Grafo compacto.
+        source (int): Índice do nó de origem.
+        target (int): Índice do nó de destino.
+        weight (str): Perfil de peso das arestas.
+        heuristic (HeuristicProvider): Provedor da estimativa de distância até o destino.
+        stats (SearchStats): Contadores de esforço a atualizar (opcional).
+
+    Returns:
+        list: Índices dos nós do caminho mínimo.
+
+    Raises:
+        nx.NetworkXNoPath: Se não houver caminho entre source e target.
+    """
+    h = euclidean_heuristic(cg, target, weight) if heuristic is None else heuristic.for_target(target)
+    indptr, indices, weights = cg.forward(weight)
+    dist = {source: 0.0}
+    parents = {source: None}
+    settled = set()
+    relaxed = pops = 0
+    peak = 1
+    queue = [(h[source], 0.0, source)]
+    while queue:
+        _, d, u = heapq.heappop(queue)
+        pops += 1
+        if u in settled:
+            continue
+        if u == target:
+            if stats is not None:
+                settled.add(u)
+                stats.record(len(settled), relaxed, pops + len(queue), pops, peak, space=lambda: (settled, ()))
+            return _reconstruct(parents, target)
+        settled.add(u)
+        relaxed += indptr[u + 1] - indptr[u]
+        for i in range(indptr[u], indptr[u + 1]):
+            v = indices[i]
+            nd = d + weights[i]
+            if nd < dist.get(v, float('inf')):
+                dist[v] = nd
+                parents[v] = u
+                heapq.heappush(queue, (nd + h[v], nd, v))
+        if len(queue) > peak:
+            peak = len(queue)
+    if stats is not None:
+        stats.record(len(settled), relaxed, pops, pops, peak, space=lambda: (settled, ()))
+    raise nx.NetworkXNoPath(f"Nenhuma rota encontrada entre {source} e {target} usando A*.")
+
+def bellman_ford(cg, source, target, weight='length', stats=None):
+    """
+    Bellman-Ford para um único destino: executa 'bellman_ford_tree' a partir da origem e
+    extrai o caminho até 'target'. Para vários destinos, use a árvore diretamente.
+
+    Args:
+        cg (CompactGraph): Grafo compacto.
+        source (int): Índice do nó de origem.
+        target (int): Índice do nó de destino.
+        weight (str): Perfil de peso das arestas (pesos negativos são aceitos).
+        stats (SearchStats): Contadores de esforço a atualizar (opcional).
+
+    Returns:
+        list: Índices dos nós do caminho mínimo.
+
+    Raises:
+        nx.NetworkXNoPath: Se não houver caminho entre source e target.
+        nx.NetworkXUnbounded: Se houver ciclo negativo alcançável a partir da origem.
+    """
+    return bellman_ford_tree(cg, source, weight=weight, stats=stats).path_to(target)
+
+def bellman_ford_tree(cg, source, weight='length', stats=None, negative_cycles='raise'):
+    """
+    Bellman-Ford baseado em fila (SPFA) a partir de 'source', para todos os nós de uma vez.
+
+    Só os nós cuja distância melhorou voltam à fila, e a busca termina quando a fila
+    esvazia, em vez de repetir rodadas sobre todas as arestas. Um nó que melhora com
+    distância menor que a do início da fila entra na frente (Small Label First). Os pesos
+    podem ser negativos: um caminho com n ou mais arestas indica um ciclo negativo.
+    Nas estatísticas, cada retirada da fila conta como nó fixado.
+
+    Args:
+        cg (CompactGraph): Grafo compacto.
+        source (int): Índice do nó de origem.
+        weight (str): Perfil de peso das arestas.
+        stats (SearchStats): Contadores de esforço a atualizar (opcional).
+        negative_cycles (str): 'raise' para interromper no primeiro ciclo negativo, ou
+            'mark' para concluir a busca marcando com distância -inf os nós alcançáveis a
+            partir de ciclos negativos (os demais mantêm distâncias e caminhos válidos).
+
+    Returns:
+        BellmanFordTree: Distâncias e pais de todos os nós.
+
+    Raises:
+        nx.NetworkXUnbounded: Com negative_cycles='raise', se houver ciclo negativo
+            alcançável a partir da origem.
+    """
+    indptr, indices, weights = cg.forward(weight)
+    n = cg.number_of_nodes()
+    dist = [float('inf')] * n
+    parents = [-1] * n
+    hops = [0] * n
+    queued = [False] * n
+    dist[source] = 0.0
+    queued[source] = True
+    queue = deque([source])
+    cycle_nodes = set()
+    settled = relaxed = 0
+    peak = pushes = 1
+
+    while queue:
+        u = queue.popleft()
+        queued[u] = False
+        settled += 1
+        d = dist[u]
+        relaxed += indptr[u + 1] - indptr[u]
+        for i in range(indptr[u], indptr[u + 1]):
+            v = indices[i]
+            nd = d + weights[i]
+            if nd < dist[v]:
+                dist[v] = nd
+                parents[v] = u
+                hops[v] = hops[u] + 1
+                if hops[v] >= n:
+                    # O caminho que melhorou v repete um nó: há um ciclo negativo
+                    if negative_cycles == 'raise':
+                        if stats is not None:
+                            stats.record(settled, relaxed, pushes, settled, peak)
+                        raise nx.NetworkXUnbounded("Ciclo de peso negativo detectado pelo Bellman-Ford.")
+                    cycle_nodes.add(v)
+                    continue
+                if not queued[v]:
+                    queued[v] = True
+                    pushes += 1
+                    if queue and nd < dist[queue[0]]:
+                        queue.appendleft(v)
+                    else:
+                        queue.append(v)
+        if len(queue) > peak:
+            peak = len(queue)
+
+    if stats is not None:
+        # Todo nó alcançado foi retirado da fila ao menos uma vez
+        stats.record(settled, relaxed, pushes, settled, peak,
+                     space=lambda: (np.isfinite(dist), ()))
+    dist = np.array(dist, dtype=np.float64)
+    parents = np.array(parents, dtype=np.int64)
+    if cycle_nodes:
+        # Tudo o que é alcançável a partir de um ciclo negativo tem distância ilimitada
+        stack = list(cycle_nodes)
+        dist[stack] = -np.inf
+        while stack:
+            u = stack.pop()
+            for i in range(indptr[u], indptr[u + 1]):
+                v = indices[i]
+                if dist[v] != -np.inf:
+                    dist[v] = -np.inf
+                    stack.append(v)
+        parents[np.isneginf(dist)] = -1
+    return BellmanFordTree(source, dist, parents)
+
+class BellmanFordTree:
+    """
+    Árvore de caminhos mínimos produzida por 'bellman_ford_tree', com distâncias e pais
+    de todos os nós em vetores (inf para nós inalcançáveis, -inf para nós afetados por
+    ciclos negativos).
+    """
+    def __init__(self, source, dist, parents):
+        self.source = source
+        self.dist = dist
+        self.parents = parents
+
+    def __contains__(self, node):
+        return bool(np.isfinite(self.dist[node]))
+
+    @property
+    def has_negative_cycle(self):
+        return bool(np.isneginf(self.dist).any())
+
+    def _check(self, node):
+        if self.dist[node] == np.inf:
+            raise nx.NetworkXNoPath(f"Nenhuma rota encontrada entre {self.source} e {node} usando Bellman-Ford.")
+        if self.dist[node] == -np.inf:
+            raise nx.NetworkXUnbounded(f"O nó {node} é alcançável a partir de um ciclo de peso negativo.")
+
+    def distance(self, node):
+        """
+        Retorna a distância mínima da origem até 'node'.
+
+        Raises:
+            nx.NetworkXNoPath: Se o nó não for alcançável.
+            nx.NetworkXUnbounded: Se o nó for afetado por um ciclo negativo.
+        """
+        self._check(node)
+        return float(self.dist[node])
+
+    def path_to(self, node):
+        """
+        Retorna o caminho (índices compactos) da origem até 'node'.
+
+        Raises:
+            nx.NetworkXNoPath: Se o nó não for alcançável.
+            nx.NetworkXUnbounded: Se o nó for afetado por um ciclo negativo.
+        """
+        self._check(node)
+        path = [node]
+        while path[-1] != self.source:
+            path.append(int(self.parents[path[-1]]))
+        path.reverse()
+        return path
+
+def bidirectional_dijkstra(cg, source, target, weight='length', stats=None):
+    """
+    Dijkstra bidirecional, alternando as expansões e parando quando a soma dos topos das
+    filas atinge o melhor custo já encontrado.
+
+    Args:
+        cg (CompactGraph): Grafo compacto.
+        source (int): Índice do nó de origem.
+        target (int): Índice do nó de destino.
+        weight (str): Perfil de peso das arestas.
+        stats (SearchStats): Contadores de esforço a atualizar (opcional).
+
+    Returns:
+        list: Índices dos nós do caminho mínimo.
+
+    Raises:
+        nx.NetworkXNoPath: Se não houver caminho entre source e target.
+    """
+    if source == target:
+        return [source]
+    directions = (cg.forward(weight), cg.backward(weight))
+    dists = ({source: 0.0}, {target: 0.0})
+    parents = ({source: None}, {target: None})
+    settled = (set(), set())
+    queues = ([(0.0, source)], [(0.0, target)])
+    best_cost = float('inf')
+    meeting_node = None
+    relaxed = pops = 0
+    peak = 2
+    side = 1
+
+    while queues[0] and queues[1]:
+        if queues[0][0][0] + queues[1][0][0] >= best_cost:
+            break
+        side = 1 - side
+        d, u = heapq.heappop(queues[side])
+        pops += 1
+        if u in settled[side]:
+            continue
+        settled[side].add(u)
+        indptr, indices, weights = directions[side]
+        relaxed += indptr[u + 1] - indptr[u]
+        dist, other_dist = dists[side], dists[1 - side]
+        for i in range(indptr[u], indptr[u + 1]):
+            v = indices[i]
+            nd = d + weights[i]
+            if nd < dist.get(v, float('inf')):
+                dist[v] = nd
+                parents[side][v] = u
+                heapq.heappush(queues[side], (nd, v))
+            if v in other_dist and nd + other_dist[v] < best_cost:
+                best_cost = nd + other_dist[v]
+                meeting_node = v
+        if len(queues[0]) + len(queues[1]) > peak:
+            peak = len(queues[0]) + len(queues[1])
+
+    if stats is not None:
+        stats.record(len(settled[0]) + len(settled[1]), relaxed, pops + len(queues[0]) + len(queues[1]), pops,
+                     peak, meeting_position=_meeting_position(dists[0], meeting_node, best_cost),
+                     space=lambda: settled)
+    if meeting_node is None:
+        raise nx.NetworkXNoPath(f"Nenhuma rota encontrada entre {source} e {target} usando Bidirectional Dijkstra.")
+    return _join_paths(parents, meeting_node)
+
+class SearchWorkspace:
+    """
+    Vetores reaproveitados entre as consultas do Bidirectional A* sobre um mesmo grafo:
+    distâncias, pais e marcas de cada nó nos dois sentidos, alocados uma única vez com
+    tamanho n.
+
+    Em vez de limpar os vetores a cada consulta, um contador de geração é incrementado:
+    um rótulo só vale se a marca do nó for igual à geração atual, e o que sobrou de
+    consultas anteriores é simplesmente ignorado. Consultas repetidas, portanto, não
+    alocam nada proporcional ao grafo. Não é seguro compartilhar um mesmo workspace
+    entre threads.
+
+    Args:
+        cg (CompactGraph): Grafo compacto.
+    """
+    def __init__(self, cg):
+        n = cg.number_of_nodes()
+        self.num_nodes = n
+        self.generation = 0
+        # Um vetor por sentido (0: busca direta, 1: busca reversa)
+        self.dist = ([0.0] * n, [0.0] * n)
+        self.parents = ([-1] * n, [-1] * n)
+        self.labeled = ([0] * n, [0] * n)  # Geração em que o nó recebeu rótulo
+        self.settled = ([0] * n, [0] * n)  # Geração em que o nó foi fixado
+        self.queues = ([], [])
+        self._potential = np.zeros(n)
+        self.potential = memoryview(self._potential)
+
+    def set_potential(self, h_target, h_source):
+        """
+        Calcula, no vetor do workspace, o potencial médio p(v) = (h_target(v) - h_source(v)) / 2.
+        """
+        np.subtract(h_target, h_source, out=self._potential)
+        self._potential *= 0.5
+        return self.potential
+
+    def next_generation(self):
+        """
+        Inicia uma nova consulta, invalidando todos os rótulos anteriores.
+
+        Returns:
+            int: Geração da nova consulta.
+        """
+        self.generation += 1
+        self.queues[0].clear()
+        self.queues[1].clear()
+        return self.generation
+
+    def settled_masks(self):
+        """
+        Retorna as máscaras dos nós fixados na consulta atual, em cada sentido.
+        """
+        return tuple(np.array(marks) == self.generation for marks in self.settled)
+
+    def path(self, meeting_node):
+        """
+        Une o caminho da busca direta (até o nó de encontro) com o da busca reversa.
+        """
+        forward_parents, backward_parents = self.parents
+        path = []
+        node = meeting_node
+        while node != -1:
+            path.append(node)
+            node = forward_parents[node]
+        path.reverse()
+        node = backward_parents[meeting_node]
+        while node != -1:
+            path.append(node)
+            node = backward_parents[node]
+        return path
+
+def bidirectional_astar(cg, source, target, weight='length', heuristic=None, stats=None, workspace=None):
+    """
+    Bidirectional A* com potencial médio (consistente) e regra de parada exata.
+
+    As duas buscas usam o mesmo potencial p(v) = (h_t(v) - h_s(v)) / 2, em que h_t estima a
+    distância de v até o destino e h_s a distância da origem até v; a busca reversa usa -p.
+    Com heurísticas consistentes, os custos reduzidos w(u, v) - p(u) + p(v) são não
+    negativos nos dois sentidos, de modo que as buscas equivalem a um Dijkstra
+    bidirecional sobre o grafo reduzido: a soma das chaves de um nó nas duas filas é o
+    comprimento do caminho que passa por ele, e a busca pode parar assim que a soma dos
+    topos das filas atingir o melhor custo encontrado, com o caminho mínimo garantido.
+
+    Args:
+        cg (CompactGraph): Grafo compacto.
+        source (int): Índice do nó de origem.
+        target (int): Índice do nó de destino.
+        weight (str): Perfil de peso das arestas.
+        heuristic (HeuristicProvider): Provedor das estimativas nos dois sentidos.
+        stats (SearchStats): Contadores de esforço a atualizar (opcional).
+        workspace (SearchWorkspace): Vetores reaproveitados entre consultas (um novo é
+            criado se None).
+
+    Returns:
+        list: Índices dos nós do caminho mínimo.
+
+    Raises:
+        nx.NetworkXNoPath: Se não houver caminho entre source e target.
+    """
+    if source == target:
+        return [source]
+    if heuristic is None:
+        h_target = euclidean_heuristic(cg, target, weight)
+        h_source = euclidean_heuristic(cg, source, weight)
+    else:
+        h_target = heuristic.for_target(target)
+        h_source = heuristic.for_source(source)
+    if workspace is None:
+        workspace = SearchWorkspace(cg)
+    generation = workspace.next_generation()
+    directions = (cg.forward(weight), cg.backward(weight))
+    dists, parents = workspace.dist, workspace.parents
+    labeled, settled_at, queues = workspace.labeled, workspace.settled, workspace.queues
+
+    potential = workspace.set_potential(h_target, h_source)
+
+    for side, node in ((0, source), (1, target)):
+        dists[side][node] = 0.0
+        parents[side][node] = -1
+        labeled[side][node] = generation
+    # Chaves: distância + p(v) na busca direta e distância - p(v) na reversa
+    queues[0].append((potential[source], source))
+    queues[1].append((-potential[target], target))
+
+    best_cost = float('inf')
+    meeting_node = -1
+    settled = relaxed = pops = 0
+    peak = 2
+    forward_queue, backward_queue = queues
+
+    while forward_queue and backward_queue:
+        if forward_queue[0][0] + backward_queue[0][0] >= best_cost:
+            break
+        # Expande o sentido com a menor chave
+        side = 0 if forward_queue[0][0] <= backward_queue[0][0] else 1
+        sign = 1.0 if side == 0 else -1.0
+        queue = queues[side]
+        _, u = heapq.heappop(queue)
+        pops += 1
+        side_settled = settled_at[side]
+        if side_settled[u] == generation:
+            continue
+        side_settled[u] = generation
+        settled += 1
+        indptr, indices, weights = directions[side]
+        relaxed += indptr[u + 1] - indptr[u]
+        dist, side_parents, side_labeled = dists[side], parents[side], labeled[side]
+        other_dist, other_labeled = dists[1 - side], labeled[1 - side]
+        d = dist[u]
+        for i in range(indptr[u], indptr[u + 1]):
+            v = indices[i]
+            nd = d + weights[i]
+            if side_labeled[v] != generation or nd < dist[v]:
+                dist[v] = nd
+                side_parents[v] = u
+                side_labeled[v] = generation
+                heapq.heappush(queue, (nd + sign * potential[v], v))
+            if other_labeled[v] == generation and nd + other_dist[v] < best_cost:
+                best_cost = nd + other_dist[v]
+                meeting_node = v
+        if len(forward_queue) + len(backward_queue) > peak:
+            peak = len(forward_queue) + len(backward_queue)
+
+    if stats is not None:
+        stats.record(settled, relaxed, pops + len(forward_queue) + len(backward_queue), pops, peak,
+                     meeting_position=None if meeting_node == -1 else _meeting_position(
+                         dists[0], meeting_node, best_cost),
+                     space=workspace.settled_masks)
+    if meeting_node == -1:
+        raise nx.NetworkXNoPath(f"Nenhuma rota encontrada entre {source} e {target} usando Bidirectional A*.")
+    return workspace.path(meeting_node)
+
+def _meeting_position(forward_dist, meeting_node, best_cost):
+    """
+    Posição do nó de encontro no custo do caminho: 0 na origem, 1 no destino.
+    """
+    if meeting_node is None:
+        return None
+    return forward_dist[meeting_node] / best_cost if best_cost > 0 else 0.0
+
+def _join_paths(parents, meeting_node):
+    """
+    Une o caminho da busca direta (até o nó de encontro) com o da busca reversa.
+    """
+    forward_parents, backward_parents = parents
+    path = _reconstruct(forward_parents, meeting_node)
+    node = backward_parents[meeting_node]
+    while node is not None:
+        path.append(node)
+        node = backward_parents[node]
+    return path
+
+def single_source_distances(cg, source, weight='length', reverse=False):
+    """
+    Dijkstra completo a partir de 'source', retornando as distâncias para todos os nós.
+
+    Args:
+        cg (CompactGraph): Grafo compacto.
+        source (int): Índice do nó de origem.
+        weight (str): Perfil de peso das arestas.
+        reverse (bool): Se True, percorre as arestas ao contrário (distâncias até 'source').
+
+    Returns:
+        numpy.ndarray: Distâncias (inf para nós inalcançáveis).
+    """
+    return single_source_tree(cg, source, weight=weight, reverse=reverse)[0]
+
+def single_source_tree(cg, source, weight='length', reverse=False):
+    """
+    Dijkstra completo a partir de 'source', retornando a árvore de caminhos mínimos.
+
+    Args:
+        cg (CompactGraph): Grafo compacto.
+        source (int): Índice do nó de origem.
+        weight (str): Perfil de peso das arestas.
+        reverse (bool): Se True, percorre as arestas ao contrário (distâncias até 'source').
+
+    Returns:
+        tuple: (distâncias, pais (-1 para a raiz e nós inalcançáveis), nós na ordem em que
+        foram fixados).
+    """
+    indptr, indices, weights = cg.backward(weight) if reverse else cg.forward(weight)
+    n = cg.number_of_nodes()
+    dist = [float('inf')] * n
+    parents = [-1] * n
+    settled = [False] * n
+    order = []
+    dist[source] = 0.0
+    queue = [(0.0, source)]
+    while queue:
+        d, u = heapq.heappop(queue)
+        if settled[u]:
+            continue
+        settled[u] = True
+        order.append(u)
+        for i in range(indptr[u], indptr[u + 1]):
+            v = indices[i]
+            nd = d + weights[i]
+            if nd < dist[v]:
+                dist[v] = nd
+                parents[v] = u
+                heapq.heappush(queue, (nd, v))
+    return np.array(dist, dtype=np.float64), np.array(parents, dtype=np.int64), order
+
+class ShortestPathTree:
+    """
+    Árvore de caminhos mínimos produzida por uma busca de origem única (one-to-many).
+    Guarda as distâncias e os pais dos nós fixados, permitindo extrair o caminho para
+    qualquer um deles sem repetir a busca.
+    """
+    def __init__(self, source, dist, parents):
+        self.source = source
+        self.dist = dist
+        self.parents = parents
+
+    def __contains__(self, node):
+        return node in self.dist
+
+    def distance(self, node):
+        """
+        Retorna a distância mínima da origem até 'node'.
+
+        Raises:
+            nx.NetworkXNoPath: Se o nó não foi alcançado pela busca.
+        """
+        if node not in self.dist:
+            raise nx.NetworkXNoPath(f"O nó {node} não foi alcançado a partir de {self.source}.")
+        return self.dist[node]
+
+    def path_to(self, node):
+        """
+        Retorna o caminho (índices compactos) da origem até 'node'.
+
+        Raises:
+            nx.NetworkXNoPath: Se o nó não foi alcançado pela busca.
+        """
+        if node not in self.dist:
+            raise nx.NetworkXNoPath(f"O nó {node} não foi alcançado a partir de {self.source}.")
+        return _reconstruct(self.parents, node)
+
+def one_to_many(cg, source, targets, k=None, weight='length'):
+    """
+    Dijkstra de origem única para um conjunto de destinos. A busca termina assim que os
+    'k' destinos alcançáveis mais próximos forem fixados (ou todos, se 'k' for None).
+
+    Args:
+        cg (CompactGraph): Grafo compacto.
+        source (int): Índice do nó de origem.
+        targets (iterable): Índices dos nós de destino.
+        k (int): Número de destinos mais próximos desejado.
+        weight (str): Perfil de peso das arestas.
+
+    Returns:
+        tuple: (ShortestPathTree, lista de (distância, destino) em ordem crescente de distância).
+    """
+    remaining = set(targets)
+    if k is None:
+        k = len(remaining)
+    indptr, indices, weights = cg.forward(weight)
+    dist = {source: 0.0}
+    parents = {source: None}
+    settled = {}
+    nearest = []
+    queue = [(0.0, source)]
+    while queue and len(nearest) < k:
+        d, u = heapq.heappop(queue)
+        if u in settled:
+            continue
+        settled[u] = d
+        if u in remaining:
+            nearest.append((d, u))
+        for i in range(indptr[u], indptr[u + 1]):
+            v = indices[i]
+            nd = d + weights[i]
+            if nd < dist.get(v, float('inf')):
+                dist[v] = nd
+                parents[v] = u
+                heapq.heappush(queue, (nd, v))
+    # Apenas os nós fixados têm distância definitiva
+    return ShortestPathTree(source, settled, parents), nearest
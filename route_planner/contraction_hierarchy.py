@@ -0,0 +1,326 @@
+# route_planner/contraction_hierarchy.py
+
+import heapq
+
+import networkx as nx
+import numpy as np
+
+from route_planner.logger import logger
+
+class ContractionHierarchy:
+    """
+    Contraction Hierarchies sobre o CompactGraph, para consultas repetidas no mesmo grafo.
+
+    No pré-processamento os nós são contraídos em ordem de importância; ao contrair v,
+    cada par u -> v -> w sem caminho alternativo (testemunha) de custo menor ou igual
+    recebe um atalho u -> w. A consulta é um Dijkstra bidirecional que só sobe na
+    hierarquia (do menor para o maior rank) nos dois sentidos; os atalhos do caminho
+    encontrado são então desempacotados até as arestas originais.
+
+    Atributos principais:
+        rank (numpy.ndarray): Posição de cada nó na ordem de contração.
+        up_* / down_*: CSR dos grafos de busca ascendente direto e reverso, com o nó
+            intermediário de cada atalho (-1 para arestas originais).
+    """
+    def __init__(self, cg, rank, up, down, shortcuts, weight='length'):
+        self.cg = cg
+        self.weight = weight
+        self.rank = np.asarray(rank, dtype=np.int64)
+        self.up_indptr, self.up_indices, self.up_weights = up
+        self.down_indptr, self.down_indices, self.down_weights = down
+        # (u, w) -> nó intermediário, para o desempacotamento dos atalhos
+        self.shortcuts = shortcuts
+
+    @classmethod
+    def build(cls, cg, weight='length', witness_settle_limit=60, hop_limit=8):
+        """
+        Executa o pré-processamento (ordenação, contração e criação de atalhos).
+
+        Args:
+            cg (CompactGraph): Grafo compacto.
+            weight (str): Perfil de peso das arestas.
+            witness_settle_limit (int): Máximo de nós fixados em cada busca de testemunha.
+            hop_limit (int): Máximo de arestas nas buscas de testemunha.
+
+        Returns:
+            ContractionHierarchy: Hierarquia pronta para consultas.
+        """
+        n = cg.number_of_nodes()
+        tails = cg.edge_sources().tolist()
+        heads = cg.indices.tolist()
+        weights = cg.edge_weights(weight).tolist()
+
+        # Adjacências mutáveis; arestas paralelas ficam com o menor peso
+        out_edges = [dict() for _ in range(n)]
+        in_edges = [dict() for _ in range(n)]
+        for u, v, w in zip(tails, heads, weights):
+            if u != v and w < out_edges[u].get(v, float('inf')):
+                out_edges[u][v] = w
+                in_edges[v][u] = w
+
+        contracted = [False] * n
+        deleted_neighbors = [0] * n
+        shortcuts = {}
+
+        def witness_costs(source, excluded, max_cost):
+            # Dijkstra local limitado, ignorando o nó em contração
+            dist = {source: 0.0}
+            hops = {source: 0}
+            queue = [(0.0, source)]
+            settled = 0
+            while queue and settled < witness_settle_limit:
+                d, u = heapq.heappop(queue)
+                if d > dist[u]:
+                    continue
+                if d > max_cost:
+                    break
+                settled += 1
+                if hops[u] >= hop_limit:
+                    continue
+                for v, w in out_edges[u].items():
+                    if v == excluded or contracted[v]:
+                        continue
+                    nd = d + w
+                    if nd < dist.get(v, float('inf')):
+                        dist[v] = nd
+                        hops[v] = hops[u] + 1
+                        heapq.heappush(queue, (nd, v))
+            return dist
+
+        def needed_shortcuts(v):
+            added = []
+            outgoing = [(w, cost) for w, cost in out_edges[v].items() if not contracted[w]]
+            if not outgoing:
+                return added
+            max_out = max(cost for _, cost in outgoing)
+            for u, cost_in in in_edges[v].items():
+                if contracted[u]:
+                    continue
+                dist = witness_costs(u, v, cost_in + max_out)
+                for w, cost_out in outgoing:
+                    if w == u:
+                        continue
+                    via = cost_in + cost_out
+                    if dist.get(w, float('inf')) > via:
+                        added.append((u, w, via))
+            return added
+
+        def priority(v):
+            degree = sum(1 for u in in_edges[v] if not contracted[u]) + \
+                sum(1 for w in out_edges[v] if not contracted[w])
+            # Diferença de arestas com peso dobrado, mais o número de vizinhos já contraídos
+            return 2 * (len(needed_shortcuts(v)) - degree) + deleted_neighbors[v]
+
+        queue = [(priority(v), v) for v in range(n)]
+        heapq.heapify(queue)
+        rank = np.empty(n, dtype=np.int64)
+        order = 0
+        while queue:
+            _, v = heapq.heappop(queue)
+            # Atualização preguiçosa: recalcular e reinserir se deixou de ser o mínimo
+            current = priority(v)
+            if queue and current > queue[0][0]:
+                heapq.heappush(queue, (current, v))
+                continue
+
+            for u, w, cost in needed_shortcuts(v):
+                if cost < out_edges[u].get(w, float('inf')):
+                    out_edges[u][w] = cost
+                    in_edges[w][u] = cost
+                    shortcuts[(u, w)] = v
+            contracted[v] = True
+            rank[v] = order
+            order += 1
+            for neighbor in set(in_edges[v]) | set(out_edges[v]):
+                if not contracted[neighbor]:
+                    deleted_neighbors[neighbor] += 1
+
+        # Separar as arestas finais em grafo ascendente direto e reverso
+        up_edges, down_edges = [], []
+        for u in range(n):
+            for w, cost in out_edges[u].items():
+                if rank[w] > rank[u]:
+                    up_edges.append((u, w, cost))
+                else:
+                    down_edges.append((w, u, cost))
+        logger.info(f"Contraction Hierarchies: {len(shortcuts)} atalhos criados para {n} nós.")
+        return cls(cg, rank, cls._to_csr(n, up_edges), cls._to_csr(n, down_edges), shortcuts, weight=weight)
+
+    @staticmethod
+    def _to_csr(n, edges):
+        edges.sort(key=lambda edge: edge[0])
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(np.array([edge[0] for edge in edges], dtype=np.int64), minlength=n), out=indptr[1:])
+        indices = np.array([edge[1] for edge in edges], dtype=np.int32)
+        weights = np.array([edge[2] for edge in edges], dtype=np.float64)
+        return indptr, indices, weights
+
+    def shortest_path(self, source, target, stats=None):
+        """
+        Consulta bidirecional ascendente, seguida do desempacotamento dos atalhos.
+
+        Args:
+            source (int): Índice compacto do nó de origem.
+            target (int): Índice compacto do nó de destino.
+            stats (SearchStats): Contadores de esforço a atualizar (opcional).
+
+        Returns:
+            list: Índices compactos dos nós do caminho mínimo no grafo original.
+
+        Raises:
+            nx.NetworkXNoPath: Se não houver caminho entre source e target.
+        """
+        if source == target:
+            return [source]
+        directions = (
+            (memoryview(self.up_indptr), memoryview(self.up_indices), memoryview(self.up_weights)),
+            (memoryview(self.down_indptr), memoryview(self.down_indices), memoryview(self.down_weights)),
+        )
+        dists = ({source: 0.0}, {target: 0.0})
+        parents = ({source: None}, {target: None})
+        queues = ([(0.0, source)], [(0.0, target)])
+        best_cost = float('inf')
+        meeting_node = None
+        settled = relaxed = pops = dropped = 0
+        peak = 2
+
+        while queues[0] or queues[1]:
+            for side in (0, 1):
+                queue = queues[side]
+                # Cada sentido para quando o topo da fila não pode melhorar o melhor custo
+                if not queue or queue[0][0] >= best_cost:
+                    dropped += len(queue)
+                    queue.clear()
+                    continue
+                d, u = heapq.heappop(queue)
+                pops += 1
+                dist = dists[side]
+                if d > dist[u]:
+                    continue
+                settled += 1
+                other = dists[1 - side]
+                if u in other and d + other[u] < best_cost:
+                    best_cost = d + other[u]
+                    meeting_node = u
+                indptr, indices, weights = directions[side]
+                relaxed += indptr[u + 1] - indptr[u]
+                for i in range(indptr[u], indptr[u + 1]):
+                    v = indices[i]
+                    nd = d + weights[i]
+                    if nd < dist.get(v, float('inf')):
+                        dist[v] = nd
+                        parents[side][v] = u
+                        heapq.heappush(queue, (nd, v))
+                if len(queues[0]) + len(queues[1]) > peak:
+                    peak = len(queues[0]) + len(queues[1])
+
+        if stats is not None:
+            # O espaço de busca capturado são os nós rotulados da hierarquia nos dois sentidos
+            stats.record(settled, relaxed, pops + dropped, pops, peak,
+                         meeting_position=None if meeting_node is None else
+                         (dists[0][meeting_node] / best_cost if best_cost > 0 else 0.0),
+                         space=lambda: (dists[0].keys(), dists[1].keys()))
+        if meeting_node is None:
+            raise nx.NetworkXNoPath(f"Nenhuma rota encontrada entre {source} e {target} usando Contraction Hierarchies.")
+
+        # Caminho na hierarquia: origem -> nó de encontro -> destino
+        path = []
+        node = meeting_node
+        while node is not None:
+            path.append(node)
+            node = parents[0][node]
+        path.reverse()
+        node = parents[1][meeting_node]
+        while node is not None:
+            path.append(node)
+            node = parents[1][node]
+        return self.unpack(path)
+
+    def unpack(self, path):
+        """
+        Substitui recursivamente cada atalho (u, w) pelo par (u, v), (v, w).
+        """
+        result = [path[0]]
+        for u, w in zip(path[:-1], path[1:]):
+            stack = [(u, w)]
+            while stack:
+                a, b = stack.pop()
+                mid = self.shortcuts.get((a, b))
+                if mid is None:
+                    result.append(b)
+                else:
+                    stack.append((mid, b))
+                    stack.append((a, mid))
+        return result
+
+    def to_arrays(self):
+        """
+        Retorna os vetores que definem a hierarquia pelo nome usado no arquivo .npz.
+        """
+        return {
+            'node_ids': self.cg.node_ids,
+            'rank': self.rank,
+            'up_indptr': self.up_indptr,
+            'up_indices': self.up_indices,
+            'up_weights': self.up_weights,
+            'down_indptr': self.down_indptr,
+            'down_indices': self.down_indices,
+            'down_weights': self.down_weights,
+            'shortcut_edges': np.array(list(self.shortcuts.keys()), dtype=np.int64).reshape(-1, 2),
+            'shortcut_middle': np.array(list(self.shortcuts.values()), dtype=np.int64),
+            'weight': np.array(self.weight),
+        }
+
+    @classmethod
+    def from_arrays(cls, cg, arrays):
+        """
+        Reconstrói a hierarquia a partir dos vetores retornados por 'to_arrays'.
+
+        Raises:
+            ValueError: Se a hierarquia foi construída para outro grafo.
+        """
+        if not np.array_equal(arrays['node_ids'], cg.node_ids):
+            raise ValueError("A hierarquia não corresponde ao grafo informado.")
+        shortcuts = {
+            (u, w): mid
+            for (u, w), mid in zip(arrays['shortcut_edges'].tolist(), arrays['shortcut_middle'].tolist())
+        }
+        return cls(
+            cg,
+            arrays['rank'],
+            (arrays['up_indptr'], arrays['up_indices'], arrays['up_weights']),
+            (arrays['down_indptr'], arrays['down_indices'], arrays['down_weights']),
+            shortcuts,
+            weight=str(arrays['weight'])
+        )
+
+    def save(self, path):
+        """
+        Salva a hierarquia em um arquivo .npz.
+        """
+        with open(path, 'wb') as f:
+            np.savez(f, **self.to_arrays())
+
+    @classmethod
+    def load(cls, cg, path):
+        """
+        Carrega uma hierarquia salva com 'save'.
+
+        Raises:
+            ValueError: Se a hierarquia foi construída para outro grafo.
+        """
+        with np.load(path) as data:
+            return cls.from_arrays(cg, data)
+
+def ch_path(cg, source, target, weight='length', hierarchy=None, stats=None):
+    """
+    Adaptador com a mesma assinatura dos algoritmos de compact_search.
+
+    Raises:
+        ValueError: Se nenhuma hierarquia do perfil 'weight' for informada.
+    """
+    if hierarchy is None:
+        raise ValueError("O algoritmo 'ch' requer uma ContractionHierarchy pré-calculada.")
+    if hierarchy.weight != weight:
+        raise ValueError(f"A ContractionHierarchy foi construída para o perfil '{hierarchy.weight}', não '{weight}'.")
+    return hierarchy.shortest_path(source, target, stats=stats)
@@ -0,0 +1,107 @@
+# route_planner/cuisine_index.py
+
+import numpy as np
+import pandas as pd
+
+def normalize(value):
+    """
+    Normaliza um termo de cozinha para a busca (sem espaços nas pontas, minúsculas).
+    """
+    return value.strip().lower()
+
+class CuisineIndex:
+    """
+    Índice invertido das cozinhas de um conjunto de POIs, construído uma vez por conjunto.
+
+    Os valores distintos da coluna 'cuisine' (separados por ';') são divididos e
+    normalizados uma única vez; a expansão para as linhas é feita com NumPy, resultando em
+    uma coluna categórica de termos ('tokens', um por par linha x cozinha). As posições
+    das linhas são agrupadas por código da categoria em formato CSR ('indptr'/'rows'),
+    de modo que a consulta de uma cozinha custa O(resultados). Consultas aceitam vários
+    termos (lista ou 'a;b') e ignoram maiúsculas e minúsculas.
+
+    Args:
+        features (pandas.DataFrame): POIs com as colunas 'cuisine' e/ou 'name'.
+    """
+    def __init__(self, features):
+        self.size = len(features)
+        if 'cuisine' in features.columns:
+            value_codes, values = pd.factorize(features['cuisine'].reset_index(drop=True))
+        else:
+            value_codes, values = np.full(self.size, -1, dtype=np.int64), []
+
+        # Termos de cada valor distinto (ex.: 'Pizza; burger' -> ['pizza', 'burger'])
+        term_codes = {}
+        value_terms = []
+        for value in values:
+            terms = dict.fromkeys(term for term in (normalize(part) for part in str(value).split(';')) if term)
+            value_terms.append([term_codes.setdefault(term, len(term_codes)) for term in terms])
+        categories = sorted(term_codes)
+        # Renumerar os termos na ordem alfabética das categorias
+        remap = np.empty(len(categories), dtype=np.int64)
+        remap[[term_codes[term] for term in categories]] = np.arange(len(categories))
+        lengths = np.array([len(terms) for terms in value_terms], dtype=np.int64)
+        flat = remap[np.array([code for terms in value_terms for code in terms], dtype=np.int64)]
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+
+        # Expansão: uma entrada por par (linha, termo), com as linhas em ordem crescente
+        rows = np.flatnonzero(value_codes >= 0)
+        counts = lengths[value_codes[rows]] if len(lengths) else np.zeros(0, dtype=np.int64)
+        row_of_entry = np.repeat(rows, counts)
+        first_entry = np.repeat(np.cumsum(counts) - counts, counts)
+        entry_terms = flat[np.repeat(offsets[value_codes[rows]], counts) + np.arange(len(row_of_entry)) - first_entry]
+
+        self.tokens = pd.Categorical.from_codes(entry_terms, categories=categories)
+        # Ordenação estável por termo: as linhas de cada termo continuam em ordem crescente
+        order = np.argsort(entry_terms, kind='stable')
+        self.rows = row_of_entry[order]
+        self.indptr = np.zeros(len(categories) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(entry_terms, minlength=len(categories)), out=self.indptr[1:])
+        self.codes = {category: code for code, category in enumerate(categories)}
+
+        self._features = features
+        self._names = None
+
+    def __contains__(self, cuisine):
+        return normalize(cuisine) in self.codes
+
+    def counts(self):
+        """
+        Retorna o número de POIs de cada cozinha (termo normalizado).
+        """
+        sizes = np.diff(self.indptr)
+        return {category: int(size) for category, size in zip(self.tokens.categories, sizes)}
+
+    def lookup(self, cuisines):
+        """
+        Retorna as posições (ordenadas) das linhas com qualquer uma das cozinhas informadas.
+
+        Args:
+            cuisines (str or list): Cozinha, termos separados por ';' ou lista de termos.
+
+        Returns:
+            numpy.ndarray: Posições das linhas no conjunto de POIs.
+        """
+        terms = cuisines.split(';') if isinstance(cuisines, str) else cuisines
+        parts = []
+        for term in terms:
+            code = self.codes.get(normalize(term))
+            if code is not None:
+                parts.append(self.rows[self.indptr[code]:self.indptr[code + 1]])
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+
+    def search_names(self, substring):
+        """
+        Retorna as posições das linhas cujo nome contém o texto informado (sem diferenciar
+        maiúsculas e minúsculas). A busca é vetorizada sobre os nomes já normalizados.
+        """
+        if self._names is None:
+            if 'name' in self._features.columns:
+                names = self._features['name'].reset_index(drop=True).fillna('').astype(str)
+            else:
+                names = pd.Series([''] * self.size)
+            self._names = names.str.lower()
+        matches = self._names.str.contains(normalize(substring), regex=False).to_numpy()
+        return np.flatnonzero(matches)
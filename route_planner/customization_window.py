@@ -16,9 +16,12 @@ class CustomizationWindow:
         main_frame = ttk.Frame(self.top, padding="10")
         main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
-        algorithms = ['dijkstra', 'astar', 'bellman_ford', 'bidirectional_dijkstra', 'bidirectional_a_star']
+        algorithms = ['dijkstra', 'astar', 'bellman_ford', 'bidirectional_dijkstra', 'bidirectional_a_star',
+                      'alt', 'bidirectional_alt', 'ch']
         self.color_vars = {}
         self.style_vars = {}
+        self.run_vars = {}
+        selected = self.preferences.selected_algorithms()
 
         # Opções de cores e estilos
         for idx, alg in enumerate(algorithms):
@@ -39,14 +42,24 @@ class CustomizationWindow:
             style_combo.grid(row=idx, column=3, sticky=tk.W)
             ttk.Label(main_frame, text="Estilo da Linha").grid(row=idx, column=4, sticky=tk.W)
 
+            # Marcar o algoritmo para execução (ALT e CH constroem pré-processamento por área)
+            run_var = tk.BooleanVar(value=alg in selected)
+            self.run_vars[alg] = run_var
+            ttk.Checkbutton(main_frame, text="Executar", variable=run_var).grid(row=idx, column=5, sticky=tk.W)
+
         # Botão para salvar as preferências
         save_button = ttk.Button(main_frame, text="Salvar", command=self.save_preferences)
-        save_button.grid(row=len(algorithms), column=0, columnspan=5, pady=10)
+        save_button.grid(row=len(algorithms), column=0, columnspan=6, pady=10)
 
     def save_preferences(self):
         for alg in self.color_vars:
             self.preferences.preferences['visualization'][alg]['color'] = self.color_vars[alg].get()
             self.preferences.preferences['visualization'][alg]['style'] = self.style_vars[alg].get()
+        algorithms = [alg for alg, run_var in self.run_vars.items() if run_var.get()]
+        if not algorithms:
+            messagebox.showwarning("Aviso", "Selecione ao menos um algoritmo.")
+            return
+        self.preferences.preferences['algorithms'] = algorithms
         self.preferences.save_preferences()
         messagebox.showinfo("Informação", "Preferências salvas com sucesso.")
         self.top.destroy()
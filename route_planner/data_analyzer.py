@@ -7,18 +7,37 @@ import seaborn as sns
 from scipy.stats import pearsonr
 import os
 
+from route_planner.results_store import DEFAULT_RESULTS_PATH, ResultsStore
+
 class DataAnalyzer:
-    def __init__(self, csv_file='resultados.csv'):
+    """
+    Gráficos e análise estatística dos tempos de execução.
+
+    Os dados vêm do banco de resultados (ver ResultsStore), lidos já filtrados por
+    'filters' (ex.: {'source': 'gui', 'min_nodes': 1000}); com 'csv_file', de uma
+    planilha no formato antigo.
+    """
+    def __init__(self, store_path=DEFAULT_RESULTS_PATH, filters=None, csv_file=None):
+        self.store_path = store_path
+        self.filters = filters or {}
         self.csv_file = csv_file
         self.data = None
         self.algorithms = ['Dijkstra', 'Astar', 'Bellman ford', 'Bidirectional dijkstra', 'Bidirectional a star']
 
     def load_data(self):
-        if os.path.isfile(self.csv_file):
+        path = self.csv_file or self.store_path
+        if not os.path.isfile(path):
+            print(f"O arquivo {path} não foi encontrado.")
+            return False
+        if self.csv_file is not None:
             self.data = pd.read_csv(self.csv_file)
         else:
-            print(f"O arquivo {self.csv_file} não foi encontrado.")
-            return False
+            with ResultsStore(self.store_path) as store:
+                self.data = store.frame(**self.filters)
+        # Algoritmos sem nenhum tempo registrado ficam com colunas vazias
+        for alg in self.algorithms:
+            if f'Tempo Médio {alg} (s)' not in self.data:
+                self.data[f'Tempo Médio {alg} (s)'] = np.nan
         return True
 
     def generate_plots(self):
@@ -0,0 +1,253 @@
+# route_planner/distance_matrix.py
+
+import heapq
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from route_planner.logger import logger
+from route_planner.compact_graph import CompactGraph
+from route_planner.compact_search import one_to_many
+from route_planner.contraction_hierarchy import ContractionHierarchy
+from route_planner.shared_arrays import SharedArrays, attach_arrays, prefixed, unprefixed
+
+# Abaixo deste número de origens o custo de iniciar os processos supera o ganho
+PARALLEL_MIN_SOURCES = 32
+
+STRATEGIES = ('auto', 'one_to_many', 'buckets')
+
+# Estado de cada processo auxiliar (ver 'distance_matrix')
+_worker_state = {}
+
+def _upward_search(indptr, indices, weights, source):
+    """
+    Dijkstra completo sobre um dos grafos ascendentes da hierarquia.
+
+    Returns:
+        list: Pares (nó, distância) na ordem em que foram fixados.
+    """
+    dist = {source: 0.0}
+    settled = []
+    queue = [(0.0, source)]
+    while queue:
+        d, u = heapq.heappop(queue)
+        if d > dist[u]:
+            continue
+        settled.append((u, d))
+        for i in range(indptr[u], indptr[u + 1]):
+            v = indices[i]
+            nd = d + weights[i]
+            if nd < dist.get(v, float('inf')):
+                dist[v] = nd
+                heapq.heappush(queue, (nd, v))
+    return settled
+
+def build_buckets(hierarchy, targets):
+    """
+    Fase reversa do método de buckets: uma busca ascendente reversa a partir de cada
+    destino, registrando (coluna, distância) no bucket de cada nó alcançado.
+
+    Args:
+        hierarchy (ContractionHierarchy): Hierarquia do grafo.
+        targets (list): Índices compactos dos destinos (um por coluna).
+
+    Returns:
+        dict: Buckets em formato CSR por nó ('indptr', 'columns', 'dists').
+    """
+    down = (memoryview(hierarchy.down_indptr), memoryview(hierarchy.down_indices),
+            memoryview(hierarchy.down_weights))
+    nodes, columns, dists = [], [], []
+    for column, target in enumerate(targets):
+        for node, d in _upward_search(*down, target):
+            nodes.append(node)
+            columns.append(column)
+            dists.append(d)
+    nodes = np.array(nodes, dtype=np.int64)
+    order = np.argsort(nodes, kind='stable')
+    indptr = np.zeros(hierarchy.cg.number_of_nodes() + 1, dtype=np.int64)
+    np.cumsum(np.bincount(nodes, minlength=hierarchy.cg.number_of_nodes()), out=indptr[1:])
+    return {
+        'indptr': indptr,
+        'columns': np.array(columns, dtype=np.int64)[order],
+        'dists': np.array(dists, dtype=np.float64)[order],
+    }
+
+def bucket_rows(hierarchy, buckets, sources, num_targets):
+    """
+    Fase direta do método de buckets: uma busca ascendente a partir de cada origem,
+    combinando cada nó fixado com as entradas do seu bucket.
+
+    Returns:
+        numpy.ndarray: Matriz (origens x destinos) de distâncias (inf se inalcançável).
+    """
+    up = (memoryview(hierarchy.up_indptr), memoryview(hierarchy.up_indices), memoryview(hierarchy.up_weights))
+    bucket_indptr = memoryview(buckets['indptr'])
+    bucket_columns = memoryview(buckets['columns'])
+    bucket_dists = memoryview(buckets['dists'])
+    rows = np.full((len(sources), num_targets), np.inf)
+    for i, source in enumerate(sources):
+        row = [float('inf')] * num_targets
+        for u, d in _upward_search(*up, source):
+            for k in range(bucket_indptr[u], bucket_indptr[u + 1]):
+                column = bucket_columns[k]
+                nd = d + bucket_dists[k]
+                if nd < row[column]:
+                    row[column] = nd
+        rows[i] = row
+    return rows
+
+def one_to_many_rows(cg, sources, targets, weight='length'):
+    """
+    Uma busca de origem única por origem, encerrada quando todos os destinos alcançáveis
+    forem fixados.
+
+    Returns:
+        numpy.ndarray: Matriz (origens x destinos) de distâncias (inf se inalcançável).
+    """
+    columns = {target: column for column, target in enumerate(targets)}
+    rows = np.full((len(sources), len(targets)), np.inf)
+    for i, source in enumerate(sources):
+        _, nearest = one_to_many(cg, source, columns.keys(), weight=weight)
+        for dist, node in nearest:
+            rows[i, columns[node]] = dist
+    return rows
+
+def _init_worker(spec, strategy, num_targets, weight):
+    shm, arrays = attach_arrays(spec)
+    cg = CompactGraph.from_arrays(unprefixed('graph_', arrays))
+    _worker_state.update(shm=shm, cg=cg, strategy=strategy, num_targets=num_targets, weight=weight)
+    if strategy == 'buckets':
+        _worker_state['hierarchy'] = ContractionHierarchy.from_arrays(cg, unprefixed('ch_', arrays))
+        _worker_state['buckets'] = unprefixed('bucket_', arrays)
+    else:
+        _worker_state['targets'] = arrays['targets'].tolist()
+
+def _worker_rows(sources):
+    state = _worker_state
+    if state['strategy'] == 'buckets':
+        return bucket_rows(state['hierarchy'], state['buckets'], sources, state['num_targets'])
+    return one_to_many_rows(state['cg'], sources, state['targets'], weight=state['weight'])
+
+class DistanceMatrix:
+    """
+    Resultado de 'distance_matrix': matriz de distâncias entre origens e destinos, com a
+    recuperação dos caminhos sob demanda.
+
+    Atributos:
+        sources (list): Identificadores (OSM) dos nós de origem, um por linha.
+        targets (list): Identificadores (OSM) dos nós de destino, um por coluna.
+        distances (numpy.ndarray): Matriz (origens x destinos); inf para pares sem caminho.
+        strategy (str): Estratégia utilizada ('one_to_many' ou 'buckets').
+    """
+    def __init__(self, cg, sources, targets, distances, strategy, weight='length', hierarchy=None):
+        self.cg = cg
+        self.sources = list(sources)
+        self.targets = list(targets)
+        self.distances = distances
+        self.strategy = strategy
+        self.weight = weight
+        self.hierarchy = hierarchy
+        self._trees = {}
+
+    def path(self, i, j):
+        """
+        Retorna o caminho da origem 'i' ao destino 'j' (posições na matriz).
+
+        Com a hierarquia, cada caminho é uma consulta CH; sem ela, a árvore de caminhos
+        mínimos da origem é calculada uma vez e reaproveitada para todos os destinos da linha.
+
+        Returns:
+            list or None: Identificadores dos nós do caminho, ou None se não houver caminho.
+        """
+        if not np.isfinite(self.distances[i, j]):
+            return None
+        cg = self.cg
+        source, target = cg.index_of(self.sources[i]), cg.index_of(self.targets[j])
+        if self.hierarchy is not None:
+            return cg.to_node_ids(self.hierarchy.shortest_path(source, target))
+        if i not in self._trees:
+            targets = {cg.index_of(node) for node in self.targets}
+            self._trees[i] = one_to_many(cg, source, targets, weight=self.weight)[0]
+        return cg.to_node_ids(self._trees[i].path_to(target))
+
+    def paths(self):
+        """
+        Retorna todos os caminhos, como lista de linhas (None para pares sem caminho).
+        """
+        return [[self.path(i, j) for j in range(len(self.targets))] for i in range(len(self.sources))]
+
+def distance_matrix(cg, sources, targets, strategy='auto', hierarchy=None, workers=None, weight='length'):
+    """
+    Calcula a matriz de distâncias mínimas entre conjuntos de origens e destinos.
+
+    Estratégias:
+        'one_to_many': uma busca de origem única por origem, parando ao fixar todos os destinos.
+        'buckets': método de buckets sobre Contraction Hierarchies; uma busca ascendente
+            reversa por destino preenche os buckets, e cada origem faz apenas uma busca
+            ascendente direta, muito menor que um Dijkstra completo.
+        'auto': 'buckets' quando uma hierarquia é informada, senão 'one_to_many'.
+
+    Origens e destinos repetidos são calculados uma única vez. Com 'workers' > 1 e ao menos
+    PARALLEL_MIN_SOURCES origens, as linhas são distribuídas entre processos que acessam o
+    grafo (e a hierarquia e os buckets) em memória compartilhada.
+
+    Args:
+        cg (CompactGraph): Grafo compacto.
+        sources (list): Identificadores (OSM) dos nós de origem.
+        targets (list): Identificadores (OSM) dos nós de destino.
+        strategy (str): Estratégia (ver acima).
+        hierarchy (ContractionHierarchy): Hierarquia para a estratégia 'buckets'.
+        workers (int): Número de processos (None ou 1 para execução serial).
+        weight (str): Perfil de peso das arestas.
+
+    Returns:
+        DistanceMatrix: Matriz de distâncias e acesso aos caminhos.
+
+    Raises:
+        ValueError: Se a estratégia for inválida ou 'buckets' não tiver hierarquia compatível.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Estratégia '{strategy}' não suportada.")
+    if strategy == 'auto':
+        strategy = 'buckets' if hierarchy is not None and hierarchy.weight == weight else 'one_to_many'
+    if strategy == 'buckets' and (hierarchy is None or hierarchy.weight != weight):
+        raise ValueError(f"A estratégia 'buckets' requer uma ContractionHierarchy do perfil '{weight}'.")
+
+    unique_sources = list(dict.fromkeys(cg.index_of(node) for node in sources))
+    unique_targets = list(dict.fromkeys(cg.index_of(node) for node in targets))
+    arrays = None
+    buckets = None
+    if strategy == 'buckets':
+        buckets = build_buckets(hierarchy, unique_targets)
+
+    if workers is not None and workers > 1 and len(unique_sources) >= PARALLEL_MIN_SOURCES:
+        arrays = prefixed('graph_', cg.to_arrays())
+        if strategy == 'buckets':
+            arrays.update(prefixed('ch_', hierarchy.to_arrays()))
+            arrays.update(prefixed('bucket_', buckets))
+        else:
+            arrays['targets'] = np.array(unique_targets, dtype=np.int64)
+        chunks = [unique_sources[i::workers * 4] for i in range(min(len(unique_sources), workers * 4))]
+        # 'spawn' evita copiar o estado da interface (threads do Tkinter) com fork
+        context = multiprocessing.get_context('spawn')
+        with SharedArrays(arrays) as shared:
+            logger.info(f"Matriz {len(unique_sources)}x{len(unique_targets)} ({strategy}) em {workers} processos.")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                     initargs=(shared.spec, strategy, len(unique_targets), weight)) as pool:
+                results = list(pool.map(_worker_rows, chunks))
+        rows = np.empty((len(unique_sources), len(unique_targets)))
+        for i, chunk_rows in enumerate(results):
+            rows[i::workers * 4] = chunk_rows
+    elif strategy == 'buckets':
+        rows = bucket_rows(hierarchy, buckets, unique_sources, len(unique_targets))
+    else:
+        rows = one_to_many_rows(cg, unique_sources, unique_targets, weight=weight)
+
+    # Expandir para as origens e destinos repetidos
+    row_of = {node: i for i, node in enumerate(unique_sources)}
+    column_of = {node: j for j, node in enumerate(unique_targets)}
+    distances = rows[np.ix_([row_of[cg.index_of(node)] for node in sources],
+                            [column_of[cg.index_of(node)] for node in targets])]
+    return DistanceMatrix(cg, sources, targets, distances, strategy, weight=weight,
+                          hierarchy=hierarchy if strategy == 'buckets' else None)
@@ -1,18 +1,224 @@
 # route_planner/geocoder.py
 
+import json
+import os
+import sqlite3
+import threading
 import time
+
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
-from functools import lru_cache
+
+from route_planner.logger import logger
+
+def normalize_address(address):
+    """
+    Normaliza um endereço para a chave do cache (espaços colapsados, sem diferenciar
+    maiúsculas e minúsculas).
+    """
+    return ' '.join(address.split()).casefold()
+
+class TokenBucket:
+    """
+    Limitador de taxa por balde de fichas: cada requisição consome uma ficha, e as fichas
+    são repostas a 'rate' por segundo até 'capacity'. Só há espera quando o balde está
+    vazio, isto é, quando o limite realmente exige.
+
+    Args:
+        rate (float): Fichas repostas por segundo.
+        capacity (float): Número máximo de fichas acumuladas.
+        clock (callable): Relógio monotônico, em segundos.
+        sleep (callable): Função de espera, em segundos.
+    """
+    def __init__(self, rate, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(capacity)
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Consome uma ficha, aguardando apenas o necessário.
+
+        Returns:
+            float: Tempo de espera, em segundos.
+        """
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = 0.0
+            if self.tokens < 1:
+                wait = (1 - self.tokens) / self.rate
+                self.sleep(wait)
+                self.tokens = 1.0
+                self.updated = now + wait
+            self.tokens -= 1
+            return wait
+
+class NominatimBackend:
+    """
+    Consulta ao Nominatim com um único cliente (e, portanto, uma única sessão HTTP
+    reaproveitada entre as requisições), limitado a 1 requisição por segundo.
+
+    Args:
+        user_agent (str): Identificação da aplicação exigida pela política de uso.
+        rate (float): Requisições por segundo.
+        country_codes (str): Países aceitos nos resultados.
+        limit (int): Número máximo de resultados por endereço.
+        timeout (int): Tempo limite de cada requisição, em segundos.
+    """
+    def __init__(self, user_agent="sua_aplicacao/1.0 (seu_email@example.com)", rate=1.0,
+                 country_codes='br', limit=5, timeout=10):
+        self.geolocator = Nominatim(user_agent=user_agent)
+        self.bucket = TokenBucket(rate)
+        self.country_codes = country_codes
+        self.limit = limit
+        self.timeout = timeout
+        self.name = f"nominatim:{country_codes}:{limit}"
+
+    def geocode(self, address):
+        """
+        Retorna a lista de resultados (latitude, longitude, endereço completo) do endereço.
+
+        Raises:
+            GeocoderTimedOut, GeocoderServiceError: Em falhas do serviço.
+        """
+        self.bucket.acquire()
+        locations = self.geolocator.geocode(
+            address,
+            exactly_one=False,
+            limit=self.limit,
+            country_codes=self.country_codes,
+            timeout=self.timeout
+        )
+        return [(loc.latitude, loc.longitude, loc.address) for loc in locations or []]
+
+class GazetteerBackend:
+    """
+    Geocodificação local a partir de uma tabela de endereços conhecidos, sem acesso à rede
+    (testes, execuções offline).
+
+    Args:
+        entries (dict): Endereço -> lista de (latitude, longitude, endereço completo).
+    """
+    name = 'gazetteer'
+
+    def __init__(self, entries):
+        self.entries = {normalize_address(address): [tuple(result) for result in results]
+                        for address, results in entries.items()}
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Carrega a tabela de um arquivo JSON no formato {"endereço": [[lat, lon, "nome"], ...]}.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def geocode(self, address):
+        return list(self.entries.get(normalize_address(address), []))
+
+class GeocodeCache:
+    """
+    Cache persistente dos resultados de geocodificação em SQLite, indexado por (backend,
+    endereço normalizado). Endereços não encontrados também são armazenados (lista vazia);
+    falhas do serviço não são. As consultas já feitas na sessão são servidas de um
+    dicionário em memória, sem acesso ao banco.
+
+    Args:
+        path (str): Arquivo do banco (':memory:' para um cache apenas da sessão).
+    """
+    def __init__(self, path='cache/geocodificacao.sqlite'):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._memory = {}
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS geocodes ("
+                "backend TEXT NOT NULL, query TEXT NOT NULL, results TEXT NOT NULL, updated REAL NOT NULL, "
+                "PRIMARY KEY (backend, query))"
+            )
+
+    def get(self, backend, query):
+        """
+        Retorna a lista de resultados armazenada, ou None se o endereço não estiver no cache.
+        """
+        key = (backend, query)
+        results = self._memory.get(key)
+        if results is not None:
+            return results
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT results FROM geocodes WHERE backend = ? AND query = ?", key
+            ).fetchone()
+        if row is None:
+            return None
+        results = self._memory[key] = [tuple(result) for result in json.loads(row[0])]
+        return results
+
+    def put(self, backend, query, results):
+        self._memory[(backend, query)] = results
+        try:
+            with self._lock, self._connection:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO geocodes (backend, query, results, updated) VALUES (?, ?, ?, ?)",
+                    (backend, query, json.dumps(results, ensure_ascii=False), time.time())
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao salvar a geocodificação no cache: {e}")
+
+    def close(self):
+        self._connection.close()
 
 class GeoCoder:
     """
-    Classe para geocodificar endereços utilizando o Nominatim.
+    Classe para geocodificar endereços, com backend intercambiável (Nominatim por padrão)
+    e cache persistente dos resultados.
+
+    Args:
+        backend: Objeto com o atributo 'name' e o método 'geocode(address)', que retorna a
+            lista de (latitude, longitude, endereço completo). Padrão: NominatimBackend.
+        cache (GeocodeCache): Cache de resultados. Padrão: cache apenas em memória.
     """
+    _default = None
+
+    def __init__(self, backend=None, cache=None):
+        self.backend = NominatimBackend() if backend is None else backend
+        self.cache = GeocodeCache(':memory:') if cache is None else cache
+
+    @classmethod
+    def default(cls):
+        """
+        Instância compartilhada pela aplicação (Nominatim, cache em 'cache/geocodificacao.sqlite').
+        """
+        if cls._default is None:
+            cls._default = cls(cache=GeocodeCache())
+        return cls._default
 
     @staticmethod
-    @lru_cache(maxsize=1000)
     def geocode_address(address):
+        """
+        Geocodifica um endereço com a instância padrão (ver 'geocode').
+        """
+        return GeoCoder.default().geocode(address)
+
+    @staticmethod
+    def _as_result(results):
+        if not results:
+            return None
+        if len(results) == 1:
+            return results[0]
+        # Retornar todos os resultados encontrados
+        return list(results)
+
+    def geocode(self, address):
         """
         Geocodifica um endereço e retorna suas coordenadas geográficas.
 
@@ -22,40 +228,46 @@ class GeoCoder:
         Returns:
             tuple or list: Se apenas um endereço for encontrado, retorna uma tupla com
             (latitude, longitude, endereço completo). Se múltiplos endereços forem encontrados,
-            retorna uma lista de tais tuplas.
+            retorna uma lista de tais tuplas. None se nenhum for encontrado ou em caso de erro.
         """
-        # Utilizar um user_agent único e informativo
-        geolocator = Nominatim(user_agent="sua_aplicacao/1.0 (seu_email@example.com)")
+        query = normalize_address(address)
+        results = self.cache.get(self.backend.name, query)
+        if results is None:
+            try:
+                results = self.backend.geocode(address)
+            except GeocoderTimedOut:
+                print("O serviço de geocodificação demorou muito para responder. Por favor, tente novamente mais tarde.")
+                return None
+            except GeocoderServiceError as e:
+                print(f"Erro no serviço de geocodificação: {e}")
+                return None
+            except Exception as e:
+                print(f"Erro ao geocodificar o endereço: {e}")
+                return None
+            self.cache.put(self.backend.name, query, results)
 
-        # Respeitar o limite de 1 requisição por segundo
-        time.sleep(1)
+        if not results:
+            print("Endereço não encontrado. Tente novamente.")
+        return self._as_result(results)
 
-        try:
-            # Reduzir o limite de resultados para minimizar a carga no servidor
-            locations = geolocator.geocode(
-                address,
-                exactly_one=False,
-                limit=5,
-                country_codes='br',
-                timeout=10  # Aumentar o tempo limite para 10 segundos
-            )
+    def geocode_many(self, addresses):
+        """
+        Geocodifica uma lista de endereços. Endereços repetidos (após a normalização) e já
+        presentes no cache não geram requisições; os demais são enviados ao backend em
+        sequência, respeitando o limite de taxa.
 
-            if not locations:
-                print("Endereço não encontrado. Tente novamente.")
-                return None
-            elif len(locations) == 1:
-                location = locations[0]
-                return (location.latitude, location.longitude, location.address)
-            else:
-                # Retornar todos os resultados encontrados
-                return [(loc.latitude, loc.longitude, loc.address) for loc in locations]
-
-        except GeocoderTimedOut:
-            print("O serviço de geocodificação demorou muito para responder. Por favor, tente novamente mais tarde.")
-            return None
-        except GeocoderServiceError as e:
-            print(f"Erro no serviço de geocodificação: {e}")
-            return None
-        except Exception as e:
-            print(f"Erro ao geocodificar o endereço: {e}")
-            return None
+        Args:
+            addresses (iterable): Endereços.
+
+        Returns:
+            dict: Endereço -> resultado, no mesmo formato de 'geocode'.
+        """
+        results = {}
+        by_query = {}
+        for address in addresses:
+            query = normalize_address(address)
+            if query not in by_query:
+                by_query[query] = self.geocode(address)
+            results[address] = by_query[query]
+        logger.info(f"{len(by_query)} endereços distintos geocodificados em lote.")
+        return results
@@ -0,0 +1,242 @@
+# route_planner/graph_cache.py
+
+import contextlib
+import os
+import json
+import math
+import pickle
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import networkx as nx
+import numpy as np
+from pyproj import Transformer
+
+from route_planner.compact_graph import CompactGraph
+from route_planner.logger import logger
+
+# Raio médio da Terra em metros (o mesmo usado pelo OSMnx para montar o bbox)
+EARTH_RADIUS_M = 6_371_009
+
+def bbox_from_point(origin_point, radius):
+    """
+    Calcula o bbox de 'radius' metros em torno da origem, como ox.graph_from_point.
+
+    Args:
+        origin_point (tuple): Coordenadas (latitude, longitude) da origem.
+        radius (float): Distância em metros.
+
+    Returns:
+        tuple: (sul, norte, oeste, leste) em graus.
+    """
+    lat, lon = origin_point
+    delta_lat = (radius / EARTH_RADIUS_M) * (180 / math.pi)
+    delta_lon = delta_lat / math.cos(math.radians(lat))
+    return lat - delta_lat, lat + delta_lat, lon - delta_lon, lon + delta_lon
+
+class GraphCache:
+    """
+    Armazenamento local dos grafos projetados, indexado por (origem arredondada, raio,
+    tipo de rede, fonte). Cada entrada guarda o grafo serializado com pickle, o grafo compacto
+    em .npz e a densidade já calculada. Um raio menor pode ser atendido recortando uma
+    entrada de raio maior com a mesma origem e fonte.
+
+    A fonte ('source') identifica grafos lidos de arquivos locais (ver
+    GraphHandler.cache_source); None indica o grafo baixado do OpenStreetMap.
+    """
+    INDEX_FILE = 'indice.json'
+
+    def __init__(self, cache_dir='cache/grafos', precision=4):
+        self.cache_dir = cache_dir
+        self.precision = precision
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, origin_point, radius, network_type='drive', source=None):
+        """
+        Gera a chave da entrada a partir da origem arredondada, do raio, do tipo de rede e
+        da fonte do grafo.
+        """
+        lat, lon = (round(coord, self.precision) for coord in origin_point)
+        key = f"{lat:.{self.precision}f}_{lon:.{self.precision}f}_{int(radius)}_{network_type}"
+        return key if source is None else f"{key}_{source}"
+
+    def load_index(self):
+        """
+        Carrega o índice das entradas armazenadas.
+        """
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return {}
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Índice do cache de grafos inválido, ignorando: {e}")
+            return {}
+
+    @contextlib.contextmanager
+    def _index_lock(self):
+        # Trava de arquivo ao lado do índice, exclusiva entre processos e threads
+        with open(os.path.join(self.cache_dir, f"{self.INDEX_FILE}.lock"), 'a+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _update_index(self, key, entry):
+        """
+        Acrescenta (ou substitui) uma entrada do índice. A leitura e a escrita são feitas sob
+        uma trava de arquivo, para que lotes, servidor e interface gravando no mesmo cache ao
+        mesmo tempo não descartem as entradas uns dos outros.
+        """
+        with self._index_lock():
+            index = self.load_index()
+            index[key] = entry
+            self._write_index(index)
+
+    def _write_index(self, index):
+        # Escrever em arquivo temporário e substituir, para não corromper o índice
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, index_path)
+
+    def entry_path(self, key, suffix):
+        return os.path.join(self.cache_dir, f"{key}{suffix}")
+
+    def artifact_path(self, origin_point, radius, name, network_type='drive', source=None):
+        """
+        Caminho de um artefato de pré-processamento (ex.: tabelas do ALT) guardado ao lado
+        do grafo correspondente.
+        """
+        return self.entry_path(self.key(origin_point, radius, network_type, source), f"_{name}.npz")
+
+    def load(self, origin_point, radius, network_type='drive', source=None):
+        """
+        Procura um grafo para a origem e o raio informados.
+
+        Args:
+            origin_point (tuple): Coordenadas (latitude, longitude) da origem.
+            radius (int): Raio de busca em metros.
+            network_type (str): Tipo de rede do OSMnx.
+            source (str): Fonte do grafo (None para o OpenStreetMap).
+
+        Returns:
+            tuple or None: (G_projected, densidade, CompactGraph ou None), ou None se não
+            houver entrada que atenda ao pedido.
+        """
+        index = self.load_index()
+        key = self.key(origin_point, radius, network_type, source)
+
+        if key in index:
+            try:
+                return self._read_entry(key, index[key])
+            except Exception as e:
+                logger.warning(f"Falha ao ler o grafo '{key}' do cache: {e}")
+
+        # Procurar a menor entrada de raio maior com a mesma origem, tipo de rede e fonte
+        origin = tuple(round(coord, self.precision) for coord in origin_point)
+        candidates = [
+            (entry['radius'], cached_key) for cached_key, entry in index.items()
+            if entry['network_type'] == network_type and entry.get('source') == source and entry['radius'] > radius
+            and (round(entry['latitude'], self.precision), round(entry['longitude'], self.precision)) == origin
+        ]
+        for _, cached_key in sorted(candidates):
+            try:
+                G_larger, _, _ = self._read_entry(cached_key, index[cached_key], with_compact=False)
+            except Exception as e:
+                logger.warning(f"Falha ao ler o grafo '{cached_key}' do cache: {e}")
+                continue
+            G_projected = self.crop(G_larger, origin_point, radius)
+            logger.info(f"Grafo recortado do cache '{cached_key}' para raio de {radius} m.")
+            return G_projected, nx.density(G_projected), None
+        return None
+
+    def _read_entry(self, key, entry, with_compact=True):
+        with open(self.entry_path(key, '.pkl'), 'rb') as f:
+            G_projected = pickle.load(f)
+        compact_graph = None
+        compact_path = self.entry_path(key, '.npz')
+        if with_compact and os.path.exists(compact_path):
+            compact_graph = CompactGraph.load(compact_path)
+        logger.info(f"Grafo '{key}' carregado do cache.")
+        return G_projected, entry.get('density'), compact_graph
+
+    def save(self, origin_point, radius, G_projected, density, compact_graph=None, network_type='drive',
+             source=None):
+        """
+        Armazena o grafo projetado (e opcionalmente o grafo compacto) no cache.
+
+        Args:
+            origin_point (tuple): Coordenadas (latitude, longitude) da origem.
+            radius (int): Raio de busca em metros.
+            G_projected (networkx.MultiDiGraph): Grafo projetado.
+            density (float): Densidade do grafo.
+            compact_graph (CompactGraph): Representação compacta do grafo.
+            network_type (str): Tipo de rede do OSMnx.
+            source (str): Fonte do grafo (None para o OpenStreetMap).
+        """
+        key = self.key(origin_point, radius, network_type, source)
+        try:
+            tmp_path = self.entry_path(key, f'.pkl.{os.getpid()}.tmp')
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(G_projected, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.entry_path(key, '.pkl'))
+            if compact_graph is not None:
+                compact_graph.save(self.entry_path(key, '.npz'))
+
+            self._update_index(key, {
+                'latitude': origin_point[0],
+                'longitude': origin_point[1],
+                'radius': int(radius),
+                'network_type': network_type,
+                'source': source,
+                'crs': str(G_projected.graph.get('crs')),
+                'density': density,
+            })
+            logger.info(f"Grafo '{key}' salvo no cache.")
+        except Exception as e:
+            logger.error(f"Erro ao salvar o grafo no cache: {e}")
+
+    @staticmethod
+    def crop(G_projected, origin_point, radius):
+        """
+        Recorta o grafo ao bbox de 'radius' metros em torno da origem, mantendo o maior
+        componente fracamente conexo, como faz ox.graph_from_point.
+
+        Args:
+            G_projected (networkx.MultiDiGraph): Grafo projetado de raio maior.
+            origin_point (tuple): Coordenadas (latitude, longitude) da origem.
+            radius (int): Raio de busca em metros.
+
+        Returns:
+            networkx.MultiDiGraph: Grafo recortado.
+        """
+        south, north, west, east = bbox_from_point(origin_point, radius)
+
+        nodes = list(G_projected.nodes)
+        xs = np.fromiter((G_projected.nodes[n]['x'] for n in nodes), dtype=np.float64, count=len(nodes))
+        ys = np.fromiter((G_projected.nodes[n]['y'] for n in nodes), dtype=np.float64, count=len(nodes))
+        transformer = Transformer.from_crs(G_projected.graph['crs'], "epsg:4326", always_xy=True)
+        lons, lats = transformer.transform(xs, ys)
+
+        inside = (lats >= south) & (lats <= north) & (lons >= west) & (lons <= east)
+        subgraph = G_projected.subgraph(node for node, keep in zip(nodes, inside) if keep)
+        if subgraph.number_of_nodes() == 0:
+            return subgraph.copy()
+        largest = max(nx.weakly_connected_components(subgraph), key=len)
+        return G_projected.subgraph(largest).copy()
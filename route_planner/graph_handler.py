@@ -1,47 +1,60 @@
 # route_planner/graph_handler.py
 
+import hashlib
+import os
 import sys
 import osmnx as ox
-import geopandas as gpd
-from shapely.geometry import Point
 from pyproj import Transformer
 import networkx as nx  # Importar o NetworkX
 from .logger import logger
+from .compact_graph import CompactGraph
+from .local_graph_loader import LocalGraphLoader
+from .heuristics import LandmarkHeuristic, build_landmark_heuristic
+from .contraction_hierarchy import ContractionHierarchy
+from .snap_index import SnapIndex
+from .weight_profiles import WeightProfile, add_default_profiles, edge_attributes
 
 class GraphHandler:
     """
     Classe para criar e manipular o grafo rodoviário a partir de um ponto de origem
     e um raio de busca especificado.
+
+    Se um GraphCache for informado, o grafo é lido do cache local quando disponível
+    e salvo nele após o download. Com 'source_file', o grafo é construído a partir de um
+    arquivo local (.osm, .pbf ou GraphML) em vez da Overpass API, e guardado no cache em
+    entradas próprias daquele arquivo (ver 'cache_source').
     """
-    def __init__(self, origin_point, radius):
+    def __init__(self, origin_point, radius, network_type='drive', cache=None, source_file=None):
         self.origin_point = origin_point  # (latitude, longitude)
         self.radius = radius
+        self.network_type = network_type
+        self.cache = cache
+        self.source_file = source_file
         self.G = None
         self.G_projected = None
         self.transformer = None
         self.origin_node = None
         self.origin_address = None
         self.graph_density = None  # Novo atributo para armazenar a densidade
+        self.compact_graph = None  # Representação CSR usada pelos algoritmos de roteamento
+        self.cache_source = None  # Fonte do grafo nas chaves do cache (None para o OSM)
 
     def create_graph(self):
         """
         Cria o grafo rodoviário a partir do OpenStreetMap usando o OSMnx.
         O grafo é projetado para um sistema de coordenadas adequado para cálculos de distância.
         """
-        logger.info("Baixando dados de ruas do OSM...")
-        try:
-            self.G = ox.graph_from_point(
-                self.origin_point,
-                dist=self.radius,
-                network_type='drive',
-                simplify=False  # Desativar simplificação para maior densidade
-            )
-            # Reprojetar o grafo para um CRS projetado (por exemplo, UTM)
-            self.G_projected = ox.project_graph(self.G)
-            logger.info("Grafo de ruas carregado e reprojetado.")
-        except Exception as e:
-            logger.error(f"Erro ao baixar ou processar o grafo: {e}")
-            raise Exception(f"Erro ao baixar ou processar o grafo: {e}")
+        cached = None
+        self.cache_source = self.source_fingerprint()
+        if self.cache is not None:
+            cached = self.cache.load(self.origin_point, self.radius, self.network_type, source=self.cache_source)
+
+        if cached is not None:
+            self.G_projected, self.graph_density, self.compact_graph = cached
+        elif self.source_file is not None:
+            self.load_local_graph()
+        else:
+            self.download_graph()
 
         # Obter o CRS do grafo projetado
         crs_projected = self.G_projected.graph.get('crs', None)
@@ -59,7 +72,173 @@ class GraphHandler:
             raise ValueError("O grafo não é direcionado. Verifique o 'network_type' utilizado.")
 
         # Calcular a densidade do grafo
-        self.calculate_density()
+        if self.graph_density is None:
+            self.calculate_density()
+
+        # Compilar o grafo compacto usado pelos algoritmos de caminho mínimo
+        profiles_added = []
+        if self.compact_graph is None:
+            self.build_compact_graph()
+        else:
+            # Grafos compactos salvos antes da inclusão de novos perfis padrão
+            profiles_added = add_default_profiles(self.compact_graph, self.G_projected)
+
+        # Armazenar no cache os grafos baixados ou recortados
+        if self.cache is not None and (cached is None or cached[2] is None or profiles_added):
+            self.cache.save(self.origin_point, self.radius, self.G_projected, self.graph_density,
+                            self.compact_graph, network_type=self.network_type, source=self.cache_source)
+
+    def source_fingerprint(self):
+        """
+        Identifica o arquivo local de origem do grafo pelo caminho absoluto, data de
+        modificação e tamanho, de modo que um arquivo alterado não reutilize o cache.
+
+        Returns:
+            str or None: Resumo do arquivo, ou None sem 'source_file'.
+        """
+        if self.source_file is None:
+            return None
+        stat = os.stat(self.source_file)
+        fingerprint = f"{os.path.abspath(self.source_file)}|{stat.st_mtime_ns}|{stat.st_size}"
+        return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:12]
+
+    def download_graph(self):
+        """
+        Baixa o grafo rodoviário do OpenStreetMap e o reprojeta para um CRS projetado.
+        """
+        logger.info("Baixando dados de ruas do OSM...")
+        try:
+            self.G = ox.graph_from_point(
+                self.origin_point,
+                dist=self.radius,
+                network_type=self.network_type,
+                simplify=False  # Desativar simplificação para maior densidade
+            )
+            # Reprojetar o grafo para um CRS projetado (por exemplo, UTM)
+            self.G_projected = ox.project_graph(self.G)
+            logger.info("Grafo de ruas carregado e reprojetado.")
+        except Exception as e:
+            logger.error(f"Erro ao baixar ou processar o grafo: {e}")
+            raise Exception(f"Erro ao baixar ou processar o grafo: {e}")
+
+    def build_compact_graph(self):
+        """
+        Constrói a representação compacta (CSR) do grafo projetado, uma única vez por grafo,
+        com os perfis de peso padrão (ver weight_profiles.DEFAULT_PROFILES).
+        """
+        self.compact_graph = CompactGraph.from_networkx(self.G_projected)
+        add_default_profiles(self.compact_graph, self.G_projected)
+        logger.info(
+            f"Grafo compacto construído: {self.compact_graph.number_of_nodes()} nós, "
+            f"{self.compact_graph.number_of_edges()} arestas, {self.compact_graph.nbytes / 1e6:.2f} MB."
+        )
+
+    def load_local_graph(self):
+        """
+        Constrói o grafo projetado a partir do arquivo local informado em 'source_file'.
+        """
+        logger.info(f"Lendo grafo do arquivo local '{self.source_file}'...")
+        try:
+            loader = LocalGraphLoader(self.source_file, network_type=self.network_type)
+            self.G, self.G_projected = loader.load(self.origin_point, self.radius)
+        except Exception as e:
+            logger.error(f"Erro ao ler o grafo do arquivo local: {e}")
+            raise Exception(f"Erro ao ler o grafo do arquivo local: {e}")
+
+    def landmark_heuristic(self, num_landmarks=16, strategy='avoid', weight='length'):
+        """
+        Pré-processamento do modo ALT para o grafo atual. As tabelas de distâncias são
+        lidas do cache quando disponíveis e salvas nele após o cálculo.
+
+        Args:
+            num_landmarks (int): Número de marcos.
+            strategy (str): Estratégia de seleção dos marcos ('avoid', 'farthest' ou 'planar').
+            weight (str): Perfil de peso das arestas.
+
+        Returns:
+            LandmarkHeuristic: Heurística para os algoritmos 'alt' e 'bidirectional_alt'.
+        """
+        def build():
+            logger.info(f"Calculando {num_landmarks} marcos do ALT (estratégia '{strategy}', perfil '{weight}')...")
+            return build_landmark_heuristic(self.compact_graph, num_landmarks, strategy, weight=weight)
+
+        name = f"alt_{strategy}_{num_landmarks}" + ('' if weight == 'length' else f"_{weight}")
+        return self.cached_artifact(name, LandmarkHeuristic.load, build)
+
+    def contraction_hierarchy(self, weight='length'):
+        """
+        Pré-processamento das Contraction Hierarchies para o grafo atual, lido do cache
+        quando disponível e salvo nele após a construção.
+
+        Args:
+            weight (str): Perfil de peso das arestas.
+
+        Returns:
+            ContractionHierarchy: Hierarquia para o algoritmo 'ch'.
+        """
+        def build():
+            logger.info(f"Construindo as Contraction Hierarchies (perfil '{weight}')...")
+            return ContractionHierarchy.build(self.compact_graph, weight=weight)
+
+        name = 'ch' if weight == 'length' else f"ch_{weight}"
+        return self.cached_artifact(name, ContractionHierarchy.load, build)
+
+    def weight_profile(self, name, expression, allow_negative=False):
+        """
+        Registra no grafo compacto um perfil de peso definido por uma expressão de custo sobre
+        os atributos das arestas (ver weight_profiles.evaluate_expression). O vetor de custos
+        é calculado uma única vez e guardado no cache ao lado do grafo.
+
+        Args:
+            name (str): Nome do perfil, usado como 'weight' nos algoritmos.
+            expression (str): Expressão de custo, ex.: "travel_time + 15 * (highway == 'residential')".
+            allow_negative (bool): Aceitar custos negativos (apenas para o Bellman-Ford).
+
+        Returns:
+            WeightProfile: Perfil registrado.
+
+        Raises:
+            ValueError: Se a expressão for inválida ou, sem 'allow_negative', produzir custos negativos.
+        """
+        def build():
+            logger.info(f"Calculando o perfil de peso '{name}': {expression}")
+            return WeightProfile.from_expression(name, expression, edge_attributes(self.G_projected),
+                                                 allow_negative=True)
+
+        digest = hashlib.sha1(expression.encode('utf-8')).hexdigest()[:12]
+        profile = self.cached_artifact(f"weight_{name}_{digest}", WeightProfile.load, build)
+        # Verificado também aqui: o mesmo perfil pode ter sido guardado por quem aceitava negativos
+        if not allow_negative and profile.values.min(initial=0.0) < 0:
+            raise ValueError(f"A expressão '{expression}' produziu custos negativos.")
+        return profile.attach(self.compact_graph)
+
+    def cached_artifact(self, name, load, build):
+        """
+        Obtém um artefato de pré-processamento guardado ao lado do grafo no cache,
+        construindo-o e salvando-o quando ausente ou inválido.
+
+        Args:
+            name (str): Nome do artefato no cache.
+            load (callable): Função (compact_graph, caminho) que lê o artefato salvo.
+            build (callable): Função sem argumentos que constrói o artefato.
+
+        Returns:
+            object: Artefato com método 'save(caminho)'.
+        """
+        path = None
+        if self.cache is not None:
+            path = self.cache.artifact_path(self.origin_point, self.radius, name, self.network_type,
+                                            source=self.cache_source)
+            if os.path.exists(path):
+                try:
+                    return load(self.compact_graph, path)
+                except Exception as e:
+                    logger.warning(f"Artefato '{name}' em cache inválido, recalculando: {e}")
+
+        artifact = build()
+        if path is not None:
+            artifact.save(path)
+        return artifact
 
     def calculate_density(self):
         """
@@ -78,16 +257,12 @@ class GraphHandler:
         """
         crs_projected = self.G_projected.graph['crs']
         # Converter as coordenadas da origem para o CRS projetado
-        origin_gdf = gpd.GeoDataFrame(
-            {'geometry': [Point(self.origin_point[1], self.origin_point[0])]},  # (lon, lat)
-            crs='epsg:4326'  # CRS geográfico
-        )
-        origin_projected = origin_gdf.to_crs(crs_projected)
-        origin_x_proj, origin_y_proj = origin_projected.geometry.x[0], origin_projected.geometry.y[0]
+        to_projected = Transformer.from_crs("epsg:4326", crs_projected, always_xy=True)
+        origin_x_proj, origin_y_proj = to_projected.transform(self.origin_point[1], self.origin_point[0])  # (lon, lat)
 
-        # Encontrar nó de origem no grafo projetado
+        # Encontrar nó de origem no grafo projetado pelo índice espacial do grafo
         try:
-            self.origin_node = ox.distance.nearest_nodes(self.G_projected, X=origin_x_proj, Y=origin_y_proj)
+            self.origin_node = SnapIndex.for_graph(self.compact_graph).nearest_node_ids(origin_x_proj, origin_y_proj)[0]
             origin_node_coords = (self.G_projected.nodes[self.origin_node]['y'], self.G_projected.nodes[self.origin_node]['x'])
             logger.info(f"Nó de Origem: {self.origin_node}")
             logger.info(f"Coordenadas do Nó de Origem: {origin_node_coords}")
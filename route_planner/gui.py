@@ -4,23 +4,31 @@ import sys
 import threading
 import tkinter as tk
 from tkinter import ttk, messagebox, Button
-import networkx as nx
 from PIL import Image, ImageTk
-import pandas as pd
 import os
 
 from route_planner.utils import RedirectText
 from route_planner.preferences import UserPreferences
-from route_planner.geocoder import GeoCoder
-from route_planner.graph_handler import GraphHandler
-from route_planner.poi_finder import POIFinder
-from route_planner.route_calculator import RouteCalculator
+from route_planner.graph_cache import GraphCache
+from route_planner.poi_cache import POICache
+from route_planner.pipeline import RoutePipeline, PipelineCancelled
 from route_planner.route_plotter import RoutePlotter
 from route_planner.customization_window import CustomizationWindow
 from route_planner.logger import logger  # Importar o logger
 from route_planner.data_analyzer import DataAnalyzer
+from route_planner.results_store import ResultsStore, algorithm_results
 
 class RoutePlannerGUI:
+    # Descrição das etapas do pipeline exibida na barra de mensagens
+    STAGE_LABELS = {
+        'geocode': 'geocodificação',
+        'graph': 'grafo',
+        'pois': 'estabelecimentos',
+        'cuisines': 'tipos de estabelecimento',
+        'destinations': 'destinos',
+        'routes': 'rotas',
+    }
+
     def __init__(self):
         self.preferences = UserPreferences()
         self.address = None
@@ -33,11 +41,14 @@ class RoutePlannerGUI:
         self.poi_finder = None
         self.route_calculator = None
         self.route_plotter = None
+        self.pipeline = None  # Pipeline da execução em andamento
+        self.running_stages = set()
         self.selected_coords_geo = []
         self.selected_names = []
         self.selected_dists = []
         self.selected_nodes = []
-        self.algorithms = ['dijkstra', 'astar', 'bellman_ford', 'bidirectional_dijkstra', 'bidirectional_a_star']
+        # Algoritmos marcados nas preferências (ALT e CH só quando habilitados em "Personalizar")
+        self.algorithms = self.preferences.selected_algorithms()
         self.graph_info_label = None  # Atributo para exibir informações do grafo
         self.main_frame = None  # Atributo para o frame principal
 
@@ -171,6 +182,15 @@ class RoutePlannerGUI:
         )
         self.customize_button.pack(side=tk.LEFT, padx=5)
 
+        # Botão "Cancelar", habilitado durante o processamento
+        self.cancel_button = ttk.Button(
+            button_frame,
+            text=" Cancelar",
+            command=self.cancel_run,
+            state=tk.DISABLED
+        )
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+
         # Barra de progresso
         self.progress = ttk.Progressbar(self.main_frame, orient='horizontal', mode='indeterminate')
         self.progress.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
@@ -269,8 +289,10 @@ class RoutePlannerGUI:
             return
 
         self.run_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
         self.progress.start()
         self.message.set("Processando...")
+        final_message = ""
 
         try:
             # Obter entradas do usuário
@@ -282,153 +304,80 @@ class RoutePlannerGUI:
             self.preferences.get_user_input(self.address, self.radius, '', self.num_destinations)
             self.preferences.save_preferences()
 
-            # Geocodificar o endereço
-            geocode_result = GeoCoder.geocode_address(self.address)
-            if geocode_result is None:
-                messagebox.showerror("Erro", "Endereço não encontrado. Tente novamente.")
-                logger.warning("Endereço não encontrado.")
-                return
-            elif isinstance(geocode_result, list) and len(geocode_result) > 1:
-                # Se múltiplos resultados, permitir que o usuário selecione
-                selected = self.select_address(geocode_result)
-                if selected is None:
-                    messagebox.showinfo("Informação", "Nenhum endereço selecionado.")
-                    return
-                else:
-                    self.origin_point = (selected[0], selected[1])
-                    self.origin_address = selected[2]
-            else:
-                # Apenas um resultado encontrado
-                self.origin_point = (geocode_result[0], geocode_result[1])
-                self.origin_address = geocode_result[2]
+            self.pipeline = RoutePipeline(
+                graph_cache=GraphCache(),
+                poi_cache=POICache(),
+                # Apenas lotes grandes o bastante são distribuídos entre os núcleos (ver RouteCalculator.parallel_workers)
+                workers=os.cpu_count(),
+                capture_search_space=self.preferences.preferences.get('search_space_layer') is not None,
+                on_progress=self.show_progress
+            )
 
-            logger.info(f"Endereço selecionado: {self.origin_address}")
+            # Geocodificar o endereço (com múltiplos resultados, o usuário seleciona um)
+            if not self.pipeline.locate(self.address, choose_address=self.choose_address):
+                if self.pipeline.address_candidates:
+                    self.root.after(0, lambda: messagebox.showinfo("Informação", "Nenhum endereço selecionado."))
+                else:
+                    self.root.after(0, lambda: messagebox.showerror("Erro", "Endereço não encontrado. Tente novamente."))
+                    logger.warning("Endereço não encontrado.")
+                return
+            self.origin_point = self.pipeline.origin_point
+            self.origin_address = self.pipeline.origin_address
 
-            # Criar e processar o grafo
-            self.graph_handler = GraphHandler(self.origin_point, self.radius)
-            self.graph_handler.create_graph()
-            self.graph_handler.find_origin_node()
+            # Obter o grafo e os estabelecimentos da área em paralelo
+            self.graph_handler, self.poi_finder = self.pipeline.load_area(self.radius)
             self.graph_handler.print_graph_info()
 
             # Exibir informações do grafo na interface
-            self.display_graph_info()
-
-            # Prosseguir com o restante do processamento
-            threading.Thread(target=self.fetch_cuisines).start()
-
-        except Exception as e:
-            logger.exception(f"Ocorreu um erro no método run: {e}")
-            messagebox.showerror("Erro", f"Ocorreu um erro: {e}")
-        finally:
-            # Reabilitar o botão e parar a barra de progresso
-            self.root.after(0, lambda: self.run_button.config(state=tk.NORMAL))
-            self.root.after(0, lambda: self.progress.stop())
-            self.root.after(0, lambda: self.message.set(""))
-            self.root.after(0, lambda: self.root.config(cursor=''))
- 
-    def display_graph_info(self):
-        """
-        Exibe as informações do grafo na interface gráfica.
-        """
-        num_nodes = self.graph_handler.G_projected.number_of_nodes()
-        num_edges = self.graph_handler.G_projected.number_of_edges()
-        density = self.graph_handler.graph_density
-
-        info_text = f"Grafo: {num_nodes} nós, {num_edges} arestas\n"
-        if density is not None:
-            info_text += f"Densidade do grafo: {density:.6f}"
-        else:
-            info_text += "Densidade do grafo: Não disponível"
-
-        self.graph_info_label.config(text=info_text)
+            self.root.after(0, self.display_graph_info)
 
-    def fetch_cuisines(self):
-        try:
-            # Buscar estabelecimentos e obter cozinhas disponíveis
-            self.poi_finder = POIFinder(
-                self.graph_handler.G_projected,
-                self.origin_point,
-                self.radius
-            )
-            self.poi_finder.get_available_cuisines()
-            cuisine_counts = self.poi_finder.cuisine_counts
+            # Obter as cozinhas disponíveis e abrir a janela de seleção no thread principal
+            cuisine_counts = self.pipeline.available_cuisines()
             if not cuisine_counts:
                 self.root.after(0, lambda: messagebox.showwarning("Aviso", "Nenhum tipo de estabelecimento encontrado na área."))
                 return
-            else:
-                # Abrir a janela de seleção de cozinha no thread principal
-                self.root.after(0, lambda: self.select_cuisine_and_proceed(cuisine_counts))
-        except Exception as e:
-            logger.exception(f"Ocorreu um erro no método fetch_cuisines: {e}")
-            self.root.after(0, lambda e=e: messagebox.showerror("Erro", f"Ocorreu um erro ao buscar estabelecimentos: {e}"))
-        finally:
-            # Reabilitar o botão e parar a barra de progresso
-            self.root.after(0, lambda: self.run_button.config(state=tk.NORMAL))
-            self.root.after(0, lambda: self.progress.stop())
-            self.root.after(0, lambda: self.message.set(""))
-
-    def select_cuisine_and_proceed(self, cuisine_counts):
-        selected_cuisine = self.select_cuisine(cuisine_counts)
-        if selected_cuisine is None:
-            messagebox.showinfo("Informação", "Nenhuma opção selecionada.")
-            return
-        else:
-            self.cuisine = selected_cuisine
-            self.preferences.preferences['cuisine'] = self.cuisine
-            self.preferences.save_preferences()
-            self.poi_finder.cuisine = self.cuisine
-
-            # Prosseguir com o restante do processamento
-            threading.Thread(target=self.after_fetch_cuisines).start()
-
-    def select_cuisine_and_proceed_step2(self, cuisine_counts):
-        selected_cuisine = self.select_cuisine(cuisine_counts)
-        if selected_cuisine is None:
-            messagebox.showinfo("Informação", "Nenhuma opção selecionada.")
-            return
-        else:
-            self.cuisine = selected_cuisine
+            self.cuisine = self.call_in_main_thread(self.select_cuisine, cuisine_counts)
+            if self.cuisine is None:
+                self.root.after(0, lambda: messagebox.showinfo("Informação", "Nenhuma opção selecionada."))
+                return
             self.preferences.preferences['cuisine'] = self.cuisine
             self.preferences.save_preferences()
-            self.poi_finder.cuisine = self.cuisine
-
-            # Prosseguir com o restante do processamento
-            threading.Thread(target=self.after_fetch_cuisines).start()
-
-    def after_fetch_cuisines(self):
-        try:
-            # Buscar POIs com a 'cuisine' selecionada
-            self.poi_finder.get_pois()
 
+            # Buscar POIs com a 'cuisine' selecionada e selecionar os destinos mais próximos
+            self.selected_nodes = self.pipeline.select_destinations(self.cuisine, self.num_destinations)
             if not self.poi_finder.destination_nodes:
                 self.root.after(0, lambda: messagebox.showwarning("Aviso", "Nenhum destino encontrado. Tente novamente com outros parâmetros."))
                 return
-
-            # Selecionar os destinos mais próximos
-            self.selected_nodes, self.selected_names, self.selected_dists = self.select_closest_destinations()
-
             if not self.selected_nodes:
                 self.root.after(0, lambda: messagebox.showwarning("Aviso", "Nenhum destino selecionado. Tente novamente."))
                 return
+            self.selected_names = self.pipeline.selected_names
+            self.selected_dists = self.pipeline.selected_dists
+            self.selected_coords_geo = self.pipeline.selected_coords_geo
 
             # Calcular rotas
-            self.route_calculator = RouteCalculator(
-                self.graph_handler.G_projected,
-                self.graph_handler.origin_node,
-                self.selected_nodes
-            )
-            self.route_calculator.calculate_routes(algorithms=self.algorithms)
+            self.algorithms = self.preferences.selected_algorithms()
+            self.route_calculator = self.pipeline.calculate_routes(self.algorithms)
 
             # Exibir tempos médios
             for alg, avg_time in self.route_calculator.avg_times.items():
                 logger.info(f"Tempo Médio {alg.replace('_', ' ').capitalize()}: {avg_time:.6f} segundos")
                 print(f"Tempo Médio {alg.replace('_', ' ').capitalize()}: {avg_time:.6f} segundos")
+                stats = self.route_calculator.search_stats.get(alg)
+                if stats is not None and stats.searches:
+                    summary = stats.summary()
+                    logger.info(f"Esforço {alg.replace('_', ' ').capitalize()}: {summary['settled']:.0f} nós fixados, "
+                                f"{summary['relaxed']:.0f} arestas relaxadas, {summary['pops']:.0f} retiradas "
+                                f"e pico de {summary['peak_frontier']} na fila por busca ({summary['searches']} buscas)")
 
             # Plotar as rotas
             self.route_plotter = RoutePlotter(
                 self.graph_handler.G_projected,
                 self.graph_handler.transformer,
-                self.preferences.preferences['visualization']
+                self.preferences.preferences['visualization'],
+                compact_graph=self.graph_handler.compact_graph,
+                edge_geometry=True,
+                search_space_layer=self.preferences.preferences.get('search_space_layer')
             )
 
             routes_limit = len(self.selected_nodes)  # Usar o número de destinos selecionados
@@ -440,22 +389,85 @@ class RoutePlannerGUI:
                 self.selected_names,
                 self.selected_dists,
                 algorithms=self.algorithms,
-                limit=routes_limit
+                limit=routes_limit,
+                search_stats=self.route_calculator.search_stats
             )
 
             # Salvar os resultados
             self.save_results()
             logger.info("Resultados salvos com sucesso.")
 
-            self.root.after(0, lambda: self.message.set("Processamento concluído. O mapa foi aberto no navegador. Resultados salvos."))
+            final_message = "Processamento concluído. O mapa foi aberto no navegador. Resultados salvos."
 
+        except PipelineCancelled:
+            logger.info("Processamento cancelado pelo usuário.")
+            final_message = "Processamento cancelado."
         except Exception as e:
-            logger.exception(f"Ocorreu um erro no método after_fetch_cuisines: {e}")
+            logger.exception(f"Ocorreu um erro no método run: {e}")
             self.root.after(0, lambda e=e: messagebox.showerror("Erro", f"Ocorreu um erro: {e}"))
         finally:
             # Reabilitar o botão e parar a barra de progresso
             self.root.after(0, lambda: self.run_button.config(state=tk.NORMAL))
+            self.root.after(0, lambda: self.cancel_button.config(state=tk.DISABLED))
             self.root.after(0, lambda: self.progress.stop())
+            self.root.after(0, lambda: self.message.set(final_message))
+            self.root.after(0, lambda: self.root.config(cursor=''))
+
+    def cancel_run(self):
+        """
+        Solicita o cancelamento do processamento em andamento.
+        """
+        if self.pipeline is not None:
+            self.pipeline.cancel()
+            self.message.set("Cancelando...")
+
+    def show_progress(self, event):
+        """
+        Exibe as etapas em andamento do pipeline (chamado a partir das threads do pipeline).
+        """
+        if event.status == 'started':
+            self.running_stages.add(event.stage)
+        else:
+            self.running_stages.discard(event.stage)
+        if self.running_stages and not self.pipeline.cancelled:
+            text = "Processando: " + ", ".join(self.STAGE_LABELS[stage] for stage in sorted(self.running_stages))
+            self.root.after(0, lambda: self.message.set(text))
+
+    def call_in_main_thread(self, func, *args):
+        """
+        Executa 'func' no thread da interface e aguarda o resultado (janelas de seleção).
+        """
+        done = threading.Event()
+        result = [None]
+
+        def call():
+            try:
+                result[0] = func(*args)
+            finally:
+                done.set()
+
+        self.root.after(0, call)
+        done.wait()
+        return result[0]
+
+    def choose_address(self, addresses):
+        return self.call_in_main_thread(self.select_address, addresses)
+
+    def display_graph_info(self):
+        """
+        Exibe as informações do grafo na interface gráfica.
+        """
+        num_nodes = self.graph_handler.G_projected.number_of_nodes()
+        num_edges = self.graph_handler.G_projected.number_of_edges()
+        density = self.graph_handler.graph_density
+
+        info_text = f"Grafo: {num_nodes} nós, {num_edges} arestas\n"
+        if density is not None:
+            info_text += f"Densidade do grafo: {density:.6f}"
+        else:
+            info_text += "Densidade do grafo: Não disponível"
+
+        self.graph_info_label.config(text=info_text)
 
     def select_address(self, addresses):
         """
@@ -563,94 +575,25 @@ class RoutePlannerGUI:
         else:
             return None
 
-    def select_closest_destinations(self):
-        G_projected = self.graph_handler.G_projected
-        origin_node = self.graph_handler.origin_node
-        destination_nodes = self.poi_finder.destination_nodes
-        destination_names = self.poi_finder.destination_names
-
-        # Calcular distâncias do nó de origem para todos os destinos
-        distances = []
-        for idx, dest_node in enumerate(destination_nodes):
-            try:
-                length = nx.shortest_path_length(G_projected, origin_node, dest_node, weight='length')
-                distances.append((length, dest_node, destination_names[idx]))
-            except nx.NetworkXNoPath:
-                continue  # Ignorar destinos sem caminho disponível
-
-        # Ordenar por distância
-        distances.sort(key=lambda x: x[0])
-
-        if not distances:
-            print("Nenhum destino alcançável encontrado.")
-            return [], [], []
-
-        # Selecionar o número de destinos especificado pelo usuário
-        num_destinations = self.num_destinations
-        if num_destinations > len(distances):
-            num_destinations = len(distances)
-
-        selected_destinations = distances[:num_destinations]
-
-        # Extrair os nós e nomes selecionados
-        selected_nodes = [node for dist, node, name in selected_destinations]
-        selected_names = [name for dist, node, name in selected_destinations]
-        selected_dists = [dist for dist, node, name in selected_destinations]
-
-        # Filtrar as coordenadas e nomes correspondentes aos destinos selecionados
-        selected_coords_geo = []
-        for node in selected_nodes:
-            idx = list(destination_nodes).index(node)
-            selected_coords_geo.append(self.poi_finder.destination_coords_geo[idx])
-
-        self.selected_coords_geo = selected_coords_geo  # Para uso posterior
-
-        return selected_nodes, selected_names, selected_dists
-
-
-
-        # Informações do grafo
-        self.graph_info_label = ttk.Label(main_frame, text="", justify=tk.LEFT)
-        self.graph_info_label.grid(row=7, column=0, columnspan=2, sticky=tk.W, pady=5)
-
-        # Atualizar a configuração da grade
-        main_frame.rowconfigure(7, weight=0)
-
     def save_results(self):
         """
-        Salva os resultados em um arquivo CSV para análise posterior.
+        Salva os resultados no banco de resultados (ver ResultsStore) para análise
+        posterior: parâmetros da execução, tempo de cada rota e contadores de esforço.
         """
-        # Dados a serem salvos
-        data = {
-            'Endereço de Origem': self.origin_address,
-            'Latitude': self.origin_point[0],
-            'Longitude': self.origin_point[1],
-            'Raio de Busca (m)': self.radius,
-            'Tipo de Estabelecimento': self.cuisine,
-            'Número de Vértices': self.graph_handler.G_projected.number_of_nodes(),
-            'Número de Arestas': self.graph_handler.G_projected.number_of_edges(),
-            'Densidade do Grafo': self.graph_handler.graph_density,
+        run = {
+            'address': self.origin_address,
+            'latitude': self.origin_point[0],
+            'longitude': self.origin_point[1],
+            'radius': self.radius,
+            'cuisine': self.cuisine,
+            'num_nodes': self.graph_handler.G_projected.number_of_nodes(),
+            'num_edges': self.graph_handler.G_projected.number_of_edges(),
+            'density': self.graph_handler.graph_density,
+            'num_destinations': len(self.selected_nodes),
+            'weight': self.pipeline.weight,
         }
-
-        # Adicionar os tempos médios de cada algoritmo
-        for alg in self.algorithms:
-            alg_name = alg.replace('_', ' ').capitalize()
-            avg_time = self.route_calculator.avg_times.get(alg, None)
-            data[f'Tempo Médio {alg_name} (s)'] = avg_time
-
-        # Criar um DataFrame com uma única linha
-        df = pd.DataFrame([data])
-
-        # Nome do arquivo CSV
-        csv_file = 'resultados.csv'
-
-        # Verificar se o arquivo já existe
-        if os.path.isfile(csv_file):
-            # Se existir, anexar sem escrever o cabeçalho
-            df.to_csv(csv_file, mode='a', index=False, header=False)
-        else:
-            # Se não existir, criar e escrever o cabeçalho
-            df.to_csv(csv_file, mode='w', index=False)
+        with ResultsStore() as store:
+            store.add_run(run, algorithm_results(self.route_calculator, self.algorithms), source='gui')
 
     def generate_report(self):
         # Desabilitar o botão durante o processamento
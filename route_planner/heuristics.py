@@ -0,0 +1,326 @@
+# route_planner/heuristics.py
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from route_planner import compact_search
+
+class HeuristicProvider:
+    """
+    Classe base dos provedores de heurística para o A* sobre o CompactGraph.
+
+    Para cada consulta, o provedor calcula de uma só vez (com NumPy) a estimativa de
+    todos os nós em relação ao destino e devolve um memoryview indexável por índice
+    compacto. Os vetores dos alvos mais recentes ficam em cache, de modo que o A*
+    e o Bidirectional A* de um mesmo destino (e a busca reversa a partir da origem,
+    comum a todos os destinos) não recalculam a heurística. O cache (e os vetores de
+    trabalho das subclasses) é protegido por uma trava, de modo que um mesmo provedor pode
+    ser compartilhado entre threads (ver server.Area).
+
+    Args:
+        cg (CompactGraph): Grafo compacto.
+        cache_size (int): Número de vetores mantidos em cache.
+        weight (str): Perfil de peso das arestas em que as estimativas são expressas.
+    """
+    def __init__(self, cg, cache_size=16, weight='length'):
+        self.cg = cg
+        self.cache_size = cache_size
+        self.weight = weight
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, key, compute):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            values = memoryview(np.ascontiguousarray(compute(), dtype=np.float64))
+            self._cache[key] = values
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return values
+
+    def for_target(self, target):
+        """
+        Retorna h(v), limite inferior da distância de v até 'target', para todos os nós.
+        """
+        return self._cached(('target', target), lambda: self.estimate_to(target))
+
+    def for_source(self, source):
+        """
+        Retorna h(v), limite inferior da distância de 'source' até v, para todos os nós.
+        Usado na busca reversa do Bidirectional A*.
+        """
+        return self._cached(('source', source), lambda: self.estimate_from(source))
+
+    def estimate_to(self, target):
+        raise NotImplementedError
+
+    def estimate_from(self, source):
+        # Heurísticas geométricas são simétricas
+        return self.estimate_to(source)
+
+class EuclideanHeuristic(HeuristicProvider):
+    """
+    Distância em linha reta no CRS projetado, convertida para o perfil de peso pelo menor
+    custo por metro (ver CompactGraph.cost_per_meter).
+    """
+    def estimate_to(self, target):
+        scale = self.cg.cost_per_meter(self.weight)
+        return scale * np.hypot(self.cg.x - self.cg.x[target], self.cg.y - self.cg.y[target])
+
+class ManhattanBoundedHeuristic(HeuristicProvider):
+    """
+    Limite octogonal da distância euclidiana, sem raiz quadrada:
+    max(|dx|, |dy|, (|dx| + |dy|) / sqrt(2)). Como nunca excede a distância em linha
+    reta, continua admissível (com a mesma conversão de perfil da EuclideanHeuristic).
+    """
+    def estimate_to(self, target):
+        scale = self.cg.cost_per_meter(self.weight)
+        dx = np.abs(self.cg.x - self.cg.x[target])
+        dy = np.abs(self.cg.y - self.cg.y[target])
+        return scale * np.maximum(np.maximum(dx, dy), (dx + dy) * (1 / np.sqrt(2)))
+
+class LandmarkHeuristic(HeuristicProvider):
+    """
+    Heurística por marcos (landmarks) e desigualdade triangular, base do modo ALT.
+    Com as distâncias d(L, v) e d(v, L) pré-calculadas para cada marco L:
+
+        d(v, t) >= max(d(L, t) - d(L, v), d(v, L) - d(t, L))
+
+    As tabelas são guardadas em float32 (forma (k, n)) para ocupar metade da memória, e as
+    estimativas são calculadas em float32 sobre vetores pré-alocados; a folga 'slack'
+    cobre o arredondamento das tabelas e das subtrações.
+
+    Args:
+        cg (CompactGraph): Grafo compacto.
+        landmarks (list): Índices compactos dos marcos.
+        from_landmarks (numpy.ndarray): Distâncias d(L, v). Calculadas se None.
+        to_landmarks (numpy.ndarray): Distâncias d(v, L). Calculadas se None.
+        weight (str): Perfil de peso das arestas.
+    """
+    def __init__(self, cg, landmarks, from_landmarks=None, to_landmarks=None, weight='length', cache_size=16):
+        super().__init__(cg, cache_size=cache_size, weight=weight)
+        self.landmarks = [int(landmark) for landmark in landmarks]
+        if from_landmarks is None:
+            from_landmarks = np.vstack([
+                compact_search.single_source_distances(cg, landmark, weight=weight) for landmark in self.landmarks
+            ])
+        if to_landmarks is None:
+            to_landmarks = np.vstack([
+                compact_search.single_source_distances(cg, landmark, weight=weight, reverse=True)
+                for landmark in self.landmarks
+            ])
+        self.from_landmarks = np.asarray(from_landmarks, dtype=np.float32)
+        self.to_landmarks = np.asarray(to_landmarks, dtype=np.float32)
+        self._buffers = None
+        # Folga que compensa o arredondamento para float32 (tabelas e subtrações) e mantém a heurística admissível
+        finite = [table[np.isfinite(table)] for table in (self.from_landmarks, self.to_landmarks)]
+        largest = max((float(values.max()) for values in finite if values.size), default=0.0)
+        self.slack = 4 * float(np.finfo(np.float32).eps) * largest
+
+    def _differences(self):
+        # Vetores (k, n) reaproveitados entre as consultas, sem cópias em float64 das tabelas
+        if self._buffers is None:
+            self._buffers = (np.empty_like(self.from_landmarks), np.empty_like(self.to_landmarks))
+        return self._buffers
+
+    def _bound(self, a, b):
+        # inf - inf (nem v nem o alvo ligados ao marco naquela tabela) é NaN: 'fmax' o ignora e
+        # mantém o limite da outra tabela; só então os termos não finitos viram 0
+        bound = np.nan_to_num(np.fmax(a, b, out=a), copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+        return np.maximum(bound.max(axis=0).astype(np.float64) - self.slack, 0.0)
+
+    def estimate_to(self, target):
+        a, b = self._differences()
+        with np.errstate(invalid='ignore'):
+            np.subtract(self.from_landmarks[:, [target]], self.from_landmarks, out=a)
+            np.subtract(self.to_landmarks, self.to_landmarks[:, [target]], out=b)
+        return self._bound(a, b)
+
+    def estimate_from(self, source):
+        a, b = self._differences()
+        with np.errstate(invalid='ignore'):
+            np.subtract(self.from_landmarks, self.from_landmarks[:, [source]], out=a)
+            np.subtract(self.to_landmarks[:, [source]], self.to_landmarks, out=b)
+        return self._bound(a, b)
+
+    def to_arrays(self):
+        """
+        Retorna os marcos e as tabelas de distâncias pelo nome usado no arquivo .npz.
+        """
+        return {
+            'landmarks': np.array(self.landmarks, dtype=np.int64),
+            'from_landmarks': self.from_landmarks,
+            'to_landmarks': self.to_landmarks,
+            'node_ids': self.cg.node_ids,
+            'weight': np.array(self.weight),
+        }
+
+    @classmethod
+    def from_arrays(cls, cg, arrays):
+        """
+        Reconstrói a heurística a partir dos vetores retornados por 'to_arrays'.
+
+        Raises:
+            ValueError: Se as tabelas foram calculadas para outro grafo.
+        """
+        if not np.array_equal(arrays['node_ids'], cg.node_ids):
+            raise ValueError("As tabelas de marcos não correspondem ao grafo informado.")
+        return cls(cg, arrays['landmarks'].tolist(), arrays['from_landmarks'], arrays['to_landmarks'],
+                   weight=str(arrays['weight']))
+
+    def save(self, path):
+        """
+        Salva os marcos e as tabelas de distâncias em um arquivo .npz.
+        """
+        with open(path, 'wb') as f:
+            np.savez(f, **self.to_arrays())
+
+    @classmethod
+    def load(cls, cg, path):
+        """
+        Carrega as tabelas salvas com 'save'.
+
+        Raises:
+            ValueError: Se as tabelas foram calculadas para outro grafo.
+        """
+        with np.load(path) as data:
+            return cls.from_arrays(cg, data)
+
+def planar_landmarks(cg, num_landmarks=8):
+    """
+    Escolhe marcos na periferia do grafo: para cada uma de 'num_landmarks' direções em
+    torno do centroide, o nó mais extremo naquela direção.
+    """
+    cx, cy = cg.x.mean(), cg.y.mean()
+    landmarks = []
+    for angle in np.linspace(0, 2 * np.pi, num_landmarks, endpoint=False):
+        projection = (cg.x - cx) * np.cos(angle) + (cg.y - cy) * np.sin(angle)
+        node = int(np.argmax(projection))
+        if node not in landmarks:
+            landmarks.append(node)
+    return landmarks
+
+def farthest_landmarks(cg, num_landmarks=16, weight='length', seed=0):
+    """
+    Seleção 'farthest': cada novo marco é o nó alcançável mais distante (na rede) do
+    conjunto de marcos já escolhidos.
+
+    Returns:
+        LandmarkHeuristic: Heurística com os marcos e tabelas calculados.
+    """
+    rng = np.random.default_rng(seed)
+    start = int(rng.integers(cg.number_of_nodes()))
+    min_dist = compact_search.single_source_distances(cg, start, weight=weight)
+    landmarks, from_rows = [], []
+    while len(landmarks) < num_landmarks:
+        candidates = np.where(np.isfinite(min_dist), min_dist, -1.0)
+        candidates[landmarks] = -1.0
+        node = int(np.argmax(candidates))
+        if candidates[node] < 0:
+            break
+        landmarks.append(node)
+        row = compact_search.single_source_distances(cg, node, weight=weight)
+        from_rows.append(row)
+        min_dist = row if len(landmarks) == 1 else np.minimum(min_dist, row)
+    return LandmarkHeuristic(cg, landmarks, from_landmarks=np.vstack(from_rows), weight=weight)
+
+def avoid_landmarks(cg, num_landmarks=16, weight='length', seed=0):
+    """
+    Seleção 'avoid' (Goldberg e Werneck): a partir de uma raiz aleatória, pondera cada nó
+    pela diferença entre a distância real e o limite inferior dado pelos marcos atuais,
+    acumula os pesos nas subárvores sem marcos e escolhe como novo marco a folha ao fim
+    do ramo de maior peso, isto é, a região pior atendida pelos marcos existentes.
+
+    Returns:
+        LandmarkHeuristic: Heurística com os marcos e tabelas calculados.
+    """
+    rng = np.random.default_rng(seed)
+    n = cg.number_of_nodes()
+    landmarks, from_rows, to_rows = [], [], []
+    attempts = 0
+    while len(landmarks) < num_landmarks and attempts < 4 * num_landmarks:
+        attempts += 1
+        root = int(rng.integers(n))
+        dist, parents, order = compact_search.single_source_tree(cg, root, weight=weight)
+        if landmarks:
+            current = LandmarkHeuristic(cg, landmarks, np.vstack(from_rows), np.vstack(to_rows), weight=weight)
+            gap = dist - current.estimate_from(root)
+        else:
+            gap = dist.copy()
+
+        size = np.where(np.isfinite(gap), gap, 0.0)
+        covered = np.zeros(n, dtype=bool)
+        covered[landmarks] = True
+        children = {}
+        # Percorrer dos nós mais distantes para a raiz acumula o peso de cada subárvore
+        for v in reversed(order):
+            parent = parents[v]
+            if covered[v]:
+                size[v] = 0.0
+            if parent >= 0:
+                children.setdefault(parent, []).append(v)
+                covered[parent] |= covered[v]
+                size[parent] += size[v]
+
+        node = max(order, key=lambda v: size[v])
+        if size[node] <= 0:
+            continue
+        while node in children:
+            node = max(children[node], key=lambda v: size[v])
+        if node in landmarks:
+            continue
+        landmarks.append(node)
+        from_rows.append(compact_search.single_source_distances(cg, node, weight=weight))
+        to_rows.append(compact_search.single_source_distances(cg, node, weight=weight, reverse=True))
+    return LandmarkHeuristic(cg, landmarks, np.vstack(from_rows), np.vstack(to_rows), weight=weight)
+
+LANDMARK_STRATEGIES = {
+    'avoid': avoid_landmarks,
+    'farthest': farthest_landmarks,
+    'planar': lambda cg, num_landmarks=8, weight='length', seed=0: LandmarkHeuristic(
+        cg, planar_landmarks(cg, num_landmarks), weight=weight),
+}
+
+def build_landmark_heuristic(cg, num_landmarks=16, strategy='avoid', weight='length', seed=0):
+    """
+    Pré-processamento do modo ALT: escolhe os marcos pela estratégia informada e calcula
+    as tabelas de distâncias.
+
+    Args:
+        cg (CompactGraph): Grafo compacto.
+        num_landmarks (int): Número de marcos.
+        strategy (str): 'avoid', 'farthest' ou 'planar'.
+        weight (str): Perfil de peso das arestas.
+        seed (int): Semente da escolha aleatória das raízes.
+
+    Returns:
+        LandmarkHeuristic: Heurística pronta para 'alt' e 'bidirectional_alt'.
+
+    Raises:
+        ValueError: Se a estratégia não for suportada.
+    """
+    if strategy not in LANDMARK_STRATEGIES:
+        raise ValueError(f"Estratégia de seleção de marcos não suportada: {strategy}")
+    return LANDMARK_STRATEGIES[strategy](cg, num_landmarks=num_landmarks, weight=weight, seed=seed)
+
+HEURISTICS = {
+    'euclidean': EuclideanHeuristic,
+    'manhattan_bounded': ManhattanBoundedHeuristic,
+    'landmark': lambda cg, weight='length': LandmarkHeuristic(cg, planar_landmarks(cg), weight=weight),
+}
+
+def create_heuristic(name, cg, weight='length'):
+    """
+    Cria o provedor de heurística pelo nome ('euclidean', 'manhattan_bounded' ou 'landmark')
+    para o perfil de peso informado.
+
+    Raises:
+        ValueError: Se a heurística não for suportada.
+    """
+    if name not in HEURISTICS:
+        raise ValueError(f"Heurística não suportada: {name}")
+    return HEURISTICS[name](cg, weight=weight)
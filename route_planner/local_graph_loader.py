@@ -0,0 +1,206 @@
+# route_planner/local_graph_loader.py
+
+import bz2
+import gzip
+import math
+import os
+import xml.etree.ElementTree as ET
+
+import networkx as nx
+import osmnx as ox
+
+from route_planner.graph_cache import EARTH_RADIUS_M, GraphCache, bbox_from_point
+from route_planner.logger import logger
+
+# Valores de 'highway' e 'service' excluídos da rede 'drive' (mesmo filtro do OSMnx)
+EXCLUDED_HIGHWAYS = {
+    'abandoned', 'bridleway', 'bus_guideway', 'construction', 'corridor', 'cycleway',
+    'elevator', 'escalator', 'footway', 'no', 'path', 'pedestrian', 'planned', 'platform',
+    'proposed', 'raceway', 'razed', 'service', 'steps', 'track'
+}
+EXCLUDED_SERVICES = {'alley', 'driveway', 'emergency_access', 'parking', 'parking_aisle', 'private'}
+
+# Tags das vias copiadas para as arestas do grafo
+EDGE_TAGS = ('highway', 'name', 'maxspeed', 'lanes', 'ref', 'junction', 'access')
+
+def is_drivable(tags):
+    """
+    Verifica se uma via do OSM pertence à rede 'drive', seguindo o filtro do OSMnx.
+
+    Args:
+        tags (dict): Tags da via.
+
+    Returns:
+        bool: True se a via deve fazer parte do grafo.
+    """
+    highway = tags.get('highway')
+    if highway is None or highway in EXCLUDED_HIGHWAYS:
+        return False
+    if tags.get('area') == 'yes' or tags.get('access') == 'private':
+        return False
+    if tags.get('motor_vehicle') == 'no' or tags.get('motorcar') == 'no':
+        return False
+    return tags.get('service') not in EXCLUDED_SERVICES
+
+def great_circle(lat1, lon1, lat2, lon2):
+    """
+    Distância do grande círculo entre dois pontos, em metros.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    h = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(h)))
+
+class _GraphBuilder:
+    """
+    Acumula nós e vias lidos de forma incremental, guardando apenas os nós dentro do
+    bbox e os trechos de vias cujos dois extremos estão nele.
+    """
+    def __init__(self, bbox):
+        self.south, self.north, self.west, self.east = bbox
+        self.nodes = {}
+        self.G = nx.MultiDiGraph(crs='epsg:4326')
+
+    def add_node(self, osmid, lat, lon):
+        if self.south <= lat <= self.north and self.west <= lon <= self.east:
+            self.nodes[osmid] = (lat, lon)
+
+    def add_way(self, osmid, refs, tags):
+        if not is_drivable(tags):
+            return
+        oneway = tags.get('oneway', 'no')
+        reverse = oneway in ('-1', 'reverse')
+        forward_only = reverse or oneway in ('yes', 'true', '1') or tags.get('junction') == 'roundabout'
+        if reverse:
+            refs = list(reversed(refs))
+        attrs = {tag: tags[tag] for tag in EDGE_TAGS if tag in tags}
+
+        for u, v in zip(refs[:-1], refs[1:]):
+            if u not in self.nodes or v not in self.nodes or u == v:
+                continue
+            for node in (u, v):
+                if node not in self.G:
+                    lat, lon = self.nodes[node]
+                    self.G.add_node(node, y=lat, x=lon)
+            length = great_circle(*self.nodes[u], *self.nodes[v])
+            self.G.add_edge(u, v, osmid=osmid, oneway=forward_only, reversed=False, length=length, **attrs)
+            if not forward_only:
+                self.G.add_edge(v, u, osmid=osmid, oneway=False, reversed=True, length=length, **attrs)
+
+class LocalGraphLoader:
+    """
+    Classe para construir o grafo rodoviário projetado a partir de arquivos locais
+    (extratos .osm/.osm.bz2/.osm.gz, .pbf ou GraphML), sem acesso à Overpass API.
+    Extratos OSM são lidos em fluxo, de modo que apenas a área de interesse é mantida
+    em memória.
+    """
+    def __init__(self, filepath, network_type='drive'):
+        if network_type != 'drive':
+            raise ValueError("Apenas o tipo de rede 'drive' é suportado para arquivos locais.")
+        self.filepath = filepath
+        self.network_type = network_type
+
+    def load(self, origin_point, radius):
+        """
+        Lê o arquivo, recorta a área de 'radius' metros em torno da origem, mantém o maior
+        componente fracamente conexo e projeta o grafo.
+
+        Args:
+            origin_point (tuple): Coordenadas (latitude, longitude) da origem.
+            radius (int): Raio de busca em metros.
+
+        Returns:
+            tuple: (G não projetado ou None, G projetado).
+        """
+        name = self.filepath.lower()
+        if name.endswith('.graphml'):
+            return self.load_graphml(origin_point, radius)
+
+        bbox = bbox_from_point(origin_point, radius)
+        if name.endswith('.pbf'):
+            builder = self.parse_pbf(bbox)
+        elif name.endswith(('.osm', '.osm.bz2', '.osm.gz', '.xml')):
+            builder = self.parse_xml(bbox)
+        else:
+            raise ValueError(f"Formato de arquivo não suportado: {self.filepath}")
+
+        G = builder.G
+        if G.number_of_nodes() == 0:
+            raise ValueError("Nenhuma via encontrada no arquivo para a área solicitada.")
+        largest = max(nx.weakly_connected_components(G), key=len)
+        G = G.subgraph(largest).copy()
+        logger.info(f"Grafo lido de '{self.filepath}': {G.number_of_nodes()} nós, {G.number_of_edges()} arestas.")
+        return G, ox.project_graph(G)
+
+    def parse_xml(self, bbox):
+        """
+        Lê um extrato OSM XML com iterparse, descartando cada elemento após processá-lo.
+        """
+        builder = _GraphBuilder(bbox)
+        if self.filepath.endswith('.bz2'):
+            source = bz2.open(self.filepath, 'rb')
+        elif self.filepath.endswith('.gz'):
+            source = gzip.open(self.filepath, 'rb')
+        else:
+            source = open(self.filepath, 'rb')
+
+        with source:
+            context = ET.iterparse(source, events=('start', 'end'))
+            _, root = next(context)
+            for event, elem in context:
+                if event != 'end':
+                    continue
+                if elem.tag == 'node':
+                    builder.add_node(int(elem.get('id')), float(elem.get('lat')), float(elem.get('lon')))
+                elif elem.tag == 'way':
+                    refs = [int(nd.get('ref')) for nd in elem.iter('nd')]
+                    tags = {tag.get('k'): tag.get('v') for tag in elem.iter('tag')}
+                    builder.add_way(int(elem.get('id')), refs, tags)
+                elif elem.tag != 'relation':
+                    continue
+                # Liberar a memória dos elementos já processados
+                root.clear()
+        return builder
+
+    def parse_pbf(self, bbox):
+        """
+        Lê um extrato .pbf em fluxo usando o pyosmium (dependência opcional).
+        """
+        try:
+            import osmium
+        except ImportError:
+            raise ImportError("A leitura de arquivos .pbf requer o pacote 'osmium' (pyosmium).")
+
+        builder = _GraphBuilder(bbox)
+
+        class Handler(osmium.SimpleHandler):
+            def node(self, n):
+                if n.location.valid():
+                    builder.add_node(n.id, n.location.lat, n.location.lon)
+
+            def way(self, w):
+                builder.add_way(w.id, [nd.ref for nd in w.nodes], {tag.k: tag.v for tag in w.tags})
+
+        Handler().apply_file(self.filepath)
+        return builder
+
+    def load_graphml(self, origin_point, radius):
+        """
+        Carrega um GraphML salvo pelo OSMnx e o recorta à área de interesse.
+        """
+        G = ox.load_graphml(self.filepath)
+        crs = str(G.graph.get('crs', 'epsg:4326')).lower()
+        if crs in ('epsg:4326', '+init=epsg:4326'):
+            south, north, west, east = bbox_from_point(origin_point, radius)
+            inside = [node for node, data in G.nodes(data=True)
+                      if south <= data['y'] <= north and west <= data['x'] <= east]
+            G = G.subgraph(inside)
+            if G.number_of_nodes() == 0:
+                raise ValueError("Nenhuma via encontrada no arquivo para a área solicitada.")
+            largest = max(nx.weakly_connected_components(G), key=len)
+            G = G.subgraph(largest).copy()
+            return G, ox.project_graph(G)
+        # GraphML já projetado: recortar diretamente
+        logger.info(f"GraphML '{os.path.basename(self.filepath)}' já projetado ({crs}).")
+        return None, GraphCache.crop(G, origin_point, radius)
@@ -1,6 +1,7 @@
 # route_planner/main.py
 
 import sys
+import multiprocessing
 
 import warnings
 import logging
@@ -31,4 +32,6 @@ def handle_exception(exc_type, exc_value, exc_traceback):
 sys.excepthook = handle_exception
 
 if __name__ == "__main__":
+    # Necessário para os processos do cálculo paralelo no executável do PyInstaller
+    multiprocessing.freeze_support()
     RoutePlannerGUI()
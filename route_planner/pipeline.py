@@ -0,0 +1,317 @@
+# route_planner/pipeline.py
+
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+from route_planner.logger import logger
+from route_planner.geocoder import GeoCoder
+from route_planner.graph_handler import GraphHandler
+from route_planner.poi_finder import POIFinder
+from route_planner.route_calculator import RouteCalculator
+
+# Evento de progresso: etapa, situação ('started', 'finished', 'failed' ou 'cancelled'),
+# tempo decorrido na etapa (s) e detalhe opcional
+ProgressEvent = namedtuple('ProgressEvent', ['stage', 'status', 'elapsed', 'detail'])
+
+class PipelineCancelled(Exception):
+    """
+    Execução do pipeline interrompida por 'RoutePipeline.cancel'.
+    """
+
+class RoutePipeline:
+    """
+    Orquestra as etapas do planejador (geocodificação, grafo, POIs, destinos e rotas) sem
+    depender da interface gráfica, usada tanto pela GUI quanto por chamadores sem interface.
+
+    Conhecida a origem, o grafo e as feições (POIs) da área são obtidos em paralelo por um
+    executor gerenciado, pois são independentes entre si: o tempo de espera passa a ser o
+    da etapa mais lenta, e não a soma das duas. Cada etapa emite eventos de progresso
+    (ProgressEvent) para 'on_progress', e 'cancel' interrompe o pipeline na próxima
+    verificação (downloads já em andamento terminam em segundo plano e só alimentam os
+    caches).
+
+    Args:
+        graph_cache (GraphCache): Cache de grafos.
+        poi_cache (POICache): Cache de POIs.
+        geocoder (GeoCoder): Geocodificador (padrão: GeoCoder.default()).
+        network_type (str): Tipo de rede do OSMnx.
+        source_file (str): Arquivo local com a malha viária, em vez da Overpass API.
+        workers (int): Processos para o cálculo das rotas.
+        weight (str): Perfil de peso das arestas usado na seleção dos destinos e nas rotas.
+        capture_search_space (bool): Guardar os espaços de busca das rotas, para os mapas.
+        on_progress (callable): Função chamada com cada ProgressEvent (em qualquer thread).
+    """
+    STAGES = ('geocode', 'graph', 'pois', 'cuisines', 'destinations', 'routes')
+
+    def __init__(self, graph_cache=None, poi_cache=None, geocoder=None, network_type='drive', source_file=None,
+                 workers=None, on_progress=None, weight='length', capture_search_space=False):
+        self.graph_cache = graph_cache
+        self.poi_cache = poi_cache
+        self.geocoder = geocoder
+        self.network_type = network_type
+        self.source_file = source_file
+        self.workers = workers
+        self.weight = weight
+        self.capture_search_space = capture_search_space
+        self.on_progress = on_progress
+        self._cancel = threading.Event()
+
+        self.origin_point = None
+        self.origin_address = None
+        self.address_candidates = []  # Resultados da geocodificação quando houver mais de um
+        self.radius = None
+        self.graph_handler = None
+        self.poi_finder = None
+        self.cuisine = None
+        self.selected_nodes = []
+        self.selected_names = []
+        self.selected_dists = []
+        self.selected_coords_geo = []
+        self.route_calculator = None
+        self._preprocessing = {}  # Perfil de peso -> pré-processamentos da área carregada
+        self._pois_cuisine = None  # Tipo de estabelecimento dos POIs já associados às vias
+
+    def cancel(self):
+        """
+        Solicita a interrupção do pipeline.
+        """
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        """
+        Raises:
+            PipelineCancelled: Se o cancelamento tiver sido solicitado.
+        """
+        if self._cancel.is_set():
+            raise PipelineCancelled("Execução cancelada.")
+
+    def _emit(self, stage, status, elapsed=0.0, detail=None):
+        logger.info(f"Pipeline: etapa '{stage}' {status} ({elapsed:.3f} s)")
+        if self.on_progress is not None:
+            self.on_progress(ProgressEvent(stage, status, elapsed, detail))
+
+    def _stage(self, stage, func, *args):
+        # Executa uma etapa, emitindo os eventos de início e de término
+        self.check_cancelled()
+        self._emit(stage, 'started')
+        start = time.perf_counter()
+        try:
+            result = func(*args)
+        except Exception as e:
+            self._emit(stage, 'failed', time.perf_counter() - start, str(e))
+            raise
+        if self._cancel.is_set():
+            self._emit(stage, 'cancelled', time.perf_counter() - start)
+            raise PipelineCancelled("Execução cancelada.")
+        self._emit(stage, 'finished', time.perf_counter() - start)
+        return result
+
+    def locate(self, address=None, origin_point=None, choose_address=None):
+        """
+        Define a origem a partir de coordenadas ou geocodificando o endereço.
+
+        Args:
+            address (str): Endereço de origem.
+            origin_point (tuple): Coordenadas (latitude, longitude), dispensando a geocodificação.
+            choose_address (callable): Recebe a lista de resultados quando houver mais de um
+                e retorna o escolhido (ou None). Padrão: o primeiro resultado.
+
+        Returns:
+            bool: True se a origem foi definida.
+        """
+        if origin_point is not None:
+            self.origin_point = tuple(origin_point)
+            self.origin_address = address or ''
+            return True
+
+        geocoder = GeoCoder.default() if self.geocoder is None else self.geocoder
+        result = self._stage('geocode', geocoder.geocode, address)
+        self.address_candidates = result if isinstance(result, list) else []
+        if isinstance(result, list):
+            result = result[0] if choose_address is None else choose_address(result)
+        if result is None:
+            return False
+        self.origin_point = (result[0], result[1])
+        self.origin_address = result[2]
+        logger.info(f"Endereço selecionado: {self.origin_address}")
+        return True
+
+    def _load_graph(self, handler):
+        handler.create_graph()
+        handler.find_origin_node()
+        return handler
+
+    def load_area(self, radius):
+        """
+        Obtém, em paralelo, o grafo da área e as feições (POIs) em torno da origem.
+
+        Args:
+            radius (int): Raio de busca em metros.
+
+        Returns:
+            tuple: (GraphHandler, POIFinder) prontos para as etapas seguintes.
+
+        Raises:
+            PipelineCancelled: Se o pipeline for cancelado durante os downloads.
+        """
+        self.check_cancelled()
+        self.radius = radius
+        handler = GraphHandler(self.origin_point, radius, network_type=self.network_type,
+                               cache=self.graph_cache, source_file=self.source_file)
+        # O grafo só é necessário ao associar os POIs aos nós, depois de ambos carregados
+        finder = POIFinder(None, self.origin_point, radius, cache=self.poi_cache)
+
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='pipeline')
+        try:
+            pending = [
+                executor.submit(self._stage, 'graph', self._load_graph, handler),
+                executor.submit(self._stage, 'pois', finder.fetch_features),
+            ]
+            while pending:
+                done, pending = wait(pending, timeout=0.1, return_when=FIRST_EXCEPTION)
+                for future in done:
+                    if future.exception() is not None:
+                        raise future.exception()
+                self.check_cancelled()
+        finally:
+            # Sem aguardar downloads em andamento em caso de falha ou cancelamento
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        finder.G_projected = handler.G_projected
+        finder.compact_graph = handler.compact_graph
+        self.graph_handler, self.poi_finder = handler, finder
+        self._preprocessing = {}
+        self._pois_cuisine = None
+        return handler, finder
+
+    def available_cuisines(self):
+        """
+        Retorna a contagem de estabelecimentos por tipo ('cuisine') na área carregada.
+        """
+        self._stage('cuisines', self.poi_finder.get_available_cuisines)
+        return self.poi_finder.cuisine_counts
+
+    def _select_destinations(self, num_destinations):
+        finder = self.poi_finder
+        if finder.cuisine != self._pois_cuisine:
+            # POIs filtrados e associados às vias uma vez por tipo de estabelecimento na área
+            finder.destination_nodes, finder.destination_names, finder.destination_coords_geo = [], [], []
+            finder.get_pois()
+            self._pois_cuisine = finder.cuisine
+        if len(finder.destination_nodes) == 0:
+            return []
+
+        # Uma única busca a partir da origem, encerrada ao fixar os destinos mais próximos;
+        # com custos negativos (só o Bellman-Ford os aceita), a seleção usa a distância
+        compact_graph = self.graph_handler.compact_graph
+        calculator = RouteCalculator(
+            self.graph_handler.G_projected,
+            self.graph_handler.origin_node,
+            finder.destination_nodes,
+            compact_graph=compact_graph,
+            weight='length' if compact_graph.has_negative_weights(self.weight) else self.weight
+        )
+        nearest = calculator.nearest_destinations(k=num_destinations)
+        if not nearest:
+            print("Nenhum destino alcançável encontrado.")
+
+        # Extrair os nós, nomes, distâncias e coordenadas dos destinos selecionados
+        self.selected_nodes = [finder.destination_nodes[idx] for dist, idx in nearest]
+        self.selected_names = [finder.destination_names[idx] for dist, idx in nearest]
+        self.selected_dists = [dist for dist, idx in nearest]
+        self.selected_coords_geo = [finder.destination_coords_geo[idx] for dist, idx in nearest]
+        return self.selected_nodes
+
+    def select_destinations(self, cuisine, num_destinations):
+        """
+        Filtra os POIs do tipo informado e seleciona os destinos mais próximos da origem.
+
+        Returns:
+            list: Nós dos destinos selecionados (vazia se nenhum for encontrado).
+        """
+        self.cuisine = cuisine
+        self.poi_finder.cuisine = cuisine
+        self.selected_nodes, self.selected_names, self.selected_dists, self.selected_coords_geo = [], [], [], []
+        return self._stage('destinations', self._select_destinations, num_destinations)
+
+    def preprocessing(self, algorithms):
+        """
+        Pré-processamentos exigidos pelos algoritmos, obtidos uma vez por área e perfil de
+        peso (do cache de grafos, quando disponíveis) e repassados a cada RouteCalculator.
+        """
+        preprocessing = self._preprocessing.setdefault(self.weight, {})
+        if any(alg in RouteCalculator.ALT_ALGORITHMS for alg in algorithms) and \
+                'landmark_heuristic' not in preprocessing:
+            preprocessing['landmark_heuristic'] = self.graph_handler.landmark_heuristic(weight=self.weight)
+        if 'ch' in algorithms and 'contraction_hierarchy' not in preprocessing:
+            preprocessing['contraction_hierarchy'] = self.graph_handler.contraction_hierarchy(weight=self.weight)
+        return preprocessing
+
+    def _calculate_routes(self, algorithms):
+        calculator = RouteCalculator(
+            self.graph_handler.G_projected,
+            self.graph_handler.origin_node,
+            self.selected_nodes,
+            compact_graph=self.graph_handler.compact_graph,
+            weight=self.weight,
+            capture_search_space=self.capture_search_space,
+            **self.preprocessing(algorithms)
+        )
+        calculator.calculate_routes(algorithms=algorithms, workers=self.workers)
+        return calculator
+
+    def calculate_routes(self, algorithms):
+        """
+        Calcula as rotas até os destinos selecionados com cada algoritmo.
+
+        Returns:
+            RouteCalculator: Calculador com as rotas e os tempos médios.
+        """
+        self.route_calculator = self._stage('routes', self._calculate_routes, algorithms)
+        return self.route_calculator
+
+    def run(self, radius, num_destinations, algorithms, address=None, origin_point=None, cuisine=None,
+            choose_address=None, choose_cuisine=None):
+        """
+        Executa o pipeline completo.
+
+        Args:
+            radius (int): Raio de busca em metros.
+            num_destinations (int): Número de destinos mais próximos.
+            algorithms (list): Algoritmos de caminho mínimo.
+            address (str): Endereço de origem (geocodificado se 'origin_point' não for informado).
+            origin_point (tuple): Coordenadas (latitude, longitude) da origem.
+            cuisine (str): Tipo de estabelecimento; se None, 'choose_cuisine' é chamado.
+            choose_address (callable): Ver 'locate'.
+            choose_cuisine (callable): Recebe a contagem por tipo de estabelecimento e retorna
+                o tipo escolhido (ou None).
+
+        Returns:
+            RouteCalculator or None: Calculador com as rotas, ou None se o pipeline parar
+            antes (origem não encontrada, nenhum tipo escolhido ou nenhum destino).
+
+        Raises:
+            PipelineCancelled: Se o pipeline for cancelado.
+        """
+        if not self.locate(address, origin_point, choose_address):
+            print("Endereço não encontrado. Tente novamente.")
+            return None
+        self.load_area(radius)
+
+        if cuisine is None:
+            cuisine_counts = self.available_cuisines()
+            if not cuisine_counts or choose_cuisine is None:
+                return None
+            cuisine = choose_cuisine(cuisine_counts)
+            if cuisine is None:
+                return None
+
+        if not self.select_destinations(cuisine, num_destinations):
+            return None
+        return self.calculate_routes(algorithms)
@@ -0,0 +1,106 @@
+# route_planner/poi_cache.py
+
+import os
+import pickle
+
+from route_planner.graph_cache import GraphCache, bbox_from_point
+from route_planner.logger import logger
+
+def tags_label(tags):
+    """
+    Representação estável das tags do OSM usada nas chaves do cache (ex.: 'amenity-restaurant').
+    """
+    parts = []
+    for key in sorted(tags):
+        value = tags[key]
+        if isinstance(value, (list, tuple)):
+            value = '+'.join(sorted(str(v) for v in value))
+        parts.append(f"{key}-{value}")
+    return '_'.join(parts)
+
+def crop_features(features, origin_point, radius):
+    """
+    Mantém as feições cujo centro do retângulo envolvente está no bbox de 'radius' metros
+    em torno da origem, o mesmo critério de área de ox.features_from_point.
+
+    Args:
+        features (geopandas.GeoDataFrame): Feições em EPSG:4326.
+        origin_point (tuple): Coordenadas (latitude, longitude) da origem.
+        radius (int): Raio em metros.
+
+    Returns:
+        geopandas.GeoDataFrame: Feições dentro da área.
+    """
+    south, north, west, east = bbox_from_point(origin_point, radius)
+    bounds = features.geometry.bounds
+    lon = (bounds['minx'] + bounds['maxx']) / 2
+    lat = (bounds['miny'] + bounds['maxy']) / 2
+    inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+    return features[inside.to_numpy()]
+
+class POICache(GraphCache):
+    """
+    Armazenamento local das feições (POIs) baixadas com ox.features_from_point, indexado
+    por (origem arredondada, raio, tags). Segue o mesmo formato de índice do GraphCache;
+    um raio menor é atendido recortando uma entrada de raio maior com a mesma origem.
+    """
+    def __init__(self, cache_dir='cache/pois', precision=4):
+        super().__init__(cache_dir=cache_dir, precision=precision)
+
+    def load(self, origin_point, radius, tags):
+        """
+        Procura as feições para a origem, o raio e as tags informados.
+
+        Returns:
+            geopandas.GeoDataFrame or None: Feições em EPSG:4326, ou None se não houver
+            entrada que atenda ao pedido.
+        """
+        label = tags_label(tags)
+        index = self.load_index()
+        origin = tuple(round(coord, self.precision) for coord in origin_point)
+        candidates = [
+            (entry['radius'], cached_key) for cached_key, entry in index.items()
+            if entry['tags'] == label and entry['radius'] >= radius
+            and (round(entry['latitude'], self.precision), round(entry['longitude'], self.precision)) == origin
+        ]
+        for cached_radius, cached_key in sorted(candidates):
+            try:
+                with open(self.entry_path(cached_key, '.pkl'), 'rb') as f:
+                    features = pickle.load(f)
+            except Exception as e:
+                logger.warning(f"Falha ao ler os POIs '{cached_key}' do cache: {e}")
+                continue
+            logger.info(f"POIs '{cached_key}' carregados do cache.")
+            if cached_radius > radius:
+                features = crop_features(features, origin_point, radius)
+            return features
+        return None
+
+    def save(self, origin_point, radius, tags, features):
+        """
+        Armazena as feições no cache.
+
+        Args:
+            origin_point (tuple): Coordenadas (latitude, longitude) da origem.
+            radius (int): Raio de busca em metros.
+            tags (dict): Tags usadas na consulta ao OSM.
+            features (geopandas.GeoDataFrame): Feições retornadas pelo OSMnx.
+        """
+        label = tags_label(tags)
+        key = self.key(origin_point, radius, label)
+        try:
+            tmp_path = self.entry_path(key, f'.pkl.{os.getpid()}.tmp')
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(features, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.entry_path(key, '.pkl'))
+
+            self._update_index(key, {
+                'latitude': origin_point[0],
+                'longitude': origin_point[1],
+                'radius': int(radius),
+                'tags': label,
+                'count': len(features),
+            })
+            logger.info(f"POIs '{key}' salvos no cache.")
+        except Exception as e:
+            logger.error(f"Erro ao salvar os POIs no cache: {e}")
@@ -1,27 +1,101 @@
 # route_planner/poi_finder.py
 
+import threading
+from collections import OrderedDict
+
 import osmnx as ox
 import geopandas as gpd
 from shapely.geometry import Point
 
 # Importar o logger
 from route_planner.logger import logger
+from route_planner.poi_cache import crop_features, tags_label
+from route_planner.cuisine_index import CuisineIndex
+from route_planner.compact_graph import CompactGraph
+from route_planner.snap_index import SnapIndex
 from collections import Counter
 
 class POIFinder:
     """
     Classe para encontrar pontos de interesse (POIs), como estabelecimentos comerciais,
     dentro de um raio especificado a partir de um ponto de origem.
+
+    As feições são baixadas uma única vez por área e mantidas em memória durante a sessão
+    (compartilhadas entre instâncias), junto com o índice invertido de cozinhas
+    (CuisineIndex). Se um POICache for informado, as feições também são lidas e salvas em
+    disco. Raios menores são atendidos recortando uma área maior já carregada. Os POIs são
+    associados ao grafo pelo SnapIndex do grafo compacto: à aresta mais próxima (a via em
+    frente ao estabelecimento) e, nela, à extremidade mais próxima, descartando os que
+    estiverem a mais de 'max_snap_distance' metros da via.
     """
-    def __init__(self, G_projected, origin_point_geo, radius):
+    TAGS = {'amenity': 'restaurant'}
+    SESSION_SIZE = 8
+
+    # Feições carregadas na sessão: (lat, lon, raio, tags) -> (GeoDataFrame, CuisineIndex),
+    # compartilhadas entre threads (pipeline, servidor) e protegidas por '_session_lock'
+    _session = OrderedDict()
+    _session_lock = threading.Lock()
+
+    def __init__(self, G_projected, origin_point_geo, radius, cache=None, compact_graph=None, max_snap_distance=None):
         self.G_projected = G_projected
+        self.compact_graph = compact_graph
+        self.max_snap_distance = max_snap_distance  # Distância máxima (m) entre o POI e a via associada
         self.origin_point_geo = origin_point_geo  # (latitude, longitude)
         self.radius = radius
+        self.cache = cache
         self.cuisine = None  # Será definido após a seleção pelo usuário
         self.destination_nodes = []
         self.destination_coords_geo = []
         self.destination_names = []
         self.cuisine_counts = {}  # Dicionário para armazenar tipos de estabelecimentos e suas quantidades
+        self.features = None
+        self.cuisine_index = None  # Índice invertido das cozinhas de 'features'
+
+    def fetch_features(self):
+        """
+        Obtém as feições da área (memória da sessão, cache em disco ou Overpass API, nessa
+        ordem) e o índice de cozinhas correspondente.
+
+        Returns:
+            geopandas.GeoDataFrame: Feições da área.
+        """
+        if self.features is not None:
+            return self.features
+
+        label = tags_label(self.TAGS)
+        origin = tuple(round(coord, 4) for coord in self.origin_point_geo)
+        key = (*origin, self.radius, label)
+        entry = None
+        with self._session_lock:
+            session = list(self._session.items())
+        # Downloads e recortes fora da trava, para não bloquear as demais áreas
+        for (lat, lon, radius, cached_label), (cached, index) in reversed(session):
+            if (lat, lon) == origin and cached_label == label and radius >= self.radius:
+                if radius == self.radius:
+                    entry = (cached, index)
+                else:
+                    cropped = crop_features(cached, self.origin_point_geo, self.radius)
+                    entry = (cropped, CuisineIndex(cropped))
+                break
+
+        if entry is None:
+            pois = None
+            if self.cache is not None:
+                pois = self.cache.load(self.origin_point_geo, self.radius, self.TAGS)
+            if pois is None:
+                pois = ox.features_from_point(self.origin_point_geo, tags=self.TAGS, dist=self.radius)
+                if self.cache is not None:
+                    self.cache.save(self.origin_point_geo, self.radius, self.TAGS, pois)
+            entry = (pois, CuisineIndex(pois))
+
+        with self._session_lock:
+            self._session[key] = entry
+            self._session.move_to_end(key)
+            while len(self._session) > self.SESSION_SIZE:
+                self._session.popitem(last=False)
+
+        self.features, self.cuisine_index = entry
+        return self.features
 
     def get_available_cuisines(self):
         """
@@ -29,9 +103,8 @@ class POIFinder:
         juntamente com a contagem de estabelecimentos para cada tipo.
         """
         # Buscar todos os restaurantes na área
-        tags = {'amenity': 'restaurant'}
         try:
-            pois = ox.features_from_point(self.origin_point_geo, tags=tags, dist=self.radius)
+            pois = self.fetch_features()
         except Exception as e:
             print(f"Erro ao obter POIs: {e}")
             logger.error(f"Erro ao obter POIs: {e}")
@@ -45,13 +118,8 @@ class POIFinder:
         # Obter todas as tags 'cuisine' disponíveis e contar os estabelecimentos
         self.cuisine_counts = {}
         if 'cuisine' in pois.columns:
-            # Expandir as entradas com múltiplas cozinhas separadas por ';'
-            pois['cuisine_list'] = pois['cuisine'].str.split(';')
-            pois['cuisine_list'] = pois['cuisine_list'].apply(lambda x: [c.strip() for c in x] if isinstance(x, list) else [])
-
-            # Contar as ocorrências de cada 'cuisine'
-            cuisine_list = [cuisine for sublist in pois['cuisine_list'] for cuisine in sublist]
-            self.cuisine_counts = Counter(cuisine_list)
+            # Contar os estabelecimentos de cada 'cuisine' a partir do índice
+            self.cuisine_counts = Counter(self.cuisine_index.counts())
         else:
             # Se não houver 'cuisine', tentar usar 'name' como alternativa
             if 'name' in pois.columns:
@@ -69,9 +137,8 @@ class POIFinder:
             print("Nenhuma 'cuisine' foi selecionada.")
             return
 
-        tags = {'amenity': 'restaurant'}
         try:
-            pois = ox.features_from_point(self.origin_point_geo, tags=tags, dist=self.radius)
+            pois = self.fetch_features()
         except Exception as e:
             print(f"Erro ao obter POIs: {e}")
             return
@@ -82,16 +149,12 @@ class POIFinder:
 
         # Filtrar por 'cuisine' selecionada
         if 'cuisine' in pois.columns:
-            # Expandir as entradas com múltiplas cozinhas separadas por ';'
-            pois['cuisine_list'] = pois['cuisine'].str.split(';')
-            pois['cuisine_list'] = pois['cuisine_list'].apply(lambda x: [c.strip() for c in x] if isinstance(x, list) else [])
-
-            # Filtrar os POIs que contêm a 'cuisine' selecionada
-            pois_filtered = pois[pois['cuisine_list'].apply(lambda x: self.cuisine in x)]
+            # Filtrar os POIs que contêm a(s) 'cuisine'(s) selecionada(s), pelo índice invertido
+            pois_filtered = pois.iloc[self.cuisine_index.lookup(self.cuisine)]
             print(f"{len(pois_filtered)} estabelecimentos correspondem à busca por '{self.cuisine}'.")
         else:
             # Se não houver 'cuisine', usar 'name' como alternativa
-            pois_filtered = pois[pois['name'].str.contains(self.cuisine, case=False, na=False)]
+            pois_filtered = pois.iloc[self.cuisine_index.search_names(self.cuisine)]
             print(f"{len(pois_filtered)} estabelecimentos correspondem à busca por nome contendo '{self.cuisine}'.")
 
         if pois_filtered.empty:
@@ -104,19 +167,23 @@ class POIFinder:
         # Calcular os centróides
         pois_centroids_projected = pois_projected.geometry.centroid
 
-        # Obter coordenadas projetadas
-        pois_coords_proj = [(point.x, point.y) for point in pois_centroids_projected]
-
-        # Encontrar os nós mais próximos
-        self.destination_nodes = ox.distance.nearest_nodes(
-            self.G_projected,
-            X=[coord[0] for coord in pois_coords_proj],
-            Y=[coord[1] for coord in pois_coords_proj]
+        # Associar às vias mais próximas em uma única consulta ao índice espacial do grafo
+        if self.compact_graph is None:
+            self.compact_graph = CompactGraph.from_networkx(self.G_projected)
+        nodes = SnapIndex.for_graph(self.compact_graph).nearest_edge_node_ids(
+            pois_centroids_projected.x.to_numpy(),
+            pois_centroids_projected.y.to_numpy(),
+            max_distance=self.max_snap_distance
         )
+        keep = [node is not None for node in nodes]
+        if not all(keep):
+            print(f"{keep.count(False)} estabelecimentos descartados por estarem a mais de "
+                  f"{self.max_snap_distance} m do grafo.")
+        self.destination_nodes = [node for node in nodes if node is not None]
 
         # Obter nomes dos estabelecimentos
-        self.destination_names = pois_projected['name'].tolist()
+        self.destination_names = pois_projected['name'][keep].tolist()
 
         # Converter para coordenadas geográficas para plotagem
-        pois_centroids_geo = pois_centroids_projected.to_crs(epsg=4326)
-        self.destination_coords_geo = [(point.y, point.x) for point in pois_centroids_geo]
+        pois_centroids_geo = pois_centroids_projected[keep].to_crs(epsg=4326)
+        self.destination_coords_geo = list(zip(pois_centroids_geo.y.tolist(), pois_centroids_geo.x.tolist()))
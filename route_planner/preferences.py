@@ -9,12 +9,22 @@ class UserPreferences:
     tipo de estabelecimento e número de destinos. As preferências são salvas em um
     arquivo JSON para serem persistidas entre sessões.
     """
+    DEFAULT_ALGORITHMS = ('dijkstra', 'astar', 'bellman_ford', 'bidirectional_dijkstra', 'bidirectional_a_star')
+
     def __init__(self, filename='user_preferences.json'):
         self.filename = filename
         self.preferences = self.load_preferences()
         # Definir cores e estilos padrão se não existirem
         if 'visualization' not in self.preferences:
             self.preferences['visualization'] = self.default_visualization_preferences()
+        else:
+            # Completar com os algoritmos adicionados após a criação do arquivo
+            for alg, prefs in self.default_visualization_preferences().items():
+                self.preferences['visualization'].setdefault(alg, prefs)
+        # Camada com o espaço de busca de cada algoritmo no mapa: 'heatmap', 'hull' ou None
+        self.preferences.setdefault('search_space_layer', None)
+        # Algoritmos executados pela interface; ALT e CH exigem pré-processamento por área e são opcionais
+        self.preferences.setdefault('algorithms', list(self.DEFAULT_ALGORITHMS))
 
     def default_visualization_preferences(self):
         """
@@ -25,9 +35,19 @@ class UserPreferences:
             'astar': {'color': 'purple', 'style': 'solid'},
             'bellman_ford': {'color': 'orange', 'style': 'solid'},
             'bidirectional_dijkstra': {'color': 'blue', 'style': 'solid'},
-            'bidirectional_a_star': {'color': 'darkgreen', 'style': 'solid'}
+            'bidirectional_a_star': {'color': 'darkgreen', 'style': 'solid'},
+            'alt': {'color': 'red', 'style': 'dashed'},
+            'bidirectional_alt': {'color': 'darkred', 'style': 'dashed'},
+            'ch': {'color': 'black', 'style': 'dotted'}
         }
 
+    def selected_algorithms(self):
+        """
+        Retorna os algoritmos marcados para execução, na ordem das preferências de visualização.
+        """
+        selected = set(self.preferences.get('algorithms') or self.DEFAULT_ALGORITHMS)
+        return [alg for alg in self.default_visualization_preferences() if alg in selected]
+
     def save_preferences(self):
         """
         Salva as preferências atuais no arquivo JSON especificado.
@@ -0,0 +1,398 @@
+# route_planner/results_store.py
+
+import argparse
+import csv
+import os
+import re
+import sqlite3
+import time
+
+import pandas as pd
+
+from route_planner.logger import logger
+from route_planner.route_calculator import STATS_COLUMNS
+
+# Banco de resultados usado pela interface e pela análise de dados
+DEFAULT_RESULTS_PATH = 'resultados.sqlite'
+
+# Uso (importação das planilhas antigas para um único banco):
+#     python -m route_planner.results_store resultados.sqlite data/resultados/*.csv
+
+# Colunas de cada execução, com os nomes usados nas planilhas (RoutePlannerGUI.save_results
+# e route_planner.batch) e no DataFrame de 'ResultsStore.frame'
+RUN_COLUMNS = {
+    'scenario': 'Cenário',
+    'address': 'Endereço de Origem',
+    'latitude': 'Latitude',
+    'longitude': 'Longitude',
+    'radius': 'Raio de Busca (m)',
+    'cuisine': 'Tipo de Estabelecimento',
+    'num_nodes': 'Número de Vértices',
+    'num_edges': 'Número de Arestas',
+    'density': 'Densidade do Grafo',
+    'num_destinations': 'Número de Destinos',
+    'weight': 'Perfil de Peso',
+}
+
+# Filtros aceitos por 'frame' e 'timings': campo -> expressão SQL
+FILTERS = {
+    'source': 'runs.source = ?',
+    'scenario': 'runs.scenario = ?',
+    'cuisine': 'runs.cuisine = ?',
+    'weight': 'runs.weight = ?',
+    'radius': 'runs.radius = ?',
+    'min_nodes': 'runs.num_nodes >= ?',
+    'max_nodes': 'runs.num_nodes <= ?',
+    'since': 'runs.created >= ?',
+}
+
+# Colunas de tempo por algoritmo: campo -> nome na planilha ('{}' é o algoritmo). A mediana
+# e o p95 vêm das execuções repetidas de RouteBenchmark (ver route_planner.batch --repetitions)
+TIME_COLUMNS = {
+    'avg_seconds': 'Tempo Médio {} (s)',
+    'median_seconds': 'Tempo Mediano {} (s)',
+    'p95_seconds': 'Tempo P95 {} (s)',
+}
+
+_TABLE_OPTIONS = ' STRICT' if sqlite3.sqlite_version_info >= (3, 37) else ''
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS origins (
+    id INTEGER PRIMARY KEY,
+    address TEXT NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    UNIQUE (address, latitude, longitude)
+){_TABLE_OPTIONS};
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    origin_id INTEGER NOT NULL REFERENCES origins (id),
+    created REAL NOT NULL,
+    source TEXT NOT NULL,
+    scenario TEXT,
+    radius REAL,
+    cuisine TEXT,
+    num_nodes INTEGER,
+    num_edges INTEGER,
+    density REAL,
+    num_destinations INTEGER,
+    weight TEXT NOT NULL DEFAULT 'length'
+){_TABLE_OPTIONS};
+CREATE TABLE IF NOT EXISTS algorithm_results (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    algorithm TEXT NOT NULL,
+    avg_seconds REAL,
+    median_seconds REAL,
+    p95_seconds REAL,
+    queries INTEGER,
+    settled REAL,
+    relaxed REAL,
+    pushes REAL,
+    pops REAL,
+    peak_frontier INTEGER,
+    meeting_position REAL,
+    PRIMARY KEY (run_id, algorithm)
+){_TABLE_OPTIONS};
+CREATE TABLE IF NOT EXISTS query_timings (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    algorithm TEXT NOT NULL,
+    target INTEGER,
+    seconds REAL NOT NULL
+){_TABLE_OPTIONS};
+CREATE INDEX IF NOT EXISTS runs_source ON runs (source, scenario);
+CREATE INDEX IF NOT EXISTS runs_nodes ON runs (num_nodes);
+CREATE INDEX IF NOT EXISTS query_timings_run ON query_timings (run_id, algorithm);
+"""
+
+def algorithm_label(alg):
+    return alg.replace('_', ' ').capitalize()
+
+def algorithm_key(label):
+    return label.lower().replace(' ', '_')
+
+def algorithm_results(calculator, algorithms):
+    """
+    Reúne os resultados de uma RouteCalculator no formato de 'ResultsStore.add_run':
+    tempo médio, tempo de cada rota (com o nó de destino) e contadores de esforço.
+
+    Args:
+        calculator (RouteCalculator): Calculadora após 'calculate_routes'.
+        algorithms (list): Algoritmos a registrar.
+
+    Returns:
+        dict: Algoritmo -> resultados.
+    """
+    results = {}
+    for alg in algorithms:
+        routes = calculator.routes.get(alg, [])
+        seconds = calculator.query_times.get(alg, [])
+        result = {
+            'avg_seconds': calculator.avg_times.get(alg),
+            'timings': [(route[-1], elapsed) for route, elapsed in zip(routes, seconds)],
+        }
+        stats = calculator.search_stats.get(alg)
+        if stats is not None and stats.searches:
+            summary = stats.summary()
+            result['queries'] = summary.pop('searches')
+            result.update(summary)
+        results[alg] = result
+    return results
+
+class ResultsStore:
+    """
+    Banco SQLite com os resultados das execuções, substituindo as planilhas CSV
+    acrescidas linha a linha.
+
+    O esquema é tipado e normalizado: a origem (endereço completo e coordenadas) fica
+    uma única vez na tabela 'origins'; cada execução ('runs') guarda os parâmetros e o
+    tamanho do grafo; 'algorithm_results' guarda o tempo médio e os contadores de esforço
+    de cada algoritmo, e 'query_timings' o tempo de cada rota, e não só a média.
+
+    O banco usa o modo WAL, de modo que várias execuções em lote podem gravar ao mesmo
+    tempo (cada execução é uma única transação, que espera a vez da anterior) enquanto a
+    análise lê. As leituras filtram no próprio banco (ver FILTERS), sem reler tudo.
+
+    Args:
+        path (str): Arquivo do banco (':memory:' para um banco apenas da sessão).
+        timeout (float): Tempo máximo de espera por outro processo gravando, em segundos.
+    """
+    def __init__(self, path=DEFAULT_RESULTS_PATH, timeout=30.0):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        # Transações controladas explicitamente (BEGIN IMMEDIATE em 'add_run')
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA foreign_keys=ON")
+        self._connection.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        # Bancos criados antes das colunas de mediana e p95
+        existing = {row[1] for row in self._connection.execute("PRAGMA table_info(algorithm_results)")}
+        for field in TIME_COLUMNS:
+            if field not in existing:
+                self._connection.execute(f"ALTER TABLE algorithm_results ADD COLUMN {field} REAL")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def add_run(self, run, algorithms, source='gui', created=None):
+        """
+        Registra uma execução.
+
+        Args:
+            run (dict): Parâmetros da execução, com as chaves de RUN_COLUMNS ('address',
+                'latitude' e 'longitude' são obrigatórias).
+            algorithms (dict): Algoritmo -> resultados: os tempos de TIME_COLUMNS
+                ('avg_seconds' e, opcionalmente, 'median_seconds' e 'p95_seconds'), os
+                contadores de esforço ('queries', 'settled', ...) e 'timings', lista de
+                (destino, segundos). Ver 'algorithm_results'.
+            source (str): Origem dos dados ('gui', 'batch', 'csv:<arquivo>', ...).
+            created (float): Momento da execução (padrão: agora).
+
+        Returns:
+            int: Identificador da execução.
+        """
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT OR IGNORE INTO origins (address, latitude, longitude) VALUES (?, ?, ?)",
+                (run['address'] or '', float(run['latitude']), float(run['longitude']))
+            )
+            origin_id = connection.execute(
+                "SELECT id FROM origins WHERE address = ? AND latitude = ? AND longitude = ?",
+                (run['address'] or '', float(run['latitude']), float(run['longitude']))
+            ).fetchone()[0]
+            run_id = connection.execute(
+                "INSERT INTO runs (origin_id, created, source, scenario, radius, cuisine, num_nodes, num_edges, "
+                "density, num_destinations, weight) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (origin_id, time.time() if created is None else created, source,
+                 None if run.get('scenario') is None else str(run['scenario']),
+                 _float(run.get('radius')), run.get('cuisine'), _int(run.get('num_nodes')),
+                 _int(run.get('num_edges')), _float(run.get('density')), _int(run.get('num_destinations')),
+                 run.get('weight') or 'length')
+            ).lastrowid
+            for alg, result in algorithms.items():
+                connection.execute(
+                    "INSERT INTO algorithm_results (run_id, algorithm, avg_seconds, median_seconds, p95_seconds, "
+                    "queries, settled, relaxed, pushes, pops, peak_frontier, meeting_position) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, alg, _float(result.get('avg_seconds')), _float(result.get('median_seconds')),
+                     _float(result.get('p95_seconds')), _int(result.get('queries')),
+                     _float(result.get('settled')), _float(result.get('relaxed')), _float(result.get('pushes')),
+                     _float(result.get('pops')), _int(result.get('peak_frontier')),
+                     _float(result.get('meeting_position')))
+                )
+                connection.executemany(
+                    "INSERT INTO query_timings (run_id, algorithm, target, seconds) VALUES (?, ?, ?, ?)",
+                    ((run_id, alg, int(target), float(seconds)) for target, seconds in result.get('timings', ()))
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return run_id
+
+    def import_csv(self, path, source=None):
+        """
+        Importa uma planilha de resultados no formato de RoutePlannerGUI.save_results ou
+        de route_planner.batch (uma execução por linha, apenas tempos médios).
+
+        Linhas com mais valores que o cabeçalho (colunas acrescentadas a um arquivo já
+        existente) têm os valores excedentes descartados, e linhas com erro são ignoradas.
+
+        Args:
+            path (str): Arquivo CSV.
+            source (str): Origem registrada (padrão: 'csv:<nome do arquivo>').
+
+        Returns:
+            int: Número de execuções importadas.
+        """
+        name = os.path.basename(path)
+        source = f"csv:{name}" if source is None else source
+        # 'resultados_rural_1.csv' -> cenário 'rural_1'
+        default_scenario = re.sub(r'^resultados_?', '', os.path.splitext(name)[0]) or None
+        created = os.path.getmtime(path)
+        imported = truncated = 0
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            for values in reader:
+                if not values:
+                    continue
+                if len(values) > len(header):
+                    truncated += 1
+                row = dict(zip(header, values))
+                if row.get('Erro'):
+                    continue
+                run = {field: row.get(column) or None for field, column in RUN_COLUMNS.items()}
+                if run['latitude'] is None or run['longitude'] is None:
+                    continue
+                run['scenario'] = run['scenario'] if run['scenario'] is not None else default_scenario
+                self.add_run(run, _csv_algorithms(row), source=source, created=created)
+                imported += 1
+        if truncated:
+            logger.warning(f"{truncated} linhas de '{name}' tinham mais valores que o cabeçalho; excedentes descartados.")
+        logger.info(f"{imported} execuções importadas de '{name}'.")
+        return imported
+
+    def _where(self, filters):
+        unknown = set(filters) - set(FILTERS)
+        if unknown:
+            raise ValueError(f"Filtros não suportados: {', '.join(sorted(unknown))}.")
+        clauses = [FILTERS[field] for field, value in filters.items() if value is not None]
+        params = [value for value in filters.values() if value is not None]
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def frame(self, algorithms=None, **filters):
+        """
+        Retorna as execuções em uma tabela larga, uma linha por execução, com as mesmas
+        colunas das planilhas ('Tempo Médio Dijkstra (s)', 'Tempo Mediano Dijkstra (s)',
+        'Nós Fixados Dijkstra', ...).
+
+        Args:
+            algorithms (list): Algoritmos a incluir (padrão: todos).
+            **filters: Filtros de FILTERS (ex.: source='gui', min_nodes=1000).
+
+        Returns:
+            pandas.DataFrame: Execuções na ordem de gravação.
+        """
+        where, params = self._where(filters)
+        runs = pd.read_sql_query(
+            "SELECT runs.id AS run_id, runs.created, runs.source, runs.scenario, origins.address, "
+            "origins.latitude, origins.longitude, runs.radius, runs.cuisine, runs.num_nodes, runs.num_edges, "
+            "runs.density, runs.num_destinations, runs.weight "
+            f"FROM runs JOIN origins ON origins.id = runs.origin_id{where} ORDER BY runs.id",
+            self._connection, params=params
+        )
+        runs = runs.rename(columns=RUN_COLUMNS).set_index('run_id')
+        if runs.empty:
+            return runs.reset_index()
+
+        results = pd.read_sql_query(
+            f"SELECT algorithm_results.* FROM algorithm_results JOIN runs ON runs.id = algorithm_results.run_id{where}",
+            self._connection, params=params
+        )
+        if algorithms is not None:
+            results = results[results['algorithm'].isin(algorithms)]
+        columns = dict(TIME_COLUMNS)
+        columns.update({field: label + ' {}' for field, label in STATS_COLUMNS.items()})
+        wide = results.pivot(index='run_id', columns='algorithm', values=list(columns))
+        order = list(dict.fromkeys(results['algorithm']))
+        wide = pd.concat(
+            [wide[field][alg].rename(pattern.format(algorithm_label(alg)))
+             for field, pattern in columns.items() for alg in order if (field, alg) in wide.columns],
+            axis=1
+        ) if not wide.empty else wide
+        # Contadores ausentes em todas as execuções (ex.: planilhas importadas) não viram colunas
+        wide = wide.dropna(axis=1, how='all').astype(float)
+        return runs.join(wide).reset_index()
+
+    def timings(self, algorithms=None, **filters):
+        """
+        Retorna o tempo de cada rota, uma linha por (execução, algoritmo, destino).
+
+        Args:
+            algorithms (list): Algoritmos a incluir (padrão: todos).
+            **filters: Filtros de FILTERS.
+
+        Returns:
+            pandas.DataFrame: Colunas run_id, algorithm, target, seconds e num_nodes.
+        """
+        where, params = self._where(filters)
+        if algorithms is not None:
+            where += (' AND ' if where else ' WHERE ') + \
+                f"query_timings.algorithm IN ({', '.join('?' * len(algorithms))})"
+            params = params + list(algorithms)
+        return pd.read_sql_query(
+            "SELECT query_timings.run_id, query_timings.algorithm, query_timings.target, query_timings.seconds, "
+            f"runs.num_nodes FROM query_timings JOIN runs ON runs.id = query_timings.run_id{where}",
+            self._connection, params=params
+        )
+
+def _csv_algorithms(row):
+    """
+    Extrai de uma linha de planilha os resultados por algoritmo (tempo médio e contadores).
+    """
+    algorithms = {}
+    patterns = {field: re.compile('^' + re.escape(pattern).replace(r'\{\}', '(.+)') + '$')
+                for field, pattern in TIME_COLUMNS.items()}
+    for column, value in row.items():
+        if value in (None, ''):
+            continue
+        for field, pattern in patterns.items():
+            match = pattern.match(column or '')
+            if match:
+                algorithms.setdefault(algorithm_key(match.group(1)), {})[field] = float(value)
+                break
+        else:
+            for field, label in STATS_COLUMNS.items():
+                if (column or '').startswith(label + ' '):
+                    algorithms.setdefault(algorithm_key(column[len(label) + 1:]), {})[field] = float(value)
+    return algorithms
+
+def _float(value):
+    return None if value is None or value == '' else float(value)
+
+def _int(value):
+    return None if value is None or value == '' else int(float(value))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa planilhas de resultados para o banco de resultados.")
+    parser.add_argument('store', help="Arquivo SQLite do banco de resultados.")
+    parser.add_argument('files', nargs='+', help="Planilhas CSV a importar.")
+    args = parser.parse_args(argv)
+    with ResultsStore(args.store) as store:
+        total = sum(store.import_csv(path) for path in args.files)
+    print(f"{total} execuções importadas para '{args.store}'.")
+
+if __name__ == '__main__':
+    main()
@@ -2,70 +2,547 @@
 
 import time
 import heapq
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
 import networkx as nx
 
 from route_planner.utils import timed
 from route_planner.logger import logger
+from route_planner.compact_graph import CompactGraph
+from route_planner import compact_search
+from route_planner.heuristics import LandmarkHeuristic, create_heuristic, build_landmark_heuristic
+from route_planner.contraction_hierarchy import ContractionHierarchy, ch_path
+from route_planner.distance_matrix import distance_matrix
+from route_planner.search_space import SearchSpace
+from route_planner.shared_arrays import SharedArrays, attach_arrays, prefixed, unprefixed
+from route_planner.weight_profiles import add_default_profiles
+
+# Estado de cada processo auxiliar do modo paralelo (ver RouteCalculator.calculate_routes)
+_worker_state = {}
+
+# Colunas dos contadores de esforço nos resultados (ver RouteCalculator.stats_row)
+STATS_COLUMNS = {
+    'settled': 'Nós Fixados',
+    'relaxed': 'Arestas Relaxadas',
+    'pushes': 'Inserções na Fila',
+    'pops': 'Retiradas da Fila',
+    'peak_frontier': 'Pico da Fila',
+    'meeting_position': 'Posição do Encontro',
+}
+
+def _init_worker(spec, origin_node, heuristic, weight, instrument, capture_search_space):
+    """
+    Inicializa um processo auxiliar: abre o grafo compacto (e as tabelas de pré-processamento)
+    na memória compartilhada e cria a calculadora usada por todas as tarefas do processo.
+    """
+    shm, arrays = attach_arrays(spec)
+    cg = CompactGraph.from_arrays(unprefixed('graph_', arrays))
+    landmark_heuristic = None
+    if 'alt_landmarks' in arrays:
+        landmark_heuristic = LandmarkHeuristic.from_arrays(cg, unprefixed('alt_', arrays))
+    hierarchy = None
+    if 'ch_rank' in arrays:
+        hierarchy = ContractionHierarchy.from_arrays(cg, unprefixed('ch_', arrays))
+    _worker_state['shm'] = shm
+    _worker_state['calculator'] = RouteCalculator(
+        None, origin_node, [], compact_graph=cg, heuristic=heuristic,
+        landmark_heuristic=landmark_heuristic, contraction_hierarchy=hierarchy, weight=weight,
+        instrument=instrument, capture_search_space=capture_search_space
+    )
+
+def _run_job(job):
+    """
+    Executa uma tarefa (algoritmo, destino) em um processo auxiliar.
+
+    Returns:
+        tuple: (rota ou None, tempo em segundos ou None, mensagem de erro ou None,
+        SearchStats da busca ou None).
+    """
+    alg, target = job
+    calculator = _worker_state['calculator']
+    stats = calculator.new_stats()
+    try:
+        start_time = time.perf_counter_ns()
+        route = calculator.compact_route(alg, target, stats=stats)
+        end_time = time.perf_counter_ns()
+        return route, (end_time - start_time) / 1e9, None, stats
+    except nx.NetworkXNoPath:
+        return None, None, None, stats
+    except Exception as e:
+        return None, None, f"{type(e).__name__}: {e}", stats
 
 class RouteCalculator:
     """
     Classe para calcular rotas entre o nó de origem e os nós de destino utilizando
     diferentes algoritmos de caminho mínimo.
+
+    Por padrão os algoritmos são executados sobre o grafo compacto (CompactGraph);
+    o motor 'networkx' mantém as chamadas originais ao NetworkX para comparação.
+    No motor compacto, 'weight' escolhe o perfil de peso das arestas ('length',
+    'travel_time' ou um perfil personalizado, ver route_planner.weight_profiles) usado
+    por todos os algoritmos e pela seleção dos destinos mais próximos.
+
+    No motor compacto, cada algoritmo também acumula seus contadores de esforço em
+    'search_stats' (ver compact_search.SearchStats): nós fixados, arestas relaxadas,
+    operações e pico da fila e posição do encontro das buscas bidirecionais, inclusive das
+    buscas sem rota. Os contadores são locais a cada busca e publicados uma vez ao fim dela,
+    e podem ser desligados com 'instrument=False' ou ROUTE_PLANNER_STATS=0. Com
+    'capture_search_space', os nós fixados por cada busca são guardados como bitsets
+    (SearchStats.search_space) para visualização (ver RoutePlotter.add_search_space_layers).
     """
-    def __init__(self, G_projected, origin_node, destination_nodes):
+    COMPACT_ALGORITHMS = {
+        'dijkstra': compact_search.dijkstra,
+        'astar': compact_search.astar,
+        'bellman_ford': compact_search.bellman_ford,
+        'bidirectional_dijkstra': compact_search.bidirectional_dijkstra,
+        'bidirectional_a_star': compact_search.bidirectional_astar,
+        'alt': compact_search.astar,
+        'bidirectional_alt': compact_search.bidirectional_astar,
+        'ch': ch_path,
+    }
+
+    HEURISTIC_ALGORITHMS = ('astar', 'bidirectional_a_star')
+    ALT_ALGORITHMS = ('alt', 'bidirectional_alt')
+    # Únicos algoritmos corretos com perfis de custos negativos (ver weight_profiles.evaluate_expression)
+    NEGATIVE_WEIGHT_ALGORITHMS = ('bellman_ford',)
+    # Algoritmos cuja busca, no motor compacto, é feita uma vez por lote (ver 'route_finder')
+    SHARED_SEARCH_ALGORITHMS = ('bellman_ford',)
+
+    # Iniciar um processo (spawn) custa ~1 s; cada um precisa de tarefas suficientes para
+    # compensá-lo, e o lote todo de trabalho suficiente (tarefas x nós do grafo)
+    PARALLEL_MIN_JOBS_PER_WORKER = 25
+    PARALLEL_MIN_WORK = 5_000_000
+
+    def __init__(self, G_projected, origin_node, destination_nodes, compact_graph=None, engine='compact',
+                 heuristic='euclidean', landmark_heuristic=None, contraction_hierarchy=None, weight='length',
+                 instrument=None, capture_search_space=False):
+        if engine == 'networkx' and weight != 'length':
+            raise ValueError("O motor 'networkx' suporta apenas o perfil de peso 'length'.")
         self.G_projected = G_projected
         self.origin_node = origin_node
         self.destination_nodes = destination_nodes
+        self.engine = engine
+        self.compact_graph = compact_graph
+        if engine == 'compact':
+            self.ensure_compact_graph()
+        self.weight = weight
+        self.heuristic = heuristic
+        self.heuristic_provider = None
+        self.landmark_heuristic = landmark_heuristic
+        self.contraction_hierarchy = contraction_hierarchy
         self.routes = {}
         self.avg_times = {}
+        self.query_times = {}  # Algoritmo -> tempo (s) de cada rota, na ordem de 'routes'
+        self.instrument = compact_search.STATS_ENABLED if instrument is None else instrument
+        self.capture_search_space = capture_search_space
+        self.search_stats = {}  # Algoritmo -> SearchStats do último 'calculate_routes'
+        self.search_tree = None
+        self.search_workspace = None  # Vetores do Bidirectional A*, reaproveitados entre consultas
 
     @timed
-    def calculate_routes(self, algorithms):
+    def calculate_routes(self, algorithms, workers=None):
         """
         Calcula rotas para todos os destinos utilizando os algoritmos especificados.
 
+        Com 'workers' > 1 e o motor compacto, as tarefas (algoritmo, destino) são
+        distribuídas entre processos que compartilham o grafo compacto em memória
+        compartilhada; rotas e tempos são reunidos na mesma ordem da execução serial.
+
         Args:
             algorithms (list): Lista de strings com os nomes dos algoritmos a serem utilizados.
+            workers (int): Número de processos (None ou 1 para execução serial).
+
+        Raises:
+            ValueError: Se o perfil de peso tiver custos negativos e algum algoritmo não os suportar.
         """
-        self.routes = {alg: [] for alg in algorithms}
-        times = {alg: [] for alg in algorithms}
+        self.check_weights(algorithms)
+        workers = self.parallel_workers(algorithms, workers)
+        if workers > 1:
+            self.calculate_routes_parallel(algorithms, workers)
+            return
+
+        if self.engine == 'compact':
+            # Pré-processamentos (ALT, CH) fora da medição, e não na primeira consulta
+            self.prepare(algorithms)
+        self.routes = {}
+        self.search_stats = {}
+        times = {}
+        for alg in algorithms:
+            stats = self.new_stats()
+            self.routes[alg], times[alg] = self._calculate_serial(alg, stats)
+            if stats is not None:
+                self.search_stats[alg] = stats
+
+        self.query_times = times
+        self.avg_times = {alg: (sum(times[alg]) / len(times[alg]) if times[alg] else 0) for alg in algorithms}
+
+    def ensure_compact_graph(self):
+        """
+        Retorna o grafo compacto, construindo-o com os perfis de peso padrão quando não foi
+        fornecido (ex.: motor 'networkx').
+        """
+        if self.compact_graph is None:
+            self.compact_graph = CompactGraph.from_networkx(self.G_projected)
+            add_default_profiles(self.compact_graph, self.G_projected)
+        return self.compact_graph
+
+    def check_weights(self, algorithms):
+        """
+        Rejeita, antes de qualquer busca ou pré-processamento, os algoritmos que exigem
+        custos não negativos quando o perfil de peso tem arestas negativas.
+
+        Raises:
+            ValueError: Se algum dos algoritmos não suportar o perfil.
+        """
+        if self.engine != 'compact' or not self.compact_graph.has_negative_weights(self.weight):
+            return
+        unsupported = [alg for alg in algorithms if alg not in self.NEGATIVE_WEIGHT_ALGORITHMS]
+        if unsupported:
+            raise ValueError(f"O perfil '{self.weight}' tem custos negativos, não suportados por: "
+                             f"{', '.join(unsupported)}.")
+
+    def parallel_workers(self, algorithms, workers):
+        """
+        Número de processos que compensa usar: no máximo um para cada
+        PARALLEL_MIN_JOBS_PER_WORKER tarefas, e nenhum paralelismo (1) se o lote for
+        pequeno demais para o grafo (ver PARALLEL_MIN_WORK) ou fora do motor compacto.
+
+        Args:
+            algorithms (list): Nomes dos algoritmos.
+            workers (int): Número máximo de processos (None para execução serial).
+
+        Returns:
+            int: Número de processos (1 para execução serial).
+        """
+        if not workers or workers <= 1 or self.engine != 'compact':
+            return 1
+        num_jobs = len(algorithms) * len(self.destination_nodes)
+        if num_jobs * self.compact_graph.number_of_nodes() < self.PARALLEL_MIN_WORK:
+            return 1
+        return max(1, min(workers, num_jobs // self.PARALLEL_MIN_JOBS_PER_WORKER))
+
+    def new_stats(self):
+        """
+        Retorna um SearchStats vazio, ou None sem instrumentação ou fora do motor compacto.
+        """
+        if not self.instrument or self.engine != 'compact':
+            return None
+        search_space = SearchSpace(self.compact_graph.number_of_nodes()) if self.capture_search_space else None
+        return compact_search.SearchStats(search_space=search_space)
 
+    def stats_row(self, algorithms):
+        """
+        Contadores de esforço por busca de cada algoritmo, com os nomes de coluna usados
+        nos resultados ('Nós Fixados Dijkstra', ...), ao lado dos tempos médios.
+
+        Returns:
+            dict: Coluna -> valor (None para algoritmos sem contadores).
+        """
+        row = {}
         for alg in algorithms:
-            for target in self.destination_nodes:
-                try:
-                    start_time = time.time()
-                    if alg == 'dijkstra':
-                        route = nx.shortest_path(self.G_projected, self.origin_node, target, weight='length')
-                    elif alg == 'astar':
-                        route = nx.astar_path(
-                            self.G_projected,
-                            self.origin_node,
-                            target,
-                            weight='length',
-                            heuristic=lambda u, v: ((self.G_projected.nodes[u]['x'] - self.G_projected.nodes[v]['x'])**2 + 
-                                                    (self.G_projected.nodes[u]['y'] - self.G_projected.nodes[v]['y'])**2) ** 0.5
-                        )
-                    elif alg == 'bellman_ford':
-                        route = nx.bellman_ford_path(self.G_projected, self.origin_node, target, weight='length')
-                    elif alg == 'bidirectional_dijkstra':
-                        path = nx.bidirectional_dijkstra(self.G_projected, self.origin_node, target, weight='length')[1]
-                        route = path
-                    elif alg == 'bidirectional_a_star':
-                        heuristic = lambda u, v: ((self.G_projected.nodes[u]['x'] - self.G_projected.nodes[v]['x'])**2 + 
-                                                  (self.G_projected.nodes[u]['y'] - self.G_projected.nodes[v]['y'])**2) ** 0.5
-                        route = self.bidirectional_a_star(self.G_projected, self.origin_node, target, heuristic)
-                    else:
-                        raise ValueError("Algoritmo não suportado.")
-                    end_time = time.time()
-                    self.routes[alg].append(route)
-                    times[alg].append(end_time - start_time)
-                except nx.NetworkXNoPath:
-                    logger.warning(f"Nenhuma rota encontrada para o nó {target} usando {alg}.")
-                except Exception as e:
-                    logger.exception(f"Erro ao calcular rota para o nó {target} usando {alg}")
+            stats = self.search_stats.get(alg)
+            summary = stats.summary() if stats is not None and stats.searches else {}
+            for field, label in STATS_COLUMNS.items():
+                row[f"{label} {alg.replace('_', ' ').capitalize()}"] = summary.get(field)
+        return row
+
+    def _calculate_serial(self, alg, stats=None):
+        """
+        Calcula em sequência as rotas de um algoritmo para todos os destinos.
+
+        No motor compacto, o Bellman-Ford é executado uma única vez a partir da origem
+        (ver 'bellman_ford_tree'), e o tempo dessa execução é dividido igualmente entre os
+        destinos, somado ao tempo de extração de cada rota.
+
+        Args:
+            alg (str): Nome do algoritmo.
+            stats (SearchStats): Contadores de esforço a atualizar (opcional).
+
+        Returns:
+            tuple: (rotas, tempos em segundos).
+        """
+        routes, times = [], []
+        find_route, shared_time = self.route_finder(alg, stats)
+        if self.destination_nodes:
+            shared_time /= len(self.destination_nodes)
+        for target in self.destination_nodes:
+            try:
+                start_time = time.perf_counter_ns()
+                route = find_route(alg, target, stats=stats)
+                end_time = time.perf_counter_ns()
+                routes.append(route)
+                times.append((end_time - start_time) / 1e9 + shared_time)
+            except nx.NetworkXNoPath:
+                logger.warning(f"Nenhuma rota encontrada para o nó {target} usando {alg}.")
+            except Exception as e:
+                logger.exception(f"Erro ao calcular rota para o nó {target} usando {alg}")
+        return routes, times
+
+    def route_finder(self, alg, stats=None):
+        """
+        Função de consulta de um lote de destinos. No motor compacto, o Bellman-Ford é
+        executado uma única vez a partir da origem (ver 'bellman_ford_tree') e cada rota é
+        apenas extraída da árvore; os demais algoritmos usam 'route'.
+
+        Args:
+            alg (str): Nome do algoritmo.
+            stats (SearchStats): Contadores de esforço a atualizar (opcional).
+
+        Returns:
+            tuple: (função com a assinatura de 'route', tempo em segundos da busca
+            compartilhada pelos destinos, ou 0.0).
+        """
+        if alg not in self.SHARED_SEARCH_ALGORITHMS or self.engine != 'compact' or not self.destination_nodes:
+            return self.route, 0.0
+        cg = self.compact_graph
+        start_time = time.perf_counter_ns()
+        tree = compact_search.bellman_ford_tree(
+            cg, cg.index_of(self.origin_node), weight=self.weight, stats=stats, negative_cycles='mark'
+        )
+        shared_time = (time.perf_counter_ns() - start_time) / 1e9
 
+        # A árvore vale apenas para este lote; 'route' continua executando a busca completa
+        def find_route(alg, target, stats=None):
+            return cg.to_node_ids(tree.path_to(cg.index_of(target)))
+
+        return find_route, shared_time
+
+    def route(self, alg, target, stats=None):
+        """
+        Calcula uma única rota até 'target' com o algoritmo informado, no motor configurado.
+
+        Args:
+            alg (str): Nome do algoritmo.
+            target (int): Identificador (OSM) do nó de destino.
+            stats (SearchStats): Contadores de esforço a atualizar (apenas no motor compacto).
+
+        Returns:
+            list: Identificadores dos nós que compõem a rota.
+        """
+        if self.engine == 'compact':
+            return self.compact_route(alg, target, stats=stats)
+        elif alg == 'dijkstra':
+            return nx.shortest_path(self.G_projected, self.origin_node, target, weight='length')
+        elif alg == 'astar':
+            return nx.astar_path(
+                self.G_projected,
+                self.origin_node,
+                target,
+                weight='length',
+                heuristic=lambda u, v: ((self.G_projected.nodes[u]['x'] - self.G_projected.nodes[v]['x'])**2 + 
+                                        (self.G_projected.nodes[u]['y'] - self.G_projected.nodes[v]['y'])**2) ** 0.5
+            )
+        elif alg == 'bellman_ford':
+            return nx.bellman_ford_path(self.G_projected, self.origin_node, target, weight='length')
+        elif alg == 'bidirectional_dijkstra':
+            return nx.bidirectional_dijkstra(self.G_projected, self.origin_node, target, weight='length')[1]
+        elif alg == 'bidirectional_a_star':
+            heuristic = lambda u, v: ((self.G_projected.nodes[u]['x'] - self.G_projected.nodes[v]['x'])**2 + 
+                                      (self.G_projected.nodes[u]['y'] - self.G_projected.nodes[v]['y'])**2) ** 0.5
+            return self.bidirectional_a_star(self.G_projected, self.origin_node, target, heuristic)
+        else:
+            raise ValueError("Algoritmo não suportado.")
+
+    def calculate_routes_parallel(self, algorithms, workers):
+        """
+        Execução paralela de 'calculate_routes' sobre o motor compacto.
+
+        O pré-processamento exigido pelos algoritmos (ALT, CH) é feito uma única vez neste
+        processo e publicado, junto com o grafo compacto, em um bloco de memória
+        compartilhada; cada processo auxiliar apenas o abre, sem receber o grafo do NetworkX.
+
+        Args:
+            algorithms (list): Lista de strings com os nomes dos algoritmos a serem utilizados.
+            workers (int): Número de processos.
+        """
+        self.prepare(algorithms)
+        # O Bellman-Ford atende a todos os destinos com uma única execução, feita neste processo
+        jobs = [(alg, target) for alg in algorithms if alg != 'bellman_ford' for target in self.destination_nodes]
+
+        arrays = prefixed('graph_', self.compact_graph.to_arrays())
+        if self.landmark_heuristic is not None:
+            arrays.update(prefixed('alt_', self.landmark_heuristic.to_arrays()))
+        if self.contraction_hierarchy is not None:
+            arrays.update(prefixed('ch_', self.contraction_hierarchy.to_arrays()))
+
+        # 'spawn' evita copiar o estado da interface (threads do Tkinter) com fork
+        context = multiprocessing.get_context('spawn')
+        chunksize = max(1, len(jobs) // (4 * workers))
+        with SharedArrays(arrays) as shared:
+            logger.info(f"Calculando {len(jobs)} rotas em {workers} processos ({shared.nbytes / 1e6:.2f} MB compartilhados).")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                     initargs=(shared.spec, self.origin_node, self.heuristic, self.weight,
+                                               self.instrument, self.capture_search_space)) as pool:
+                results = list(pool.map(_run_job, jobs, chunksize=chunksize))
+
+        self.routes = {alg: [] for alg in algorithms}
+        self.search_stats = {}
+        times = {alg: [] for alg in algorithms}
+        if 'bellman_ford' in algorithms:
+            stats = self.new_stats()
+            self.routes['bellman_ford'], times['bellman_ford'] = self._calculate_serial('bellman_ford', stats)
+            if stats is not None:
+                self.search_stats['bellman_ford'] = stats
+        for (alg, target), (route, elapsed, error, stats) in zip(jobs, results):
+            if stats is not None:
+                if alg not in self.search_stats:
+                    self.search_stats[alg] = self.new_stats()
+                self.search_stats[alg].merge(stats)
+            if route is not None:
+                self.routes[alg].append(route)
+                times[alg].append(elapsed)
+            elif error is None:
+                logger.warning(f"Nenhuma rota encontrada para o nó {target} usando {alg}.")
+            else:
+                logger.error(f"Erro ao calcular rota para o nó {target} usando {alg}: {error}")
+
+        self.query_times = times
         self.avg_times = {alg: (sum(times[alg]) / len(times[alg]) if times[alg] else 0) for alg in algorithms}
 
+    def prepare(self, algorithms):
+        """
+        Executa antecipadamente o pré-processamento exigido pelos algoritmos informados,
+        quando não foi fornecido na criação da calculadora (ver GraphHandler.landmark_heuristic
+        e GraphHandler.contraction_hierarchy) ou foi calculado para outro perfil de peso.
+        """
+        if any(alg in self.ALT_ALGORITHMS for alg in algorithms) and \
+                (self.landmark_heuristic is None or self.landmark_heuristic.weight != self.weight):
+            self.landmark_heuristic = build_landmark_heuristic(self.compact_graph, weight=self.weight)
+        if 'ch' in algorithms and \
+                (self.contraction_hierarchy is None or self.contraction_hierarchy.weight != self.weight):
+            self.contraction_hierarchy = ContractionHierarchy.build(self.compact_graph, weight=self.weight)
+
+    def compact_route(self, alg, target, stats=None):
+        """
+        Calcula a rota até 'target' com o algoritmo informado sobre o grafo compacto.
+
+        Args:
+            alg (str): Nome do algoritmo.
+            target (int): Identificador (OSM) do nó de destino.
+            stats (SearchStats): Contadores de esforço a atualizar (opcional).
+
+        Returns:
+            list: Identificadores dos nós que compõem a rota.
+        """
+        if alg not in self.COMPACT_ALGORITHMS:
+            raise ValueError("Algoritmo não suportado.")
+        cg = self.compact_graph
+        kwargs = {'weight': self.weight}
+        if stats is not None:
+            kwargs['stats'] = stats
+        if alg in self.HEURISTIC_ALGORITHMS:
+            # O provedor é criado uma vez por grafo e reaproveitado entre as consultas
+            if self.heuristic_provider is None:
+                self.heuristic_provider = create_heuristic(self.heuristic, cg, weight=self.weight)
+            kwargs['heuristic'] = self.heuristic_provider
+        elif alg in self.ALT_ALGORITHMS:
+            self.prepare([alg])
+            kwargs['heuristic'] = self.landmark_heuristic
+        elif alg == 'ch':
+            self.prepare([alg])
+            kwargs['hierarchy'] = self.contraction_hierarchy
+        if alg in ('bidirectional_a_star', 'bidirectional_alt'):
+            if self.search_workspace is None:
+                self.search_workspace = compact_search.SearchWorkspace(cg)
+            kwargs['workspace'] = self.search_workspace
+        path = self.COMPACT_ALGORITHMS[alg](cg, cg.index_of(self.origin_node), cg.index_of(target), **kwargs)
+        return cg.to_node_ids(path)
+
+    def nearest_destinations(self, k=None):
+        """
+        Executa uma única busca a partir do nó de origem e retorna os 'k' destinos
+        alcançáveis mais próximos. A árvore de caminhos mínimos fica guardada em
+        'search_tree' para extração posterior das rotas sem nova busca.
+
+        Args:
+            k (int): Número de destinos desejado (None para todos os alcançáveis).
+
+        Returns:
+            list: Tuplas (distância, posição em destination_nodes), em ordem crescente de distância.
+
+        Raises:
+            ValueError: Se o perfil de peso tiver custos negativos.
+        """
+        cg = self.ensure_compact_graph()
+        if cg.has_negative_weights(self.weight):
+            raise ValueError(f"O perfil '{self.weight}' tem custos negativos; a busca dos destinos mais próximos "
+                             "exige custos não negativos.")
+
+        # Vários destinos podem compartilhar o mesmo nó do grafo
+        positions = {}
+        for pos, node in enumerate(self.destination_nodes):
+            positions.setdefault(cg.index_of(node), []).append(pos)
+
+        self.search_tree, nearest_nodes = compact_search.one_to_many(
+            cg, cg.index_of(self.origin_node), positions.keys(), k=k, weight=self.weight
+        )
+
+        nearest = [(dist, pos) for dist, node in nearest_nodes for pos in positions[node]]
+        return nearest if k is None else nearest[:k]
+
+    def distance_matrix(self, sources=None, targets=None, strategy='auto', workers=None):
+        """
+        Calcula a matriz de distâncias entre conjuntos de origens e destinos sobre o grafo
+        compacto (ver distance_matrix.distance_matrix).
+
+        Com a estratégia 'auto', o método de buckets é usado quando a calculadora já tem uma
+        ContractionHierarchy; 'buckets' constrói a hierarquia se necessário.
+
+        Args:
+            sources (list): Identificadores dos nós de origem (padrão: [origin_node]).
+            targets (list): Identificadores dos nós de destino (padrão: destination_nodes).
+            strategy (str): 'auto', 'one_to_many' ou 'buckets'.
+            workers (int): Número de processos (None ou 1 para execução serial).
+
+        Returns:
+            DistanceMatrix: Matriz de distâncias (numpy) e acesso aos caminhos.
+
+        Raises:
+            ValueError: Se o perfil de peso tiver custos negativos.
+        """
+        if self.ensure_compact_graph().has_negative_weights(self.weight):
+            raise ValueError(f"O perfil '{self.weight}' tem custos negativos; a matriz de distâncias exige "
+                             "custos não negativos.")
+        if strategy == 'buckets':
+            self.prepare(['ch'])
+        return distance_matrix(
+            self.compact_graph,
+            [self.origin_node] if sources is None else sources,
+            self.destination_nodes if targets is None else targets,
+            strategy=strategy,
+            hierarchy=self.contraction_hierarchy,
+            workers=workers,
+            weight=self.weight
+        )
+
+    def tree_routes(self, targets=None):
+        """
+        Extrai da árvore calculada por 'nearest_destinations' as rotas até os destinos.
+
+        Args:
+            targets (list): Identificadores dos nós de destino (padrão: destination_nodes).
+
+        Returns:
+            list: Rotas (listas de identificadores de nós); None para destinos não alcançados.
+        """
+        if self.search_tree is None:
+            self.nearest_destinations()
+        cg = self.compact_graph
+        routes = []
+        for target in (self.destination_nodes if targets is None else targets):
+            node = cg.index_of(target)
+            routes.append(cg.to_node_ids(self.search_tree.path_to(node)) if node in self.search_tree else None)
+        return routes
+
+    @staticmethod
+    def _edge_length(G, u, v):
+        # Em um MultiDiGraph, get_edge_data retorna as arestas paralelas indexadas pela chave
+        edge_data = G.get_edge_data(u, v, default={})
+        if G.is_multigraph():
+            return min((data.get('length', 1) for data in edge_data.values()), default=1)
+        return edge_data.get('length', 1)
+
     @staticmethod
     def bidirectional_a_star(G, source, target, heuristic):
         """
@@ -113,8 +590,7 @@ class RouteCalculator:
                         best_cost = total_cost
                         meeting_node = current_forward_node
                 for neighbor in G.successors(current_forward_node):
-                    edge_data = G.get_edge_data(current_forward_node, neighbor, default={})
-                    length = edge_data.get('length', 1)
+                    length = RouteCalculator._edge_length(G, current_forward_node, neighbor)
                     cost = forward_visited[current_forward_node] + length
                     if neighbor not in forward_visited or cost < forward_visited[neighbor]:
                         forward_visited[neighbor] = cost
@@ -131,8 +607,7 @@ class RouteCalculator:
                         best_cost = total_cost
                         meeting_node = current_backward_node
                 for neighbor in G.predecessors(current_backward_node):
-                    edge_data = G.get_edge_data(neighbor, current_backward_node, default={})
-                    length = edge_data.get('length', 1)
+                    length = RouteCalculator._edge_length(G, neighbor, current_backward_node)
                     cost = backward_visited[current_backward_node] + length
                     if neighbor not in backward_visited or cost < backward_visited[neighbor]:
                         backward_visited[neighbor] = cost
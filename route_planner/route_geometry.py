@@ -0,0 +1,169 @@
+# route_planner/route_geometry.py
+
+import weakref
+
+import numpy as np
+import shapely
+
+class RouteGeometry:
+    """
+    Conversão das rotas (sequências de nós) em polilinhas geográficas (latitude, longitude)
+    para os mapas.
+
+    As coordenadas geográficas de todos os nós do grafo são calculadas uma única vez, em
+    uma só chamada vetorizada ao pyproj, e reaproveitadas por todas as rotas e mapas do
+    mesmo grafo (ver 'for_graph'). Converter um lote de rotas se reduz a reunir os índices
+    de todos os nós em um único vetor e indexar as coordenadas já calculadas.
+
+    Opcionalmente, o atributo 'geometry' das arestas (traçado das vias simplificadas pelo
+    OSMnx) substitui o segmento reto entre os nós; os traçados também são convertidos em
+    lote e guardados por aresta.
+
+    Args:
+        cg (CompactGraph): Grafo compacto (CRS projetado).
+        transformer (pyproj.Transformer): Conversão do CRS projetado para EPSG:4326 (always_xy).
+        G_projected (networkx.MultiDiGraph): Grafo projetado, necessário apenas para os
+            traçados das arestas.
+    """
+    _instances = weakref.WeakKeyDictionary()
+
+    def __init__(self, cg, transformer, G_projected=None):
+        self.cg = cg
+        self.transformer = transformer
+        self.G_projected = G_projected
+        self._latlon = None
+        self._edge_shapes = {}  # (u, v) -> vetor (k, 2) de (lat, lon), ou None se a aresta não tiver traçado
+
+    @classmethod
+    def for_graph(cls, cg, transformer, G_projected=None):
+        """
+        Retorna a instância do grafo, criando-a apenas na primeira chamada.
+        """
+        geometry = cls._instances.get(cg)
+        if geometry is None:
+            geometry = cls._instances[cg] = cls(cg, transformer, G_projected)
+        elif geometry.G_projected is None:
+            geometry.G_projected = G_projected
+        return geometry
+
+    @property
+    def node_latlon(self):
+        """
+        Vetor (n, 2) com (latitude, longitude) de cada nó, pelo índice compacto.
+        """
+        if self._latlon is None:
+            lon, lat = self.transformer.transform(self.cg.x, self.cg.y)
+            self._latlon = np.column_stack([lat, lon])
+        return self._latlon
+
+    def _indices(self, routes):
+        # Índices compactos de todos os nós das rotas em um único vetor
+        node_index = self.cg.node_index
+        lengths = [len(route) for route in routes]
+        indices = np.fromiter((node_index[int(node)] for route in routes for node in route),
+                              dtype=np.int64, count=sum(lengths))
+        return indices, np.cumsum(lengths)[:-1]
+
+    def polylines(self, routes, edge_geometry=False):
+        """
+        Converte um lote de rotas em polilinhas (latitude, longitude).
+
+        Args:
+            routes (list): Rotas (listas de identificadores de nós).
+            edge_geometry (bool): Usa o traçado das arestas com atributo 'geometry'.
+
+        Returns:
+            list: Um vetor (k, 2) de (latitude, longitude) por rota.
+        """
+        if not routes:
+            return []
+        indices, splits = self._indices(routes)
+        lines = np.split(self.node_latlon[indices], splits)
+        if not edge_geometry or self.G_projected is None:
+            return lines
+        self._load_edge_shapes(routes)
+        return [self._with_shapes(route, line) for route, line in zip(routes, lines)]
+
+    def _load_edge_shapes(self, routes):
+        """
+        Converte, em uma única chamada ao pyproj, os traçados das arestas das rotas que
+        ainda não estão em cache.
+        """
+        G = self.G_projected
+        pending = {}
+        for route in routes:
+            for u, v in zip(route[:-1], route[1:]):
+                if (u, v) in self._edge_shapes or (u, v) in pending:
+                    continue
+                edges = G.get_edge_data(u, v) or {}
+                # Entre arestas paralelas, a de menor comprimento (a usada pelas rotas)
+                data = min(edges.values(), key=lambda d: d.get('length', float('inf')), default={})
+                shape = data.get('geometry')
+                pending[(u, v)] = None if shape is None else np.asarray(shape.coords, dtype=np.float64)[:, :2]
+
+        shapes = [(edge, coords) for edge, coords in pending.items() if coords is not None]
+        for edge in pending:
+            self._edge_shapes[edge] = None
+        if not shapes:
+            return
+        coords = np.vstack([coords for _, coords in shapes])
+        lon, lat = self.transformer.transform(coords[:, 0], coords[:, 1])
+        latlon = np.column_stack([lat, lon])
+        splits = np.cumsum([len(coords) for _, coords in shapes])[:-1]
+        for (edge, _), part in zip(shapes, np.split(latlon, splits)):
+            self._edge_shapes[edge] = part
+
+    def _with_shapes(self, route, line):
+        parts = []
+        for position, (u, v) in enumerate(zip(route[:-1], route[1:])):
+            shape = self._edge_shapes.get((u, v))
+            if shape is None:
+                parts.append(line[position:position + 1])
+            else:
+                # O traçado inclui as duas extremidades; a final é adicionada pelo próximo trecho
+                parts.append(shape[:-1])
+        parts.append(line[-1:])
+        return np.vstack(parts)
+
+def meters_per_pixel(latitude, zoom):
+    """
+    Resolução dos mapas em Web Mercator (tiles de 256 px) na latitude e no zoom informados.
+    """
+    return 156543.03392 * np.cos(np.radians(latitude)) / 2 ** zoom
+
+def simplify_polylines(lines, tolerance):
+    """
+    Simplifica polilinhas (latitude, longitude) com Douglas-Peucker, todas em uma única
+    chamada vetorizada ao Shapely.
+
+    As coordenadas são levadas a uma projeção equirretangular local (longitude multiplicada
+    pelo cosseno da latitude média), em que a tolerância em metros vale igualmente nos dois
+    eixos. As extremidades de cada polilinha são sempre mantidas.
+
+    Args:
+        lines (list): Vetores (k, 2) de (latitude, longitude).
+        tolerance (float): Desvio máximo, em metros (0 para não simplificar).
+
+    Returns:
+        list: Vetores (k', 2) simplificados, na mesma ordem.
+    """
+    counts = np.array([len(line) for line in lines], dtype=np.int64)
+    # Polilinhas de um único ponto não formam LineString; ficam como estão
+    valid = counts >= 2
+    if tolerance <= 0 or not valid.any():
+        return list(lines)
+    coords = np.vstack(lines)
+    scale = np.cos(np.radians(coords[:, 0].mean()))
+    local = np.column_stack([coords[:, 1] * scale, coords[:, 0]])
+    geometries = shapely.linestrings(local[np.repeat(valid, counts)],
+                                     indices=np.repeat(np.arange(valid.sum()), counts[valid]))
+    simplified = shapely.simplify(geometries, tolerance / 111320.0, preserve_topology=False)
+    points, index = shapely.get_coordinates(simplified, return_index=True)
+    parts = iter(np.split(np.column_stack([points[:, 1], points[:, 0] / scale]),
+                          np.cumsum(np.bincount(index, minlength=valid.sum()))[:-1]))
+    simplified_lines = []
+    for line, is_valid in zip(lines, valid):
+        part = next(parts) if is_valid else line
+        # Trechos degenerados (pontos repetidos) podem resultar em geometria vazia
+        simplified_lines.append(part if len(part) >= 2 else line)
+    return simplified_lines
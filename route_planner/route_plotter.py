@@ -1,18 +1,200 @@
 # route_planner/route_plotter.py
 
+import json
 import os
 import webbrowser
 import folium
-from folium.plugins import PolyLineTextPath
+import numpy as np
+import shapely
+from folium.plugins import HeatMap, PolyLineTextPath
+
+from route_planner.logger import logger
+from route_planner.compact_graph import CompactGraph
+from route_planner.route_geometry import RouteGeometry, meters_per_pixel, simplify_polylines
 
 class RoutePlotter:
     """
     Classe para plotar rotas em um mapa interativo utilizando o Folium.
+
+    As coordenadas das rotas vêm da RouteGeometry do grafo, que converte todas as rotas
+    de todos os algoritmos em lote; com 'edge_geometry', as polilinhas seguem o traçado
+    das vias em vez de segmentos retos entre os nós.
+
+    No modo compacto (padrão a partir de COMPACT_MIN_ROUTES rotas), caminhos idênticos
+    encontrados por vários algoritmos são desenhados uma única vez, as polilinhas são
+    simplificadas (Douglas-Peucker, tolerância de 'simplify_pixels' no zoom 'simplify_zoom')
+    e as rotas formam poucas camadas GeoJSON em vez de um objeto JavaScript (e uma
+    camada de setas) por rota. As rotas também são gravadas em um arquivo .geojson ao
+    lado do mapa.
+
+    Com 'search_space_layer' e os contadores capturados pela RouteCalculator
+    (capture_search_space=True), o mapa ganha uma camada por algoritmo com os nós que
+    ele explorou: 'heatmap' pesa cada nó pelo número de consultas que o fixaram, e 'hull'
+    desenha o fecho convexo do espaço de busca (ver 'add_search_space_layers').
+
+    Args:
+        G_projected (networkx.MultiDiGraph): Grafo projetado.
+        transformer (pyproj.Transformer): Conversão do CRS projetado para EPSG:4326.
+        visualization_prefs (dict): Cor e estilo de linha por algoritmo.
+        compact_graph (CompactGraph): Grafo compacto (construído a partir de G_projected se None).
+        edge_geometry (bool): Usa o traçado das arestas com atributo 'geometry'.
+        compact (bool): Força (True) ou desativa (False) o modo compacto; None para automático.
+        simplify_zoom (int): Zoom em que a simplificação deve ser imperceptível.
+        simplify_pixels (float): Desvio máximo da simplificação, em pixels (0 para não simplificar).
+        search_space_layer (str): 'heatmap', 'hull' ou None (sem camadas de espaço de busca).
     """
-    def __init__(self, G_projected, transformer, visualization_prefs):
+    COMPACT_MIN_ROUTES = 50
+    SEARCH_SPACE_LAYERS = ('heatmap', 'hull')
+
+    def __init__(self, G_projected, transformer, visualization_prefs, compact_graph=None, edge_geometry=False,
+                 compact=None, simplify_zoom=16, simplify_pixels=1.0, search_space_layer=None):
+        if search_space_layer is not None and search_space_layer not in self.SEARCH_SPACE_LAYERS:
+            raise ValueError(f"Camada de espaço de busca '{search_space_layer}' não suportada.")
         self.G_projected = G_projected
         self.transformer = transformer
         self.visualization_prefs = visualization_prefs
+        self.compact_graph = compact_graph
+        self.edge_geometry = edge_geometry
+        self.compact = compact
+        self.simplify_zoom = simplify_zoom
+        self.simplify_pixels = simplify_pixels
+        self.search_space_layer = search_space_layer
+
+    def _geometry(self):
+        if self.compact_graph is None:
+            self.compact_graph = CompactGraph.from_networkx(self.G_projected)
+        return RouteGeometry.for_graph(self.compact_graph, self.transformer, self.G_projected)
+
+    def route_polylines(self, routes, algorithms, limit):
+        """
+        Converte as rotas (até 'limit' por algoritmo) em polilinhas (latitude, longitude),
+        com uma única conversão de coordenadas para todos os algoritmos.
+
+        Returns:
+            dict: Algoritmo -> lista de vetores (k, 2); rotas com menos de 2 nós são omitidas.
+        """
+        geometry = self._geometry()
+        selected = {alg: [route for route in routes.get(alg, [])[:limit] if len(route) >= 2] for alg in algorithms}
+        lines = iter(geometry.polylines([route for alg in algorithms for route in selected[alg]],
+                                        edge_geometry=self.edge_geometry))
+        return {alg: [next(lines) for _ in selected[alg]] for alg in algorithms}
+
+    def routes_geojson(self, routes, algorithms, limit, tolerance=0.0):
+        """
+        Reúne as rotas (até 'limit' por algoritmo) em uma FeatureCollection GeoJSON com uma
+        feição por caminho distinto; a propriedade 'algorithms' lista os algoritmos que o
+        encontraram, em ordem.
+
+        Args:
+            routes (dict): Rotas calculadas para cada algoritmo.
+            algorithms (list): Algoritmos a incluir.
+            limit (int): Número máximo de rotas por algoritmo.
+            tolerance (float): Tolerância da simplificação, em metros (0 para não simplificar).
+
+        Returns:
+            dict: FeatureCollection (coordenadas com 6 casas decimais, ~0,1 m).
+        """
+        paths = {}
+        for alg in algorithms:
+            for route in routes.get(alg, [])[:limit]:
+                if len(route) >= 2:
+                    found_by = paths.setdefault(tuple(route), [])
+                    if alg not in found_by:
+                        found_by.append(alg)
+        lines = self._geometry().polylines(list(paths), edge_geometry=self.edge_geometry)
+        lines = simplify_polylines(lines, tolerance)
+        features = []
+        for (path, found_by), line in zip(paths.items(), lines):
+            prefs = self.visualization_prefs.get(found_by[0], {'color': 'blue', 'style': 'solid'})
+            features.append({
+                'type': 'Feature',
+                'geometry': {'type': 'LineString', 'coordinates': np.round(line[:, ::-1], 6).tolist()},
+                'properties': {
+                    'algorithms': found_by,
+                    'label': ', '.join(alg.replace('_', ' ').capitalize() for alg in found_by),
+                    'color': prefs['color'],
+                    'dash_array': self.get_dash_array(prefs['style']),
+                    'destination': int(path[-1]),
+                },
+            })
+        return {'type': 'FeatureCollection', 'features': features}
+
+    def add_compact_layers(self, m, origin_point_geo, routes, algorithms, limit):
+        """
+        Adiciona ao mapa as rotas no modo compacto: uma camada GeoJSON com os caminhos
+        comuns a mais de um algoritmo e uma por algoritmo com os caminhos exclusivos.
+
+        Returns:
+            dict: FeatureCollection com todas as rotas (ver 'routes_geojson').
+        """
+        tolerance = self.simplify_pixels * meters_per_pixel(origin_point_geo[0], self.simplify_zoom)
+        collection = self.routes_geojson(routes, algorithms, limit, tolerance=tolerance)
+        features = collection['features']
+
+        def style(feature):
+            properties = feature['properties']
+            return {'color': properties['color'], 'weight': 5, 'opacity': 1, 'dashArray': properties['dash_array']}
+
+        groups = [("Rotas comuns a vários algoritmos",
+                   [feature for feature in features if len(feature['properties']['algorithms']) > 1])]
+        groups += [(f"Rotas {alg.replace('_', ' ').capitalize()}",
+                    [feature for feature in features if feature['properties']['algorithms'] == [alg]])
+                   for alg in algorithms]
+        for name, group in groups:
+            if not group:
+                continue
+            folium.GeoJson(
+                {'type': 'FeatureCollection', 'features': group},
+                name=name,
+                style_function=style,
+                tooltip=folium.GeoJsonTooltip(fields=['label'], aliases=['Algoritmos']),
+            ).add_to(m)
+        return collection
+
+    def add_search_space_layers(self, m, search_stats, algorithms):
+        """
+        Adiciona ao mapa uma camada (desligada por padrão) por algoritmo com os nós fixados
+        por suas consultas, no formato de 'search_space_layer'.
+
+        Args:
+            m (folium.Map): Mapa.
+            search_stats (dict): Algoritmo -> SearchStats com 'search_space' capturado
+                (ver RouteCalculator.search_stats).
+            algorithms (list): Algoritmos a incluir.
+
+        Returns:
+            dict: Algoritmo -> número de nós distintos explorados.
+        """
+        latlon = self._geometry().node_latlon
+        explored = {}
+        for alg in algorithms:
+            stats = search_stats.get(alg)
+            if stats is None or stats.search_space is None or not len(stats.search_space):
+                continue
+            name = alg.replace('_', ' ').capitalize()
+            layer = folium.FeatureGroup(name=f"Espaço de busca {name}", show=False)
+            if self.search_space_layer == 'heatmap':
+                frequency = stats.search_space.frequency()
+                nodes = np.flatnonzero(frequency)
+                points = np.column_stack([np.round(latlon[nodes], 6), frequency[nodes] / frequency.max()])
+                HeatMap(points.tolist(), radius=8, blur=10, min_opacity=0.2).add_to(layer)
+            else:
+                nodes = np.flatnonzero(stats.search_space.union())
+                hull = shapely.convex_hull(shapely.multipoints(latlon[nodes][:, ::-1]))
+                if hull.geom_type != 'Polygon':
+                    continue  # Menos de três nós não formam um polígono
+                color = self.visualization_prefs.get(alg, {'color': 'blue'})['color']
+                folium.Polygon(
+                    np.round(np.asarray(hull.exterior.coords)[:, ::-1], 6).tolist(),
+                    color=color,
+                    weight=2,
+                    fill=True,
+                    fill_opacity=0.1,
+                    tooltip=f"{name}: {len(nodes)} nós explorados em {len(stats.search_space)} consultas"
+                ).add_to(layer)
+            layer.add_to(m)
+            explored[alg] = len(nodes)
+        return explored
 
     def get_dash_array(self, style):
         """
@@ -35,7 +217,8 @@ class RoutePlotter:
         else:
             return None  # Default to solid
 
-    def plot_routes_subset(self, origin_point_geo, routes, destination_coords_geo, destination_names, destination_dists, algorithms, limit):
+    def plot_routes_subset(self, origin_point_geo, routes, destination_coords_geo, destination_names, destination_dists, algorithms, limit,
+                           search_stats=None):
         """
         Plota um subconjunto de rotas no mapa.
 
@@ -47,6 +230,11 @@ class RoutePlotter:
             destination_dists (list): Lista de distâncias dos destinos.
             algorithms (list): Lista de algoritmos a serem plotados.
             limit (int): Número máximo de rotas a serem plotadas.
+            search_stats (dict): Contadores por algoritmo com os espaços de busca capturados
+                (usados apenas com 'search_space_layer').
+
+        Returns:
+            str: Nome do arquivo HTML gerado.
         """
         # Plota as rotas no mapa
         m = folium.Map(location=origin_point_geo, zoom_start=13)
@@ -66,6 +254,42 @@ class RoutePlotter:
                 icon=folium.Icon(color='red', icon='cutlery')
             ).add_to(m)
 
+        num_routes = sum(min(len(routes.get(alg, [])), limit) for alg in algorithms)
+        compact = num_routes >= self.COMPACT_MIN_ROUTES if self.compact is None else self.compact
+        collection = None
+        if compact:
+            collection = self.add_compact_layers(m, origin_point_geo, routes, algorithms, limit)
+        else:
+            self.add_route_layers(m, routes, algorithms, limit)
+
+        if self.search_space_layer is not None and search_stats:
+            self.add_search_space_layers(m, search_stats, algorithms)
+
+        # Adicionar controle de camadas
+        folium.LayerControl().add_to(m)
+
+        # Gerar nome de arquivo sem sobrescrever
+        file_name = self.generate_unique_filename('mapa_rotas.html')
+
+        # Salvar e exibir o mapa
+        m.save(file_name)
+        if collection is not None:
+            geojson_name = os.path.splitext(file_name)[0] + '.geojson'
+            with open(geojson_name, 'w', encoding='utf-8') as f:
+                json.dump(collection, f, ensure_ascii=False, separators=(',', ':'))
+            logger.info(f"{len(collection['features'])} caminhos distintos de {num_routes} rotas salvos em '{geojson_name}'.")
+        print(f"Mapa salvo como '{file_name}'. Abra-o no seu navegador para visualização.")
+        # Abrir o mapa no navegador
+        webbrowser.open(file_name)
+        return file_name
+
+    def add_route_layers(self, m, routes, algorithms, limit):
+        """
+        Adiciona ao mapa uma PolyLine (com setas de sentido) por rota, em uma camada por algoritmo.
+        """
+        # Coordenadas de todas as rotas convertidas de uma só vez
+        polylines = self.route_polylines(routes, algorithms, limit)
+
         # Adicionar rotas em camadas separadas
         for alg in algorithms:
             alg_prefs = self.visualization_prefs.get(alg, {'color': 'blue', 'style': 'solid'})
@@ -74,23 +298,11 @@ class RoutePlotter:
             dash_array = self.get_dash_array(style)
 
             layer = folium.FeatureGroup(name=f"Rotas {alg.replace('_', ' ').capitalize()}")
-            for route in routes[alg][:limit]:
+            for route_geo_latlon in polylines[alg]:
                 try:
-                    if len(route) < 2:
-                        continue  # Rotas inválidas com menos de 2 nós
-
-                    # Obter as coordenadas projetadas dos nós da rota
-                    route_proj = [(self.G_projected.nodes[node]['x'], self.G_projected.nodes[node]['y']) for node in route]
-
-                    # Converter para geográficas
-                    route_geo = [self.transformer.transform(x, y) for x, y in route_proj]
-
-                    # Rearranjar para (lat, lon) para Folium
-                    route_geo_latlon = [(lat, lon) for lon, lat in route_geo]
-
                     # Adicionar a rota como PolyLine
                     polyline = folium.PolyLine(
-                        route_geo_latlon,
+                        route_geo_latlon.tolist(),
                         color=color,
                         weight=5,
                         opacity=1,
@@ -116,18 +328,6 @@ class RoutePlotter:
                     print(f"Erro ao plotar rota {alg}: {e}")
             layer.add_to(m)
 
-        # Adicionar controle de camadas
-        folium.LayerControl().add_to(m)
-
-        # Gerar nome de arquivo sem sobrescrever
-        file_name = self.generate_unique_filename('mapa_rotas.html')
-
-        # Salvar e exibir o mapa
-        m.save(file_name)
-        print(f"Mapa salvo como '{file_name}'. Abra-o no seu navegador para visualização.")
-        # Abrir o mapa no navegador
-        webbrowser.open(file_name)
-
     @staticmethod
     def generate_unique_filename(base_filename):
         """
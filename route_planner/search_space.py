@@ -0,0 +1,88 @@
+# route_planner/search_space.py
+
+import numpy as np
+
+class SearchSpace:
+    """
+    Espaços de busca de várias consultas sobre um mesmo grafo: os nós fixados por cada
+    consulta, em cada sentido, guardados como bitsets sobre os índices compactos.
+
+    Cada consulta ocupa n/8 bytes por sentido, independentemente de quantos nós fixou,
+    e a captura é feita uma única vez ao fim da busca (ver SearchStats.record), sem
+    alterar o laço principal. As agregações usadas nos mapas ('frequency', 'union')
+    desempacotam uma consulta por vez.
+
+    Args:
+        num_nodes (int): Número de nós do grafo.
+    """
+    def __init__(self, num_nodes):
+        self.num_nodes = num_nodes
+        self._bits = []  # (bitset da busca direta, bitset da busca reversa) por consulta
+
+    def __len__(self):
+        return len(self._bits)
+
+    @property
+    def nbytes(self):
+        return sum(forward.nbytes + backward.nbytes for forward, backward in self._bits)
+
+    def _pack(self, nodes):
+        if isinstance(nodes, np.ndarray) and nodes.dtype == bool:
+            mask = nodes
+        else:
+            mask = np.zeros(self.num_nodes, dtype=bool)
+            mask[np.fromiter(nodes, dtype=np.int64)] = True
+        return np.packbits(mask)
+
+    def _unpack(self, bits):
+        return np.unpackbits(bits, count=self.num_nodes).view(bool)
+
+    def add(self, forward, backward=()):
+        """
+        Registra o espaço de busca de uma consulta.
+
+        Args:
+            forward: Nós fixados pela busca direta (índices ou máscara booleana de tamanho n).
+            backward: Nós fixados pela busca reversa (vazio nas buscas unidirecionais).
+        """
+        self._bits.append((self._pack(forward), self._pack(backward)))
+
+    def extend(self, other):
+        """
+        Acrescenta as consultas de outro SearchSpace do mesmo grafo.
+        """
+        if other.num_nodes != self.num_nodes:
+            raise ValueError("Os espaços de busca são de grafos diferentes.")
+        self._bits.extend(other._bits)
+        return self
+
+    def query(self, i):
+        """
+        Retorna os nós fixados pela consulta 'i'.
+
+        Returns:
+            tuple: (índices da busca direta, índices da busca reversa).
+        """
+        forward, backward = self._bits[i]
+        return np.flatnonzero(self._unpack(forward)), np.flatnonzero(self._unpack(backward))
+
+    def frequency(self):
+        """
+        Número de consultas que fixaram cada nó (em qualquer sentido).
+
+        Returns:
+            numpy.ndarray: Contagem por índice compacto.
+        """
+        counts = np.zeros(self.num_nodes, dtype=np.int32)
+        for forward, backward in self._bits:
+            counts += self._unpack(forward | backward)
+        return counts
+
+    def union(self):
+        """
+        Máscara dos nós fixados por ao menos uma consulta.
+        """
+        bits = np.zeros((self.num_nodes + 7) // 8, dtype=np.uint8)
+        for forward, backward in self._bits:
+            bits |= forward | backward
+        return self._unpack(bits)
@@ -0,0 +1,432 @@
+# route_planner/server.py
+
+import argparse
+import contextlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import networkx as nx
+import numpy as np
+from pyproj import Transformer
+
+from route_planner.logger import logger
+from route_planner.graph_cache import GraphCache
+from route_planner.graph_handler import GraphHandler
+from route_planner.poi_cache import POICache
+from route_planner.poi_finder import POIFinder
+from route_planner.route_calculator import RouteCalculator
+from route_planner.snap_index import SnapIndex
+
+# Serviço local de roteamento, sem interface gráfica.
+#
+# Uso:
+#     python -m route_planner.server --port 8765 --areas 4
+#
+# Consultas (POST, corpo e resposta em JSON); 'origin' e 'radius' identificam a área:
+#     /route         {"origin": [lat, lon], "radius": 2000, "target": [lat, lon],
+#                     "source": [lat, lon], "algorithm": "dijkstra"}
+#     /one_to_many   {"origin": [lat, lon], "radius": 2000, "targets": [[lat, lon], ...],
+#                     "paths": false}
+#     /nearest_pois  {"origin": [lat, lon], "radius": 2000, "cuisine": "pizza", "k": 10}
+# Consultas auxiliares (GET): /health e /areas (áreas carregadas, da mais antiga à mais recente).
+
+class Area:
+    """
+    Área carregada no serviço: grafo projetado, grafo compacto com o índice espacial e os
+    pré-processamentos (ALT, CH) obtidos sob demanda e mantidos enquanto a área estiver
+    em memória.
+
+    As consultas simultâneas (uma thread por conexão) não compartilham estado mutável:
+    cada uma usa com exclusividade uma RouteCalculator de um conjunto reaproveitado por
+    perfil de peso (ver 'calculator'), com seus vetores de trabalho e provedor de
+    heurística. Cada pré-processamento é construído uma única vez, fora das travas usadas
+    pelas demais consultas (ver 'artifact').
+
+    Args:
+        handler (GraphHandler): Grafo da área, já criado.
+        poi_cache (POICache): Cache de POIs usado nas consultas de estabelecimentos.
+    """
+    def __init__(self, handler, poi_cache=None):
+        self.handler = handler
+        self.poi_cache = poi_cache
+        self.compact_graph = handler.compact_graph
+        self.snap_index = SnapIndex.for_graph(self.compact_graph)
+        self.to_projected = Transformer.from_crs("epsg:4326", handler.G_projected.graph['crs'], always_xy=True)
+        self.preprocessing = {}
+        self.lock = threading.Lock()  # Protege 'preprocessing', 'pois' e o conjunto de calculadoras
+        self.pois = {}  # Tipo de estabelecimento -> POIFinder com os POIs já associados aos nós
+        self._loading_pois = {}  # Tipo de estabelecimento -> trava da filtragem em andamento
+        self._building = {}  # (perfil, artefato) -> trava da construção em andamento
+        self._calculators = {}  # Perfil de peso -> calculadoras livres
+        self.loaded_at = time.time()
+        self.queries = 0
+
+    def snap(self, points, max_distance=None):
+        """
+        Associa pontos (latitude, longitude) aos nós do grafo.
+
+        Raises:
+            ValueError: Se algum ponto estiver a mais de 'max_distance' metros do grafo.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        x, y = self.to_projected.transform(points[:, 1], points[:, 0])
+        nodes = self.snap_index.nearest_node_ids(x, y, max_distance=max_distance)
+        if any(node is None for node in nodes):
+            raise ValueError(f"Ponto a mais de {max_distance} m do grafo da área.")
+        return nodes
+
+    def coordinates(self, route):
+        """
+        Converte uma rota (identificadores de nós) em uma lista de [latitude, longitude].
+        """
+        cg = self.compact_graph
+        nodes = np.array([cg.index_of(node) for node in route], dtype=np.int64)
+        lon, lat = self.handler.transformer.transform(cg.x[nodes], cg.y[nodes])
+        return [[float(a), float(b)] for a, b in zip(np.atleast_1d(lat), np.atleast_1d(lon))]
+
+    def route_length(self, route, weight='length'):
+        cg = self.compact_graph
+        return cg.path_length([cg.index_of(node) for node in route], weight)
+
+    def artifact(self, name, weight='length'):
+        """
+        Retorna um pré-processamento da área ('landmark_heuristic' ou
+        'contraction_hierarchy'), obtendo-o do GraphHandler na primeira vez. A construção
+        é feita sob uma trava própria do artefato: consultas simultâneas que dependem dele
+        aguardam uma única construção, e as demais seguem sem esperar.
+        """
+        with self.lock:
+            artifact = self.preprocessing.get(weight, {}).get(name)
+            if artifact is not None:
+                return artifact
+            building = self._building.setdefault((weight, name), threading.Lock())
+        with building:
+            with self.lock:
+                artifact = self.preprocessing.get(weight, {}).get(name)
+            if artifact is None:
+                artifact = getattr(self.handler, name)(weight=weight)
+                with self.lock:
+                    self.preprocessing.setdefault(weight, {})[name] = artifact
+                    self._building.pop((weight, name), None)
+        return artifact
+
+    @contextlib.contextmanager
+    def calculator(self, source_node, destination_nodes, algorithms=(), weight='length'):
+        """
+        Fornece, durante o bloco 'with', uma RouteCalculator de uso exclusivo da consulta
+        sobre o grafo compacto da área, com os pré-processamentos exigidos pelos algoritmos.
+        As calculadoras são devolvidas ao fim do bloco e reaproveitadas pelas consultas
+        seguintes, mantendo o provedor de heurística e os vetores do Bidirectional A*.
+
+        Raises:
+            ValueError: Se o perfil de peso não existir no grafo da área.
+        """
+        if weight not in self.compact_graph.weights:
+            raise ValueError(f"Perfil de peso '{weight}' não disponível.")
+        if any(alg in RouteCalculator.ALT_ALGORITHMS for alg in algorithms):
+            self.artifact('landmark_heuristic', weight)
+        if 'ch' in algorithms:
+            self.artifact('contraction_hierarchy', weight)
+
+        with self.lock:
+            free = self._calculators.setdefault(weight, [])
+            calculator = free.pop() if free else None
+            preprocessing = dict(self.preprocessing.get(weight, {}))
+        if calculator is None:
+            calculator = RouteCalculator(self.handler.G_projected, source_node, destination_nodes,
+                                         compact_graph=self.compact_graph, weight=weight)
+        calculator.origin_node, calculator.destination_nodes = source_node, destination_nodes
+        calculator.search_tree = None
+        calculator.landmark_heuristic = preprocessing.get('landmark_heuristic')
+        calculator.contraction_hierarchy = preprocessing.get('contraction_hierarchy')
+        try:
+            yield calculator
+        finally:
+            with self.lock:
+                self._calculators[weight].append(calculator)
+
+    def poi_finder(self, cuisine):
+        """
+        Retorna os POIs do tipo informado, associados aos nós do grafo. As feições da área
+        são baixadas na primeira consulta e reaproveitadas (sessão do POIFinder e cache), e
+        cada tipo é filtrado e associado às vias uma única vez, sob uma trava própria (como
+        em 'artifact'); consultas a tipos já carregados seguem sem esperar.
+        """
+        with self.lock:
+            finder = self.pois.get(cuisine)
+            if finder is not None:
+                return finder
+            loading = self._loading_pois.setdefault(cuisine, threading.Lock())
+        with loading:
+            with self.lock:
+                finder = self.pois.get(cuisine)
+            if finder is None:
+                handler = self.handler
+                finder = POIFinder(handler.G_projected, handler.origin_point, handler.radius, cache=self.poi_cache,
+                                   compact_graph=self.compact_graph)
+                finder.cuisine = cuisine
+                finder.get_pois()
+                with self.lock:
+                    # Sem as feições (falha no download), a próxima consulta tenta de novo
+                    if finder.features is not None:
+                        self.pois[cuisine] = finder
+                    self._loading_pois.pop(cuisine, None)
+        return finder
+
+class AreaStore:
+    """
+    Áreas (grafo de uma origem e raio) mantidas em memória com política LRU: ao exceder
+    'capacity', a área consultada há mais tempo é descartada. Áreas novas são lidas do
+    cache de grafos ou baixadas, uma única vez mesmo com consultas simultâneas.
+
+    Args:
+        capacity (int): Número máximo de áreas carregadas.
+        graph_cache (GraphCache): Cache de grafos.
+        poi_cache (POICache): Cache de POIs.
+    """
+    def __init__(self, capacity=4, graph_cache=None, poi_cache=None):
+        self.capacity = capacity
+        self.graph_cache = graph_cache
+        self.poi_cache = poi_cache
+        self._areas = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(origin_point, radius, network_type='drive'):
+        lat, lon = (round(float(coord), 4) for coord in origin_point)
+        return lat, lon, int(radius), network_type
+
+    def _cached(self, key):
+        with self._lock:
+            area = self._areas.get(key)
+            if area is not None:
+                self._areas.move_to_end(key)
+            return area
+
+    def get(self, origin_point, radius, network_type='drive'):
+        """
+        Retorna a área, carregando-a se necessário.
+
+        Returns:
+            Area: Área carregada.
+        """
+        key = self.key(origin_point, radius, network_type)
+        area = self._cached(key)
+        if area is not None:
+            return area
+
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            area = self._cached(key)
+            if area is not None:
+                return area
+            handler = GraphHandler(key[:2], key[2], network_type=network_type, cache=self.graph_cache)
+            handler.create_graph()
+            area = Area(handler, poi_cache=self.poi_cache)
+            with self._lock:
+                self._areas[key] = area
+                self._loading.pop(key, None)
+                while len(self._areas) > self.capacity:
+                    evicted, _ = self._areas.popitem(last=False)
+                    logger.info(f"Área {evicted} descartada da memória (LRU).")
+            logger.info(f"Área {key} carregada.")
+        return area
+
+    def describe(self):
+        with self._lock:
+            return [
+                {
+                    'origin': [lat, lon],
+                    'radius': radius,
+                    'network_type': network_type,
+                    'nodes': area.compact_graph.number_of_nodes(),
+                    'edges': area.compact_graph.number_of_edges(),
+                    'queries': area.queries,
+                    'weights': sorted(area.compact_graph.weights),
+                    'preprocessing': sorted(
+                        name if weight == 'length' else f"{name}:{weight}"
+                        for weight, items in area.preprocessing.items() for name in items
+                    ),
+                }
+                for (lat, lon, radius, network_type), area in self._areas.items()
+            ]
+
+class RoutingService:
+    """
+    Consultas do serviço de roteamento sobre as áreas mantidas em memória. Cada método
+    recebe o pedido já decodificado (dicionário) e retorna a resposta a codificar em JSON.
+
+    Args:
+        store (AreaStore): Áreas carregadas.
+    """
+    def __init__(self, store):
+        self.store = store
+
+    def _area(self, request):
+        area = self.store.get(request['origin'], request['radius'], request.get('network_type', 'drive'))
+        area.queries += 1
+        return area
+
+    def _source(self, area, request):
+        return area.snap(request.get('source', request['origin']), request.get('max_snap_distance'))[0]
+
+    def route(self, request):
+        """
+        Rota entre dois pontos ('source', padrão: a origem da área, e 'target'), pelo perfil
+        de peso 'weight' (padrão: 'length').
+        """
+        algorithm = request.get('algorithm', 'dijkstra')
+        if algorithm not in RouteCalculator.COMPACT_ALGORITHMS:
+            raise ValueError(f"Algoritmo '{algorithm}' não suportado.")
+        area = self._area(request)
+        source = self._source(area, request)
+        target = area.snap(request['target'], request.get('max_snap_distance'))[0]
+        weight = request.get('weight', 'length')
+        with area.calculator(source, [target], [algorithm], weight=weight) as calculator:
+            start = time.perf_counter_ns()
+            route = calculator.route(algorithm, target)
+            elapsed = (time.perf_counter_ns() - start) / 1e6
+        return {
+            'algorithm': algorithm,
+            'distance_m': area.route_length(route),
+            'weight': weight,
+            'cost': area.route_length(route, weight),
+            'nodes': route,
+            'path': area.coordinates(route),
+            'query_ms': elapsed,
+        }
+
+    def one_to_many(self, request):
+        """
+        Distâncias (e, opcionalmente, caminhos) de um ponto a vários destinos, com uma única
+        busca. Destinos inalcançáveis recebem null.
+        """
+        area = self._area(request)
+        source = self._source(area, request)
+        targets = area.snap(request['targets'], request.get('max_snap_distance'))
+        start = time.perf_counter_ns()
+        distances = [None] * len(targets)
+        with area.calculator(source, targets) as calculator:
+            for dist, pos in calculator.nearest_destinations():
+                distances[pos] = dist
+            routes = calculator.tree_routes() if request.get('paths') else None
+        response = {'distances_m': distances}
+        if routes is not None:
+            response['paths'] = [area.coordinates(route) if route is not None else None for route in routes]
+        response['query_ms'] = (time.perf_counter_ns() - start) / 1e6
+        return response
+
+    def nearest_pois(self, request):
+        """
+        Os 'k' estabelecimentos do tipo informado mais próximos de um ponto, pela rede viária.
+        """
+        area = self._area(request)
+        source = self._source(area, request)
+        finder = area.poi_finder(request['cuisine'])
+        if len(finder.destination_nodes) == 0:
+            return {'pois': []}
+
+        start = time.perf_counter_ns()
+        with area.calculator(source, finder.destination_nodes) as calculator:
+            nearest = calculator.nearest_destinations(k=int(request.get('k', 10)))
+            routes = calculator.tree_routes([finder.destination_nodes[pos] for _, pos in nearest])
+        pois = []
+        for (dist, pos), route in zip(nearest, routes):
+            lat, lon = finder.destination_coords_geo[pos]
+            poi = {'name': finder.destination_names[pos], 'lat': lat, 'lon': lon, 'distance_m': dist}
+            if request.get('paths'):
+                poi['path'] = area.coordinates(route)
+            pois.append(poi)
+        return {'pois': pois, 'query_ms': (time.perf_counter_ns() - start) / 1e6}
+
+class RoutingRequestHandler(BaseHTTPRequestHandler):
+    """
+    Tradução das requisições HTTP para o RoutingService do servidor.
+    """
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {'status': 'ok'})
+        elif self.path == '/areas':
+            self._send(200, {'areas': self.server.service.store.describe()})
+        else:
+            self._send(404, {'error': f"Caminho '{self.path}' não encontrado."})
+
+    def do_POST(self):
+        service = self.server.service
+        queries = {
+            '/route': service.route,
+            '/one_to_many': service.one_to_many,
+            '/nearest_pois': service.nearest_pois,
+        }
+        if self.path not in queries:
+            self._send(404, {'error': f"Caminho '{self.path}' não encontrado."})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            self._send(200, queries[self.path](request))
+        except nx.NetworkXNoPath as e:
+            self._send(404, {'error': str(e)})
+        except KeyError as e:
+            self._send(400, {'error': f"Campo ausente: {e}"})
+        except (ValueError, TypeError) as e:
+            self._send(400, {'error': str(e)})
+        except Exception as e:
+            logger.exception(f"Erro na consulta {self.path}")
+            self._send(500, {'error': str(e)})
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} - {format % args}")
+
+def create_server(host='127.0.0.1', port=8765, service=None):
+    """
+    Cria o servidor HTTP (uma thread por conexão) do serviço de roteamento.
+
+    Args:
+        host (str): Endereço de escuta.
+        port (int): Porta (0 para uma porta livre).
+        service (RoutingService): Serviço (padrão: caches no diretório padrão, 4 áreas).
+
+    Returns:
+        ThreadingHTTPServer: Servidor pronto para 'serve_forever'.
+    """
+    server = ThreadingHTTPServer((host, port), RoutingRequestHandler)
+    server.daemon_threads = True
+    server.service = service or RoutingService(AreaStore(graph_cache=GraphCache(), poi_cache=POICache()))
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço local de roteamento com grafos mantidos em memória.")
+    parser.add_argument('--host', default='127.0.0.1', help="Endereço de escuta.")
+    parser.add_argument('--port', type=int, default=8765, help="Porta de escuta.")
+    parser.add_argument('--areas', type=int, default=4, help="Número máximo de áreas mantidas em memória.")
+    parser.add_argument('--cache-dir', default='cache/grafos', help="Diretório do cache de grafos.")
+    parser.add_argument('--poi-cache-dir', default='cache/pois', help="Diretório do cache de POIs.")
+    args = parser.parse_args(argv)
+
+    store = AreaStore(args.areas, graph_cache=GraphCache(args.cache_dir), poi_cache=POICache(args.poi_cache_dir))
+    server = create_server(args.host, args.port, RoutingService(store))
+    host, port = server.server_address[:2]
+    print(f"Serviço de roteamento em http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
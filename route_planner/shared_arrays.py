@@ -0,0 +1,89 @@
+# route_planner/shared_arrays.py
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Alinhamento de cada vetor dentro do bloco compartilhado, em bytes
+ALIGNMENT = 64
+
+class SharedArrays:
+    """
+    Copia um conjunto de vetores NumPy para um único bloco de memória compartilhada,
+    de modo que processos auxiliares os acessem sem serializá-los. O descritor 'spec'
+    (nome do bloco e posição, tipo e forma de cada vetor) é pequeno e pode ser enviado
+    aos processos, que o abrem com 'attach_arrays'.
+
+    O bloco é liberado por 'close' (ou ao sair do bloco 'with'), que deve ser chamado
+    apenas pelo processo que o criou, depois que os processos auxiliares terminarem.
+
+    Args:
+        arrays (dict): Vetores pelo nome.
+    """
+    def __init__(self, arrays):
+        layout = {}
+        offset = 0
+        contiguous = {}
+        for name, values in arrays.items():
+            values = np.ascontiguousarray(values)
+            offset = -(-offset // ALIGNMENT) * ALIGNMENT
+            layout[name] = (offset, values.dtype.str, values.shape)
+            contiguous[name] = values
+            offset += values.nbytes
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for name, values in contiguous.items():
+            start, dtype, shape = layout[name]
+            target = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=start)
+            target[...] = values
+        self.spec = (self.shm.name, layout)
+
+    @property
+    def nbytes(self):
+        return self.shm.size
+
+    def close(self):
+        """
+        Fecha e remove o bloco de memória compartilhada.
+        """
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def attach_arrays(spec):
+    """
+    Abre, em outro processo, os vetores publicados por um SharedArrays.
+
+    Os vetores retornados são visões sobre o bloco compartilhado (sem cópia) e só
+    permanecem válidos enquanto o objeto SharedMemory retornado estiver referenciado.
+
+    Args:
+        spec (tuple): Descritor 'SharedArrays.spec'.
+
+    Returns:
+        tuple: (SharedMemory, dicionário de vetores pelo nome).
+    """
+    name, layout = spec
+    shm = shared_memory.SharedMemory(name=name)
+    arrays = {
+        key: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+        for key, (start, dtype, shape) in layout.items()
+    }
+    return shm, arrays
+
+def prefixed(prefix, arrays):
+    """
+    Acrescenta um prefixo aos nomes dos vetores, para publicar vários objetos no mesmo bloco.
+    """
+    return {f"{prefix}{key}": values for key, values in arrays.items()}
+
+def unprefixed(prefix, arrays):
+    """
+    Seleciona os vetores com o prefixo informado, removendo-o dos nomes.
+    """
+    return {key[len(prefix):]: values for key, values in arrays.items() if key.startswith(prefix)}
@@ -0,0 +1,147 @@
+# route_planner/snap_index.py
+
+import weakref
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+class SnapIndex:
+    """
+    Índice espacial (KD-tree) sobre as coordenadas projetadas dos nós de um CompactGraph,
+    para associar pontos (origens, POIs) ao grafo em lote.
+
+    O índice é construído uma vez por grafo (ver 'for_graph'). Além do nó mais próximo,
+    permite associar pontos à aresta mais próxima, com a posição de projeção do ponto no
+    segmento. Pontos mais distantes do que 'max_distance' são rejeitados (índice -1).
+
+    Args:
+        cg (CompactGraph): Grafo compacto (CRS projetado, em metros).
+    """
+    _instances = weakref.WeakKeyDictionary()
+
+    def __init__(self, cg):
+        self.cg = cg
+        self.tree = cKDTree(np.column_stack([cg.x, cg.y]))
+        self._edge_tree = None
+
+    @classmethod
+    def for_graph(cls, cg):
+        """
+        Retorna o índice do grafo, construindo-o apenas na primeira chamada.
+        """
+        index = cls._instances.get(cg)
+        if index is None:
+            index = cls._instances[cg] = cls(cg)
+        return index
+
+    def nearest_nodes(self, x, y, max_distance=None):
+        """
+        Associa cada ponto ao nó mais próximo.
+
+        Args:
+            x (array-like): Coordenadas X projetadas.
+            y (array-like): Coordenadas Y projetadas.
+            max_distance (float): Distância máxima aceita, em metros (None para sem limite).
+
+        Returns:
+            tuple: (índices compactos dos nós, -1 para pontos rejeitados; distâncias).
+        """
+        points = np.column_stack([np.atleast_1d(x), np.atleast_1d(y)]).astype(np.float64)
+        upper = np.inf if max_distance is None else max_distance
+        distances, nodes = self.tree.query(points, distance_upper_bound=upper)
+        nodes = np.where(np.isfinite(distances), nodes, -1).astype(np.int64)
+        return nodes, distances
+
+    def nearest_node_ids(self, x, y, max_distance=None):
+        """
+        Como 'nearest_nodes', mas retornando os identificadores originais (OSM) dos nós e
+        None para pontos rejeitados.
+        """
+        nodes, _ = self.nearest_nodes(x, y, max_distance)
+        node_ids = self.cg.node_ids[np.maximum(nodes, 0)].tolist()
+        return [node_id if node >= 0 else None for node_id, node in zip(node_ids, nodes.tolist())]
+
+    def _edges(self):
+        if self._edge_tree is None:
+            cg = self.cg
+            tails = cg.edge_sources()
+            heads = cg.indices
+            self._ax, self._ay = cg.x[tails], cg.y[tails]
+            self._dx, self._dy = cg.x[heads] - self._ax, cg.y[heads] - self._ay
+            midpoints = np.column_stack([self._ax + self._dx / 2, self._ay + self._dy / 2])
+            self._half_length = float(np.hypot(self._dx, self._dy).max() / 2) if len(heads) else 0.0
+            self._edge_tree = cKDTree(midpoints)
+        return self._edge_tree
+
+    def _segment_projection(self, edges, px, py):
+        # Projeção de cada ponto no segmento correspondente, limitada às extremidades
+        dx, dy = self._dx[edges], self._dy[edges]
+        length2 = dx * dx + dy * dy
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = ((px - self._ax[edges]) * dx + (py - self._ay[edges]) * dy) / length2
+        t = np.clip(np.nan_to_num(t), 0.0, 1.0)
+        qx = self._ax[edges] + t * dx
+        qy = self._ay[edges] + t * dy
+        return t, qx, qy, np.hypot(px - qx, py - qy)
+
+    def nearest_edges(self, x, y, max_distance=None, k=8):
+        """
+        Associa cada ponto à aresta mais próxima (distância ponto-segmento exata).
+
+        As 'k' arestas de ponto médio mais próximo são avaliadas primeiro; quando essa
+        vizinhança não garante o resultado (uma aresta longa pode estar mais perto do que
+        as candidatas), a busca é repetida por raio para aquele ponto.
+
+        Args:
+            x (array-like): Coordenadas X projetadas.
+            y (array-like): Coordenadas Y projetadas.
+            max_distance (float): Distância máxima aceita, em metros (None para sem limite).
+            k (int): Número de candidatas da primeira etapa.
+
+        Returns:
+            tuple: (posições das arestas na estrutura direta, -1 para pontos rejeitados;
+            fração t em [0, 1] do ponto projetado ao longo da aresta; coordenadas X e Y do
+            ponto projetado; distâncias).
+        """
+        tree = self._edges()
+        px = np.atleast_1d(np.asarray(x, dtype=np.float64))
+        py = np.atleast_1d(np.asarray(y, dtype=np.float64))
+        num_edges = self.cg.number_of_edges()
+        k = max(1, min(k, num_edges))
+        midpoint_dist, candidates = tree.query(np.column_stack([px, py]), k=k)
+        midpoint_dist = midpoint_dist.reshape(len(px), k)
+        candidates = candidates.reshape(len(px), k)
+
+        _, _, _, dist = self._segment_projection(candidates, px[:, None], py[:, None])
+        best = np.argmin(dist, axis=1)
+        rows = np.arange(len(px))
+        edges = candidates[rows, best]
+        best_dist = dist[rows, best]
+
+        # Qualquer aresta mais próxima tem o ponto médio a menos de best_dist + meia aresta
+        unresolved = np.flatnonzero((k < num_edges) & (midpoint_dist[:, -1] < best_dist + self._half_length))
+        for i in unresolved:
+            nearby = np.asarray(tree.query_ball_point((px[i], py[i]), best_dist[i] + self._half_length), dtype=np.int64)
+            _, _, _, d = self._segment_projection(nearby, px[i], py[i])
+            j = int(np.argmin(d))
+            edges[i], best_dist[i] = nearby[j], d[j]
+
+        t, qx, qy, distances = self._segment_projection(edges, px, py)
+        if max_distance is not None:
+            edges = np.where(distances <= max_distance, edges, -1)
+        return edges.astype(np.int64), t, qx, qy, distances
+
+    def nearest_edge_node_ids(self, x, y, max_distance=None):
+        """
+        Associa cada ponto à aresta mais próxima (ver 'nearest_edges') e, nela, à extremidade
+        mais próxima do ponto projetado. Para pontos à beira de vias longas, o nó escolhido
+        fica na via em frente ao ponto, e não em uma rua vizinha com um nó mais perto.
+
+        Returns:
+            list: Identificadores originais (OSM) dos nós, None para pontos rejeitados.
+        """
+        edges, t, _, _, _ = self.nearest_edges(x, y, max_distance)
+        valid = np.maximum(edges, 0)
+        nodes = np.where(t < 0.5, self.cg.edge_sources()[valid], self.cg.indices[valid])
+        node_ids = self.cg.node_ids[nodes].tolist()
+        return [node_id if edge >= 0 else None for node_id, edge in zip(node_ids, edges.tolist())]
@@ -0,0 +1,113 @@
+# tests/test_batch.py
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import networkx as nx
+
+from route_planner.batch import BatchRunner, load_scenarios, result_columns
+from route_planner.geocoder import GazetteerBackend, GeoCoder
+from route_planner.graph_cache import GraphCache
+from route_planner.poi_cache import POICache
+from route_planner.pipeline import RoutePipeline
+from route_planner.poi_finder import POIFinder
+from route_planner.results_store import ResultsStore
+from route_planner.tests.test_graph_cache import ORIGIN, build_projected_graph
+from route_planner.tests.test_poi_finder import build_features
+
+class TestBatch(unittest.TestCase):
+    def test_scenarios_are_expanded(self):
+        content = {
+            'defaults': {'algorithms': ['dijkstra'], 'num_destinations': 5},
+            'scenarios': [
+                {'origin': [-22.9068, -43.1729], 'radius': [1000, 2000], 'cuisine': ['pizza', 'burger']},
+                {'address': 'Praça XV, Rio de Janeiro', 'radius': 1500, 'cuisine': 'japanese',
+                 'num_destinations': [3, 10], 'algorithms': ['astar', 'ch']},
+            ]
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cenarios.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(content, f)
+            scenarios = load_scenarios(path)
+
+        self.assertEqual(len(scenarios), 6)
+        self.assertEqual([s['scenario'] for s in scenarios], [0, 0, 0, 0, 1, 1])
+        self.assertEqual({(s['radius'], s['cuisine']) for s in scenarios[:4]},
+                         {(1000, 'pizza'), (1000, 'burger'), (2000, 'pizza'), (2000, 'burger')})
+        self.assertEqual(scenarios[0]['algorithms'], ['dijkstra'])
+        self.assertEqual([s['num_destinations'] for s in scenarios[4:]], [3, 10])
+        self.assertEqual(scenarios[4]['network_type'], 'drive')
+
+    def test_runner_does_not_import_gui_modules(self):
+        code = "import sys, route_planner.batch; print('tkinter' in sys.modules, 'folium' in sys.modules)"
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.split(), ['False', 'False'])
+
+    def test_repetitions_report_median_and_p95(self):
+        algorithms = ['dijkstra', 'astar']
+        scenario = {'scenario': 0, 'origin': list(ORIGIN), 'radius': 1000, 'cuisine': 'pizza',
+                    'num_destinations': 2, 'algorithms': algorithms, 'network_type': 'drive',
+                    'weight': 'length', 'weight_profiles': {}}
+        POIFinder._session.clear()
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = GraphCache(os.path.join(tmp, 'grafos'))
+            G = build_projected_graph()
+            cache.save(ORIGIN, 1000, G, nx.density(G))
+            store = ResultsStore(os.path.join(tmp, 'resultados.sqlite'))
+            runner = BatchRunner(cache=cache, poi_cache=POICache(os.path.join(tmp, 'pois')),
+                                 geocoder=GeoCoder(backend=GazetteerBackend({})), store=store,
+                                 repetitions=3, warmup=1)
+            with mock.patch('route_planner.poi_finder.ox.features_from_point', return_value=build_features()):
+                row, = runner.run([scenario])
+            frame = store.frame()
+            store.close()
+        POIFinder._session.clear()
+
+        self.assertNotIn('Erro', row)
+        columns = result_columns(algorithms, benchmark=True)
+        for alg in ('Dijkstra', 'Astar'):
+            self.assertIn(f'Tempo P95 {alg} (s)', columns)
+            self.assertLessEqual(row[f'Tempo Mediano {alg} (s)'], row[f'Tempo P95 {alg} (s)'])
+            self.assertEqual(frame[f'Tempo Mediano {alg} (s)'][0], row[f'Tempo Mediano {alg} (s)'])
+        self.assertNotIn('Tempo P95 Dijkstra (s)', result_columns(algorithms))
+
+    def test_scenarios_share_area_pipeline(self):
+        base = {'origin': list(ORIGIN), 'radius': 1000, 'num_destinations': 2, 'network_type': 'drive',
+                'weight': 'length', 'weight_profiles': {'bonus': 'length - 1000'}, 'algorithms': ['dijkstra']}
+        scenarios = [
+            dict(base, scenario=0, cuisine='pizza'),
+            # Com custos negativos, os destinos ainda são escolhidos (pela distância)
+            dict(base, scenario=1, cuisine='pizza', weight='bonus', algorithms=['bellman_ford']),
+            dict(base, scenario=2, cuisine='japanese'),
+            dict(base, scenario=3, cuisine='thai'),
+        ]
+        POIFinder._session.clear()
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = GraphCache(os.path.join(tmp, 'grafos'))
+            G = build_projected_graph()
+            cache.save(ORIGIN, 1000, G, nx.density(G))
+            runner = BatchRunner(cache=cache, poi_cache=POICache(os.path.join(tmp, 'pois')),
+                                 geocoder=GeoCoder(backend=GazetteerBackend({})))
+            with mock.patch('route_planner.poi_finder.ox.features_from_point', return_value=build_features()), \
+                    mock.patch.object(RoutePipeline, 'load_area', autospec=True,
+                                      side_effect=RoutePipeline.load_area) as load_area, \
+                    mock.patch.object(POIFinder, 'get_pois', autospec=True,
+                                      side_effect=POIFinder.get_pois) as get_pois:
+                rows = list(runner.run(scenarios))
+        POIFinder._session.clear()
+
+        self.assertEqual(load_area.call_count, 1)
+        # POIs filtrados uma vez por tipo de estabelecimento, e não por cenário
+        self.assertEqual(get_pois.call_count, 3)
+        self.assertTrue(all('Erro' not in row for row in rows))
+        self.assertEqual([row['Número de Destinos'] for row in rows], [2, 2, 1, 0])
+        self.assertEqual(rows[1]['Perfil de Peso'], 'bonus')
+
+if __name__ == '__main__':
+    unittest.main()
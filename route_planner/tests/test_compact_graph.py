@@ -0,0 +1,358 @@
+# tests/test_compact_graph.py
+
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import networkx as nx
+import numpy as np
+
+from route_planner.benchmark import RouteBenchmark
+from route_planner.compact_graph import CompactGraph
+from route_planner import compact_search, distance_matrix
+from route_planner.contraction_hierarchy import ContractionHierarchy
+from route_planner.heuristics import HEURISTICS, LANDMARK_STRATEGIES, build_landmark_heuristic, create_heuristic
+from route_planner.route_calculator import RouteCalculator
+
+def build_test_graph(size=12, seed=42):
+    """
+    Cria um MultiDiGraph em grade com coordenadas projetadas e comprimentos
+    maiores ou iguais à distância euclidiana (heurística admissível).
+    """
+    rng = random.Random(seed)
+    G = nx.MultiDiGraph(crs='epsg:32723')
+    for i in range(size):
+        for j in range(size):
+            G.add_node(1000 + i * size + j, x=i * 100.0, y=j * 100.0)
+    for i in range(size):
+        for j in range(size):
+            u = 1000 + i * size + j
+            for di, dj in ((1, 0), (0, 1), (-1, 0), (0, -1)):
+                ni, nj = i + di, j + dj
+                if 0 <= ni < size and 0 <= nj < size and rng.random() < 0.85:
+                    G.add_edge(u, 1000 + ni * size + nj, length=100.0 * (1 + rng.random()))
+    # Arestas paralelas: o algoritmo deve escolher a de menor comprimento
+    G.add_edge(1000, 1001, length=100.0)
+    G.add_edge(1000, 1001, length=500.0)
+    return G
+
+def build_oneway_graph(size=10, seed=0, keep=0.55):
+    """
+    Cria uma grade com muitas vias de mão única, que não é fortemente conexa: há nós que
+    não alcançam (nem são alcançados por) parte dos marcos do ALT.
+    """
+    rng = random.Random(seed)
+    G = nx.MultiDiGraph(crs='epsg:32723')
+    for i in range(size):
+        for j in range(size):
+            G.add_node(i * size + j, x=i * 100.0, y=j * 100.0)
+    for i in range(size):
+        for j in range(size):
+            for di, dj in ((1, 0), (0, 1), (-1, 0), (0, -1)):
+                ni, nj = i + di, j + dj
+                if 0 <= ni < size and 0 <= nj < size and rng.random() < keep:
+                    G.add_edge(i * size + j, ni * size + nj, length=100.0 * (1 + rng.random()))
+    return G
+
+def path_length(G, path):
+    return sum(min(d['length'] for d in G[u][v].values()) for u, v in zip(path[:-1], path[1:]))
+
+class TestCompactGraph(unittest.TestCase):
+    def setUp(self):
+        self.G = build_test_graph()
+        self.cg = CompactGraph.from_networkx(self.G)
+
+    def test_structure(self):
+        self.assertEqual(self.cg.number_of_nodes(), self.G.number_of_nodes())
+        self.assertEqual(self.cg.number_of_edges(), self.G.number_of_edges())
+        u = self.cg.index_of(1000)
+        successors = {self.cg.to_node_ids([v])[0] for v in self.cg.indices[self.cg.indptr[u]:self.cg.indptr[u + 1]]}
+        self.assertEqual(successors, set(self.G.successors(1000)))
+
+    def test_algorithms_match_networkx(self):
+        source = self.cg.index_of(1000)
+        for target_node in list(self.G.nodes)[1::7]:
+            try:
+                expected = nx.shortest_path_length(self.G, 1000, target_node, weight='length')
+            except nx.NetworkXNoPath:
+                continue
+            target = self.cg.index_of(target_node)
+            for name in ('dijkstra', 'astar', 'bellman_ford', 'bidirectional_dijkstra'):
+                path = self.cg.to_node_ids(getattr(compact_search, name)(self.cg, source, target))
+                self.assertEqual(path[0], 1000)
+                self.assertEqual(path[-1], target_node)
+                self.assertAlmostEqual(path_length(self.G, path), expected, places=6, msg=name)
+
+    def test_bellman_ford_tree_with_negative_weights(self):
+        # Bônus (peso negativo) nas arestas que saem de nós de x par, sem criar ciclos
+        # negativos: cada aresta de ida e volta tem peso de pelo menos 100
+        tails = self.cg.edge_sources()
+        bonus = np.where(self.cg.x[tails] % 200 == 0, -40.0, 0.0)
+        self.cg.weights['reward'] = self.cg.edge_weights() + bonus
+        G = nx.DiGraph()
+        for u, v, w in zip(tails.tolist(), self.cg.indices.tolist(), self.cg.weights['reward'].tolist()):
+            if w < G.get_edge_data(u, v, {'w': float('inf')})['w']:
+                G.add_edge(u, v, w=w)
+
+        source = self.cg.index_of(1000)
+        stats = compact_search.SearchStats()
+        tree = compact_search.bellman_ford_tree(self.cg, source, weight='reward', stats=stats)
+        expected = nx.single_source_bellman_ford_path_length(G, source, weight='w')
+        self.assertFalse(tree.has_negative_cycle)
+        self.assertEqual({node for node in range(self.cg.number_of_nodes()) if node in tree}, set(expected))
+        for node, length in expected.items():
+            self.assertAlmostEqual(tree.distance(node), length, places=6)
+            path = tree.path_to(node)
+            self.assertAlmostEqual(sum(G[u][v]['w'] for u, v in zip(path[:-1], path[1:])), length, places=6)
+        self.assertGreater(stats.relaxed, 0)
+
+        # Ciclo negativo: os nós alcançáveis a partir dele ficam sem distância definida
+        a, b = self.cg.index_of(1000 + 5 * 12 + 5), self.cg.index_of(1000 + 5 * 12 + 6)
+        edge = self.cg.indptr[a] + list(self.cg.indices[self.cg.indptr[a]:self.cg.indptr[a + 1]]).index(b)
+        self.cg.weights['reward'][edge] = -1000.0
+        with self.assertRaises(nx.NetworkXUnbounded):
+            compact_search.bellman_ford_tree(self.cg, source, weight='reward')
+        tree = compact_search.bellman_ford_tree(self.cg, source, weight='reward', negative_cycles='mark')
+        self.assertTrue(tree.has_negative_cycle)
+        with self.assertRaises(nx.NetworkXUnbounded):
+            tree.path_to(b)
+
+    def test_astar_with_heuristic_providers(self):
+        source = self.cg.index_of(1000)
+        lengths = nx.single_source_dijkstra_path_length(self.G, 1000, weight='length')
+        for name in HEURISTICS:
+            provider = create_heuristic(name, self.cg)
+            h = provider.for_target(self.cg.index_of(1143))
+            self.assertLessEqual(h[source], lengths.get(1143, float('inf')) + 1e-6, msg=name)
+            for target_node in list(lengths)[::9]:
+                path = self.cg.to_node_ids(compact_search.astar(
+                    self.cg, source, self.cg.index_of(target_node), heuristic=provider))
+                self.assertAlmostEqual(path_length(self.G, path), lengths[target_node], places=6, msg=name)
+
+    def test_landmark_provider_on_oneway_graphs(self):
+        # Termos inf - inf (NaN) de uma tabela não podem anular o limite da outra
+        for seed in (6, 8, 11):
+            G = build_oneway_graph(seed=seed)
+            self.assertFalse(nx.is_strongly_connected(G))
+            cg = CompactGraph.from_networkx(G)
+            provider = create_heuristic('landmark', cg)
+            for source_node in list(G.nodes)[::3]:
+                lengths = nx.single_source_dijkstra_path_length(G, source_node, weight='length')
+                for target_node in list(lengths)[::2]:
+                    for search in (compact_search.astar, compact_search.bidirectional_astar):
+                        path = cg.to_node_ids(search(cg, cg.index_of(source_node), cg.index_of(target_node),
+                                                     heuristic=provider))
+                        self.assertAlmostEqual(path_length(G, path), lengths[target_node], places=6,
+                                               msg=(seed, source_node, target_node, search.__name__))
+
+    def test_alt_landmark_strategies(self):
+        source = self.cg.index_of(1000)
+        lengths = nx.single_source_dijkstra_path_length(self.G, 1000, weight='length')
+        for strategy in LANDMARK_STRATEGIES:
+            provider = build_landmark_heuristic(self.cg, num_landmarks=4, strategy=strategy)
+            self.assertGreater(len(provider.landmarks), 0)
+            self.assertEqual(provider.from_landmarks.dtype.name, 'float32')
+            for target_node in list(lengths)[::11]:
+                target = self.cg.index_of(target_node)
+                for search in (compact_search.astar, compact_search.bidirectional_astar):
+                    path = self.cg.to_node_ids(search(self.cg, source, target, heuristic=provider))
+                    self.assertEqual(path[-1], target_node)
+                    self.assertAlmostEqual(path_length(self.G, path), lengths[target_node], places=6,
+                                           msg=(strategy, search.__name__))
+                self.assertLessEqual(provider.for_target(target)[source], lengths[target_node] + 1e-6)
+            # Estimativas em float32 continuam admissíveis para todos os nós, nos dois sentidos
+            from_source = np.array([lengths.get(node, np.inf) for node in self.cg.node_ids])
+            self.assertTrue(np.all(np.asarray(provider.for_source(source)) <= from_source + 1e-6))
+            self.assertEqual(provider.for_target(source).tolist(), provider.estimate_to(source).tolist())
+
+    def test_alt_on_oneway_graphs(self):
+        # Modo ALT ('alt' e 'bidirectional_alt') em grafos não fortemente conexos
+        for seed in (2, 5, 7, 12):
+            G = build_oneway_graph(seed=seed)
+            cg = CompactGraph.from_networkx(G)
+            provider = build_landmark_heuristic(cg, num_landmarks=4)
+            targets = list(G.nodes)[::3]
+            for source_node in list(G.nodes)[::4]:
+                calculator = RouteCalculator(G, source_node, targets, compact_graph=cg, landmark_heuristic=provider)
+                calculator.calculate_routes(['alt', 'bidirectional_alt'])
+                lengths = nx.single_source_dijkstra_path_length(G, source_node, weight='length')
+                for alg, routes in calculator.routes.items():
+                    self.assertEqual(len(routes), len([node for node in targets if node in lengths]))
+                    for route in routes:
+                        self.assertAlmostEqual(path_length(G, route), lengths[route[-1]], places=6,
+                                               msg=(seed, source_node, alg))
+
+    def test_bidirectional_astar_reuses_workspace(self):
+        rng = random.Random(7)
+        nodes = list(self.G.nodes)
+        workspace = compact_search.SearchWorkspace(self.cg)
+        providers = (None, build_landmark_heuristic(self.cg, num_landmarks=4))
+        for _ in range(40):
+            source_node, target_node = rng.choice(nodes), rng.choice(nodes)
+            source, target = self.cg.index_of(source_node), self.cg.index_of(target_node)
+            try:
+                expected = nx.shortest_path_length(self.G, source_node, target_node, weight='length')
+            except nx.NetworkXNoPath:
+                expected = None
+            for provider in providers:
+                stats = compact_search.SearchStats()
+                if expected is None:
+                    with self.assertRaises(nx.NetworkXNoPath):
+                        compact_search.bidirectional_astar(self.cg, source, target, heuristic=provider,
+                                                           workspace=workspace)
+                    continue
+                path = self.cg.to_node_ids(compact_search.bidirectional_astar(
+                    self.cg, source, target, heuristic=provider, stats=stats, workspace=workspace))
+                self.assertEqual((path[0], path[-1]), (source_node, target_node))
+                self.assertAlmostEqual(path_length(self.G, path), expected, places=6)
+                self.assertGreaterEqual(stats.settled, 0 if source == target else 1)
+        self.assertGreater(workspace.generation, 40)
+
+    def test_contraction_hierarchy(self):
+        hierarchy = ContractionHierarchy.build(self.cg)
+        lengths = nx.single_source_dijkstra_path_length(self.G, 1000, weight='length')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'ch.npz')
+            hierarchy.save(path)
+            loaded = ContractionHierarchy.load(self.cg, path)
+        for ch in (hierarchy, loaded):
+            for target_node in list(lengths)[::5]:
+                path = self.cg.to_node_ids(ch.shortest_path(self.cg.index_of(1000), self.cg.index_of(target_node)))
+                self.assertEqual(path[0], 1000)
+                self.assertEqual(path[-1], target_node)
+                self.assertAlmostEqual(path_length(self.G, path), lengths[target_node], places=6)
+
+    def test_nearest_destinations_single_search(self):
+        targets = list(self.G.nodes)[10:60:3] + [list(self.G.nodes)[10]]
+        lengths = nx.single_source_dijkstra_path_length(self.G, 1000, weight='length')
+        expected = sorted(lengths[t] for t in targets if t in lengths)[:5]
+
+        calculator = RouteCalculator(self.G, 1000, targets, compact_graph=self.cg)
+        nearest = calculator.nearest_destinations(k=5)
+        self.assertEqual(len(nearest), 5)
+        for (dist, pos), exp in zip(nearest, expected):
+            self.assertAlmostEqual(dist, exp, places=6)
+            self.assertAlmostEqual(dist, lengths[targets[pos]], places=6)
+
+        # As rotas saem da mesma árvore, sem nova busca
+        routes = calculator.tree_routes([targets[pos] for _, pos in nearest])
+        for route, (dist, _) in zip(routes, nearest):
+            self.assertAlmostEqual(path_length(self.G, route), dist, places=6)
+
+    def test_route_calculator_compact_engine(self):
+        targets = list(self.G.nodes)[5:40:5]
+        calculator = RouteCalculator(self.G, 1000, targets, compact_graph=self.cg)
+        calculator.calculate_routes(list(RouteCalculator.COMPACT_ALGORITHMS))
+        for alg, routes in calculator.routes.items():
+            for route in routes:
+                self.assertEqual(route[0], 1000)
+                self.assertIn(route[-1], targets)
+
+    def test_search_stats_instrumentation(self):
+        targets = list(self.G.nodes)[5:40:5]
+        algorithms = list(RouteCalculator.COMPACT_ALGORITHMS)
+        calculator = RouteCalculator(self.G, 1000, targets, compact_graph=self.cg, capture_search_space=True)
+        calculator.calculate_routes(algorithms)
+        self.assertEqual(set(calculator.search_stats), set(algorithms))
+        for alg, stats in calculator.search_stats.items():
+            self.assertGreaterEqual(stats.pushes, stats.pops, msg=alg)
+            self.assertGreaterEqual(stats.pops, stats.settled, msg=alg)
+            self.assertGreater(stats.peak_frontier, 0, msg=alg)
+            self.assertEqual(len(stats.search_space), stats.searches, msg=alg)
+            forward, backward = stats.search_space.query(0)
+            self.assertIn(self.cg.index_of(1000), forward.tolist(), msg=alg)
+            if alg.startswith('bidirectional') or alg == 'ch':
+                self.assertTrue(0.0 <= stats.meeting_position <= 1.0, msg=alg)
+                self.assertGreater(len(backward), 0, msg=alg)
+            else:
+                self.assertIsNone(stats.meeting_position, msg=alg)
+        # Uma única árvore do Bellman-Ford atende a todos os destinos
+        self.assertEqual(calculator.search_stats['bellman_ford'].searches, 1)
+        self.assertEqual(calculator.search_stats['dijkstra'].searches, len(targets))
+        row = calculator.stats_row(['dijkstra'])
+        self.assertEqual(row['Nós Fixados Dijkstra'], calculator.search_stats['dijkstra'].settled / len(targets))
+
+        uninstrumented = RouteCalculator(self.G, 1000, targets, compact_graph=self.cg, instrument=False)
+        uninstrumented.calculate_routes(['dijkstra'])
+        self.assertEqual(uninstrumented.search_stats, {})
+        self.assertEqual(uninstrumented.routes['dijkstra'], calculator.routes['dijkstra'])
+
+    def test_benchmark_reports_statistics_and_effort(self):
+        targets = list(self.G.nodes)[20:80:20]
+        calculator = RouteCalculator(self.G, 1000, targets, compact_graph=self.cg)
+        rows = RouteBenchmark(calculator, repetitions=3, warmup=1).run(['dijkstra', 'astar', 'bellman_ford'])
+        self.assertEqual(len(rows), 3 * len(targets))
+        for row in rows:
+            self.assertLessEqual(row['min_s'], row['median_s'])
+            self.assertLessEqual(row['median_s'], row['p95_s'])
+            self.assertGreater(row['settled'], 0)
+            self.assertGreaterEqual(row['relaxed'], row['settled'] - 1)
+        summary = RouteBenchmark.by_algorithm(rows)
+        # O A* euclidiano não fixa mais nós do que o Dijkstra
+        self.assertLessEqual(summary['astar']['settled'], summary['dijkstra']['settled'])
+
+    def test_benchmark_shares_bellman_ford_tree(self):
+        targets = list(self.G.nodes)[20:80:20]
+        calculator = RouteCalculator(self.G, 1000, targets, compact_graph=self.cg)
+        calculator.calculate_routes(['bellman_ford'])
+        # Como em 'calculate_routes': uma árvore por repetição (mais aquecimento e contadores)
+        with mock.patch.object(compact_search, 'bellman_ford_tree', wraps=compact_search.bellman_ford_tree) as tree:
+            rows = RouteBenchmark(calculator, repetitions=3, warmup=1).run(['bellman_ford'])
+        self.assertEqual(tree.call_count, 1 + 1 + 3)
+        self.assertEqual([row['target'] for row in rows], targets)
+        self.assertEqual([len(route) for route in calculator.routes['bellman_ford']],
+                         [row['route_nodes'] for row in rows])
+        summary = RouteBenchmark.by_algorithm(rows)
+        self.assertEqual(summary['bellman_ford']['settled'], rows[0]['settled'])
+
+    def test_bellman_ford_tree_not_reused_after_calculate_routes(self):
+        targets = list(self.G.nodes)[20:80:20]
+        calculator = RouteCalculator(self.G, 1000, targets, compact_graph=self.cg)
+        calculator.calculate_routes(['bellman_ford'])
+        # A árvore do lote não vale para consultas avulsas: cada uma refaz a busca
+        stats = compact_search.SearchStats()
+        route = calculator.route('bellman_ford', targets[0], stats=stats)
+        self.assertEqual(route, calculator.routes['bellman_ford'][0])
+        self.assertEqual(stats.searches, 1)
+        self.assertGreater(stats.relaxed, 0)
+
+    def test_route_calculator_parallel_matches_serial(self):
+        targets = list(self.G.nodes)[::4]
+        algorithms = ['dijkstra', 'bidirectional_a_star']
+        serial = RouteCalculator(self.G, 1000, targets, compact_graph=self.cg)
+        serial.calculate_routes(algorithms)
+        parallel = RouteCalculator(self.G, 1000, targets, compact_graph=self.cg)
+        # Grafo de teste pequeno demais para o paralelismo compensar
+        self.assertEqual(parallel.parallel_workers(algorithms, 8), 1)
+        with mock.patch.object(RouteCalculator, 'PARALLEL_MIN_WORK', 0):
+            self.assertEqual(parallel.parallel_workers(algorithms, 8),
+                             len(targets) * len(algorithms) // RouteCalculator.PARALLEL_MIN_JOBS_PER_WORKER)
+            self.assertEqual(parallel.parallel_workers(algorithms[:1], 8), 1)
+            parallel.calculate_routes(algorithms, workers=2)
+        self.assertEqual(parallel.routes, serial.routes)
+        self.assertEqual(set(parallel.avg_times), set(algorithms))
+        for alg in algorithms:
+            self.assertEqual(parallel.search_stats[alg].settled, serial.search_stats[alg].settled)
+
+    def test_distance_matrix_strategies(self):
+        nodes = list(self.G.nodes)
+        sources, targets = nodes[::7] + [nodes[0]], nodes[3::11]
+        expected = [[nx.shortest_path_length(self.G, s, t, weight='length') if nx.has_path(self.G, s, t) else float('inf')
+                     for t in targets] for s in sources]
+        calculator = RouteCalculator(self.G, nodes[0], targets, compact_graph=self.cg)
+        for strategy in ('one_to_many', 'buckets'):
+            matrix = calculator.distance_matrix(sources, strategy=strategy)
+            self.assertEqual(matrix.strategy, strategy)
+            np.testing.assert_allclose(matrix.distances, expected)
+            self.assertAlmostEqual(path_length(self.G, matrix.path(1, 2)), matrix.distances[1, 2])
+
+        # Execução paralela por origens, com a hierarquia já disponível ('auto' -> buckets)
+        with mock.patch.object(distance_matrix, 'PARALLEL_MIN_SOURCES', 2):
+            parallel = calculator.distance_matrix(sources, workers=2)
+        self.assertEqual(parallel.strategy, 'buckets')
+        np.testing.assert_allclose(parallel.distances, expected)
+
+if __name__ == '__main__':
+    unittest.main()
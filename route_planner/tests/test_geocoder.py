@@ -0,0 +1,66 @@
+# tests/test_geocoder.py
+
+import os
+import tempfile
+import unittest
+
+from route_planner.geocoder import GeoCoder, GeocodeCache, GazetteerBackend, TokenBucket
+
+class CountingGazetteer(GazetteerBackend):
+    def __init__(self, entries):
+        super().__init__(entries)
+        self.calls = 0
+
+    def geocode(self, address):
+        self.calls += 1
+        return super().geocode(address)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.waits = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.waits.append(seconds)
+        self.now += seconds
+
+class TestGeoCoder(unittest.TestCase):
+    def setUp(self):
+        self.entries = {
+            'Praça XV, Rio de Janeiro': [[-22.9027, -43.1738, 'Praça XV de Novembro']],
+            'Centro': [[-22.9068, -43.1729, 'Centro, Rio de Janeiro'], [-23.5505, -46.6333, 'Centro, São Paulo']],
+        }
+
+    def test_results_are_cached_on_disk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'geocodificacao.sqlite')
+            backend = CountingGazetteer(self.entries)
+            geocoder = GeoCoder(backend=backend, cache=GeocodeCache(path))
+            results = geocoder.geocode_many(['Praça XV, Rio de Janeiro', 'praça xv,  rio de janeiro', 'Centro', 'Lugar nenhum'])
+            self.assertEqual(backend.calls, 3)
+            self.assertEqual(results['praça xv,  rio de janeiro'], (-22.9027, -43.1738, 'Praça XV de Novembro'))
+            self.assertEqual(len(results['Centro']), 2)
+            self.assertIsNone(results['Lugar nenhum'])
+            geocoder.cache.close()
+
+            # Nova sessão: tudo servido pelo arquivo, inclusive os endereços não encontrados
+            backend = CountingGazetteer(self.entries)
+            geocoder = GeoCoder(backend=backend, cache=GeocodeCache(path))
+            self.assertEqual(geocoder.geocode_many(results), results)
+            self.assertEqual(backend.calls, 0)
+            geocoder.cache.close()
+
+    def test_token_bucket_only_waits_when_empty(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1.0, capacity=2, clock=clock, sleep=clock.sleep)
+        self.assertEqual([bucket.acquire() for _ in range(2)], [0.0, 0.0])
+        self.assertAlmostEqual(bucket.acquire(), 1.0)
+        clock.now += 5
+        self.assertEqual(bucket.acquire(), 0.0)
+        self.assertEqual(clock.waits, [1.0])
+
+if __name__ == '__main__':
+    unittest.main()
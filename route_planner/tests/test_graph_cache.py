@@ -0,0 +1,134 @@
+# tests/test_graph_cache.py
+
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import networkx as nx
+from pyproj import Transformer
+
+from route_planner.compact_graph import CompactGraph
+from route_planner.graph_cache import GraphCache
+from route_planner.graph_handler import GraphHandler
+from route_planner.local_graph_loader import LocalGraphLoader
+
+ORIGIN = (-22.9068, -43.1729)
+
+def build_projected_graph(size=21, spacing=100.0):
+    """
+    Cria um grafo projetado (UTM 23S) em grade, centrado na origem de teste.
+    """
+    transformer = Transformer.from_crs("epsg:4326", "epsg:32723", always_xy=True)
+    cx, cy = transformer.transform(ORIGIN[1], ORIGIN[0])
+    G = nx.MultiDiGraph(crs='epsg:32723')
+    half = size // 2
+    for i in range(size):
+        for j in range(size):
+            G.add_node(i * size + j, x=cx + (i - half) * spacing, y=cy + (j - half) * spacing)
+    for i in range(size):
+        for j in range(size):
+            if i + 1 < size:
+                G.add_edge(i * size + j, (i + 1) * size + j, length=spacing)
+                G.add_edge((i + 1) * size + j, i * size + j, length=spacing)
+            if j + 1 < size:
+                G.add_edge(i * size + j, i * size + j + 1, length=spacing)
+                G.add_edge(i * size + j + 1, i * size + j, length=spacing)
+    return G
+
+def write_osm_fixture(path, size=5, spacing=0.001):
+    """
+    Grava um extrato OSM XML com uma grade de vias residenciais em torno da origem de teste.
+    """
+    def node_id(i, j):
+        return 1 + i * size + j
+
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<osm version="0.6">']
+    half = size // 2
+    for i in range(size):
+        for j in range(size):
+            lat, lon = ORIGIN[0] + (i - half) * spacing, ORIGIN[1] + (j - half) * spacing
+            lines.append(f'  <node id="{node_id(i, j)}" lat="{lat:.7f}" lon="{lon:.7f}"/>')
+    ways = [[node_id(i, j) for j in range(size)] for i in range(size)]
+    ways += [[node_id(i, j) for i in range(size)] for j in range(size)]
+    for way_id, refs in enumerate(ways, start=100):
+        lines.append(f'  <way id="{way_id}">')
+        lines.extend(f'    <nd ref="{ref}"/>' for ref in refs)
+        lines.append('    <tag k="highway" v="residential"/>')
+        lines.append('  </way>')
+    lines.append('</osm>')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+
+class TestGraphCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = GraphCache(cache_dir=self.cache_dir)
+        self.G = build_projected_graph()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_miss_returns_none(self):
+        self.assertIsNone(self.cache.load(ORIGIN, 1000))
+
+    def test_save_and_load_exact(self):
+        cg = CompactGraph.from_networkx(self.G)
+        self.cache.save(ORIGIN, 1000, self.G, nx.density(self.G), cg)
+
+        G_loaded, density, cg_loaded = self.cache.load((ORIGIN[0] + 1e-6, ORIGIN[1]), 1000)
+        self.assertEqual(G_loaded.number_of_edges(), self.G.number_of_edges())
+        self.assertAlmostEqual(density, nx.density(self.G))
+        self.assertEqual(cg_loaded.number_of_edges(), cg.number_of_edges())
+        self.assertEqual(str(cg_loaded.crs), 'epsg:32723')
+
+    def test_smaller_radius_is_cropped(self):
+        self.cache.save(ORIGIN, 1000, self.G, nx.density(self.G))
+        G_small, density, cg = self.cache.load(ORIGIN, 450)
+        self.assertIsNone(cg)
+        self.assertGreater(G_small.number_of_nodes(), 0)
+        self.assertLess(G_small.number_of_nodes(), self.G.number_of_nodes())
+        self.assertAlmostEqual(density, nx.density(G_small))
+        # Um raio maior do que o armazenado não pode ser atendido
+        self.assertIsNone(self.cache.load(ORIGIN, 2000))
+
+    def test_concurrent_saves_keep_all_entries(self):
+        # Gravações simultâneas no mesmo cache (ex.: lote e servidor) não descartam entradas do índice
+        G = build_projected_graph(size=3)
+        radii = range(100, 140)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda radius: self.cache.save(ORIGIN, radius, G, nx.density(G)), radii))
+        self.assertEqual(sorted(entry['radius'] for entry in self.cache.load_index().values()), list(radii))
+
+    def test_source_file_has_own_entries(self):
+        # Grafo baixado do OSM para a mesma origem e raio, que não deve ser reutilizado
+        self.cache.save(ORIGIN, 500, self.G, nx.density(self.G))
+        source_file = os.path.join(self.cache_dir, 'extrato.osm')
+        write_osm_fixture(source_file)
+
+        handler = GraphHandler(ORIGIN, 500, cache=self.cache, source_file=source_file)
+        handler.create_graph()
+        self.assertEqual(handler.G_projected.number_of_nodes(), 25)
+        self.assertEqual(handler.compact_graph.number_of_edges(), 80)
+        self.assertIsNotNone(handler.cache_source)
+
+        # Mesmo arquivo: lido do cache, sem reprocessar o extrato
+        with mock.patch.object(LocalGraphLoader, 'load') as load:
+            cached = GraphHandler(ORIGIN, 500, cache=self.cache, source_file=source_file)
+            cached.create_graph()
+            load.assert_not_called()
+        self.assertEqual(cached.G_projected.number_of_nodes(), 25)
+        self.assertEqual(cached.cache_source, handler.cache_source)
+
+        # Arquivo alterado: nova entrada
+        write_osm_fixture(source_file, size=3)
+        os.utime(source_file, ns=(0, 0))
+        changed = GraphHandler(ORIGIN, 500, cache=self.cache, source_file=source_file)
+        changed.create_graph()
+        self.assertEqual(changed.G_projected.number_of_nodes(), 9)
+        self.assertNotEqual(changed.cache_source, handler.cache_source)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# tests/test_pipeline.py
+
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import networkx as nx
+
+from route_planner.contraction_hierarchy import ContractionHierarchy
+from route_planner.graph_cache import GraphCache
+from route_planner.pipeline import RoutePipeline, PipelineCancelled
+from route_planner.poi_finder import POIFinder
+from route_planner.tests.test_graph_cache import ORIGIN, build_projected_graph
+from route_planner.tests.test_poi_finder import build_features
+
+class TestRoutePipeline(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = GraphCache(self.cache_dir)
+        G = build_projected_graph()
+        self.cache.save(ORIGIN, 1000, G, nx.density(G))
+        POIFinder._session.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        POIFinder._session.clear()
+
+    def test_run_without_gui(self):
+        events = []
+        pipeline = RoutePipeline(graph_cache=self.cache, on_progress=events.append)
+        with mock.patch('route_planner.poi_finder.ox.features_from_point', return_value=build_features()):
+            calculator = pipeline.run(1000, 2, ['dijkstra', 'astar'], origin_point=ORIGIN,
+                                      choose_cuisine=lambda counts: 'pizza' if 'pizza' in counts else None)
+
+        self.assertEqual(pipeline.cuisine, 'pizza')
+        self.assertEqual(len(pipeline.selected_nodes), 2)
+        self.assertEqual(sorted(pipeline.selected_names), ['Cantina B', 'Pizzaria A'])
+        self.assertEqual(set(calculator.avg_times), {'dijkstra', 'astar'})
+        finished = [event.stage for event in events if event.status == 'finished']
+        self.assertEqual(sorted(finished), sorted(RoutePipeline.STAGES[1:]))
+
+    def test_preprocessing_built_once_and_cached(self):
+        pipeline = RoutePipeline(graph_cache=self.cache)
+        algorithms = ['alt', 'ch']
+        with mock.patch('route_planner.poi_finder.ox.features_from_point', return_value=build_features()):
+            calculator = pipeline.run(1000, 2, algorithms, origin_point=ORIGIN, cuisine='pizza')
+            preprocessing = pipeline.preprocessing(algorithms)
+            self.assertIs(calculator.landmark_heuristic, preprocessing['landmark_heuristic'])
+            self.assertIs(calculator.contraction_hierarchy, preprocessing['contraction_hierarchy'])
+            self.assertIs(pipeline.calculate_routes(algorithms).contraction_hierarchy,
+                          preprocessing['contraction_hierarchy'])
+
+        # Nova área: artefatos lidos do cache de grafos
+        pipeline.load_area(1000)
+        with mock.patch.object(ContractionHierarchy, 'build') as build:
+            self.assertIsNot(pipeline.preprocessing(algorithms)['contraction_hierarchy'],
+                             preprocessing['contraction_hierarchy'])
+            build.assert_not_called()
+
+    def test_cancel_stops_pipeline(self):
+        pipeline = RoutePipeline(graph_cache=self.cache)
+
+        def fetch(*args, **kwargs):
+            pipeline.cancel()
+            return build_features()
+
+        with mock.patch('route_planner.poi_finder.ox.features_from_point', side_effect=fetch):
+            with self.assertRaises(PipelineCancelled):
+                pipeline.run(1000, 2, ['dijkstra'], origin_point=ORIGIN, cuisine='pizza')
+        self.assertIsNone(pipeline.route_calculator)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+# tests/test_poi_finder.py
+
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import geopandas as gpd
+from shapely.geometry import Point
+
+from route_planner.cuisine_index import CuisineIndex
+from route_planner.poi_cache import POICache
+from route_planner.poi_finder import POIFinder
+from route_planner.tests.test_graph_cache import ORIGIN, build_projected_graph
+
+def build_features():
+    """
+    Cria um conjunto de restaurantes em EPSG:4326 ao redor da origem de teste.
+    """
+    rows = [
+        ('Pizzaria A', 'pizza', 0.001),
+        ('Cantina B', 'italian;pizza', 0.002),
+        ('Sushi C', 'japanese', -0.002),
+        ('Pizzaria D', 'pizza', 0.008),
+    ]
+    return gpd.GeoDataFrame(
+        {'name': [name for name, _, _ in rows], 'cuisine': [cuisine for _, cuisine, _ in rows]},
+        geometry=[Point(ORIGIN[1] + offset, ORIGIN[0]) for _, _, offset in rows],
+        crs='epsg:4326'
+    )
+
+class TestCuisineIndex(unittest.TestCase):
+    def test_queries(self):
+        features = build_features()
+        features.loc[4] = ['Bar E', ' Pizza ; burger;pizza', Point(ORIGIN[1], ORIGIN[0])]
+        features.loc[5] = ['Sem Cozinha', None, Point(ORIGIN[1], ORIGIN[0])]
+        index = CuisineIndex(features)
+
+        self.assertEqual(index.counts()['pizza'], 4)
+        self.assertIn('PIZZA', index)
+        self.assertEqual(index.lookup('Pizza').tolist(), [0, 1, 3, 4])
+        self.assertEqual(index.lookup('japanese;burger').tolist(), [2, 4])
+        self.assertEqual(index.lookup(['italian', 'thai']).tolist(), [1])
+        self.assertEqual(index.lookup('thai').tolist(), [])
+        self.assertEqual(index.search_names('pizzaria').tolist(), [0, 3])
+
+class TestPOIFinder(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.G = build_projected_graph()
+        POIFinder._session.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        POIFinder._session.clear()
+
+    def test_features_are_fetched_once(self):
+        with mock.patch('route_planner.poi_finder.ox.features_from_point', return_value=build_features()) as fetch:
+            finder = POIFinder(self.G, ORIGIN, 1000, cache=POICache(self.cache_dir))
+            finder.get_available_cuisines()
+            self.assertEqual(finder.cuisine_counts['pizza'], 3)
+            finder.cuisine = 'pizza'
+            finder.get_pois()
+            self.assertEqual(len(finder.destination_names), 3)
+
+            # Outra cozinha e um raio menor na mesma sessão
+            smaller = POIFinder(self.G, ORIGIN, 500)
+            smaller.cuisine = 'pizza'
+            smaller.get_pois()
+            self.assertEqual(sorted(smaller.destination_names), ['Cantina B', 'Pizzaria A'])
+            self.assertEqual(fetch.call_count, 1)
+
+        # Nova sessão: atendida pelo cache em disco
+        POIFinder._session.clear()
+        with mock.patch('route_planner.poi_finder.ox.features_from_point') as fetch:
+            finder = POIFinder(self.G, ORIGIN, 800, cache=POICache(self.cache_dir))
+            finder.cuisine = 'japanese'
+            finder.get_pois()
+            self.assertEqual(finder.destination_names, ['Sushi C'])
+            fetch.assert_not_called()
+
+    def test_session_shared_between_threads(self):
+        # Mais áreas do que SESSION_SIZE: inserções e descartes simultâneos na sessão
+        origins = [(ORIGIN[0] + 0.01 * i, ORIGIN[1]) for i in range(3 * POIFinder.SESSION_SIZE)]
+
+        def fetch(origin):
+            finder = POIFinder(self.G, origin, 1000)
+            return len(finder.fetch_features())
+
+        with mock.patch('route_planner.poi_finder.ox.features_from_point', return_value=build_features()):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                counts = list(executor.map(fetch, origins * 4))
+        self.assertEqual(set(counts), {4})
+        self.assertEqual(len(POIFinder._session), POIFinder.SESSION_SIZE)
+
+if __name__ == '__main__':
+    unittest.main()
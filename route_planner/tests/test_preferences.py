@@ -31,5 +31,14 @@ class TestUserPreferences(unittest.TestCase):
         self.assertEqual(new_preferences.preferences['cuisine'], 'pizza')
         self.assertEqual(new_preferences.preferences['num_destinations'], 5)
 
+    def test_selected_algorithms(self):
+        # ALT e CH ficam fora da execução padrão
+        self.assertEqual(self.preferences.selected_algorithms(), list(UserPreferences.DEFAULT_ALGORITHMS))
+
+        self.preferences.preferences['algorithms'] = ['ch', 'dijkstra', 'alt']
+        self.preferences.save_preferences()
+        new_preferences = UserPreferences(filename=self.test_filename)
+        self.assertEqual(new_preferences.selected_algorithms(), ['dijkstra', 'alt', 'ch'])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,96 @@
+# tests/test_results_store.py
+
+import os
+import tempfile
+import threading
+import unittest
+
+from route_planner.compact_graph import CompactGraph
+from route_planner.results_store import ResultsStore, algorithm_results
+from route_planner.route_calculator import RouteCalculator
+from route_planner.tests.test_compact_graph import build_test_graph
+
+ADDRESS = "Avenida Rio Branco, Centro,\nRio de Janeiro, Brasil"
+
+LEGACY_CSV = (
+    "Endereço de Origem,Latitude,Longitude,Raio de Busca (m),Tipo de Estabelecimento,Número de Vértices,"
+    "Número de Arestas,Densidade do Grafo,Tempo Médio Dijkstra (s),Tempo Médio Astar (s)\n"
+    f"\"{ADDRESS}\",-22.9,-43.17,500,pizza,677,800,0.0017,0.002,0.001\n"
+    f"\"{ADDRESS}\",-22.9,-43.17,1000,pizza,1500,2100,0.0009,0.004,0.003,0.5\n"
+)
+
+class TestResultsStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'resultados.sqlite')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_calculator(self, algorithms):
+        G = build_test_graph(size=8)
+        targets = list(G.nodes)[5:40:7]
+        calculator = RouteCalculator(G, 1000, targets, compact_graph=CompactGraph.from_networkx(G))
+        calculator.calculate_routes(algorithms)
+        return calculator
+
+    def test_runs_keep_raw_timings_and_deduplicate_origins(self):
+        algorithms = ['dijkstra', 'bidirectional_a_star']
+        calculator = self.run_calculator(algorithms)
+        run = {'address': ADDRESS, 'latitude': -22.9, 'longitude': -43.17, 'radius': 500, 'cuisine': 'pizza',
+               'num_nodes': 64, 'num_edges': 200, 'density': 0.05, 'num_destinations': 6}
+        with ResultsStore(self.path) as store:
+            store.add_run(run, algorithm_results(calculator, algorithms))
+            store.add_run(dict(run, radius=1000, num_nodes=128), algorithm_results(calculator, algorithms),
+                          source='batch')
+            self.assertEqual(store._connection.execute("SELECT COUNT(*) FROM origins").fetchone()[0], 1)
+
+            frame = store.frame()
+            self.assertEqual(len(frame), 2)
+            self.assertEqual(frame['Endereço de Origem'][0], ADDRESS)
+            self.assertAlmostEqual(frame['Tempo Médio Dijkstra (s)'][0], calculator.avg_times['dijkstra'])
+            self.assertEqual(frame['Nós Fixados Dijkstra'][0], calculator.search_stats['dijkstra'].summary()['settled'])
+            self.assertIn('Posição do Encontro Bidirectional a star', frame)
+            self.assertNotIn('Posição do Encontro Dijkstra', frame)
+
+            self.assertEqual(len(store.frame(source='batch')), 1)
+            self.assertEqual(len(store.frame(min_nodes=100)), 1)
+            timings = store.timings(algorithms=['dijkstra'], source='gui')
+            self.assertEqual(sorted(timings['target']), sorted(route[-1] for route in calculator.routes['dijkstra']))
+            self.assertEqual(list(timings['seconds']), calculator.query_times['dijkstra'])
+            with self.assertRaises(ValueError):
+                store.frame(country='BR')
+
+    def test_import_legacy_csv(self):
+        csv_path = os.path.join(self.tmp.name, 'resultados_centro.csv')
+        with open(csv_path, 'w', encoding='utf-8') as f:
+            f.write(LEGACY_CSV)
+        with ResultsStore(self.path) as store:
+            self.assertEqual(store.import_csv(csv_path), 2)
+            frame = store.frame(scenario='centro')
+            self.assertEqual(list(frame['Raio de Busca (m)']), [500.0, 1000.0])
+            # Valor excedente da segunda linha descartado
+            self.assertEqual(list(frame['Tempo Médio Astar (s)']), [0.001, 0.003])
+            self.assertNotIn('Nós Fixados Dijkstra', frame)
+
+    def test_concurrent_writers(self):
+        ResultsStore(self.path).close()
+        run = {'address': ADDRESS, 'latitude': -22.9, 'longitude': -43.17}
+        results = {'dijkstra': {'avg_seconds': 0.1, 'timings': [(1, 0.1)] * 50}}
+
+        def write():
+            with ResultsStore(self.path) as store:
+                for _ in range(20):
+                    store.add_run(run, results, source='batch')
+
+        threads = [threading.Thread(target=write) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with ResultsStore(self.path) as store:
+            self.assertEqual(len(store.frame()), 80)
+            self.assertEqual(len(store.timings()), 80 * 50)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# tests/test_route_geometry.py
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import folium
+import networkx as nx
+import numpy as np
+from pyproj import Transformer
+from shapely.geometry import LineString
+
+from route_planner.compact_graph import CompactGraph
+from route_planner.compact_search import SearchStats
+from route_planner.route_geometry import RouteGeometry, simplify_polylines
+from route_planner.route_plotter import RoutePlotter
+from route_planner.search_space import SearchSpace
+
+class TestRouteGeometry(unittest.TestCase):
+    def setUp(self):
+        self.G = nx.MultiDiGraph(crs='epsg:32723')
+        for node in range(6):
+            self.G.add_node(100 + node, x=680000.0 + 100 * node, y=7460000.0 + 50 * (node % 2))
+        for node in range(5):
+            self.G.add_edge(100 + node, 101 + node, length=120.0)
+        # Aresta paralela mais curta com traçado: deve ser a usada no desenho
+        self.G.add_edge(101, 102, length=110.0, geometry=LineString([(680100, 7460050), (680150, 7460100),
+                                                                     (680200, 7460000)]))
+        self.cg = CompactGraph.from_networkx(self.G)
+        self.transformer = Transformer.from_crs('epsg:32723', 'epsg:4326', always_xy=True)
+
+    def test_polylines_match_per_point_transform(self):
+        geometry = RouteGeometry(self.cg, self.transformer, self.G)
+        routes = [[100, 101, 102, 103], [105], [104, 105]]
+        for route, line in zip(routes, geometry.polylines(routes)):
+            expected = [self.transformer.transform(self.G.nodes[n]['x'], self.G.nodes[n]['y'])[::-1] for n in route]
+            np.testing.assert_allclose(line, expected)
+
+    def test_edge_geometry_and_cache(self):
+        geometry = RouteGeometry.for_graph(self.cg, self.transformer, self.G)
+        self.assertIs(RouteGeometry.for_graph(self.cg, self.transformer), geometry)
+        line, = geometry.polylines([[100, 101, 102, 103]], edge_geometry=True)
+        self.assertEqual(len(line), 5)
+        np.testing.assert_allclose(line[2], self.transformer.transform(680150, 7460100)[::-1])
+        self.assertIsNone(geometry._edge_shapes[(100, 101)])
+
+    def test_simplify_keeps_endpoints(self):
+        line = np.column_stack([np.full(50, -22.9), np.linspace(-43.2, -43.19, 50)])
+        line[25, 0] += 1e-6  # Desvio de ~0,1 m, abaixo da tolerância
+        simplified, single = simplify_polylines([line, line[:1]], tolerance=1.0)
+        np.testing.assert_allclose(simplified, line[[0, -1]])
+        self.assertEqual(len(single), 1)
+
+    def test_compact_map_deduplicates_paths(self):
+        algorithms = ['dijkstra', 'astar', 'alt']
+        routes = {alg: [[100, 101, 102, 103], [100, 101, 102, 103, 104, 105]] for alg in algorithms}
+        routes['alt'][1] = [100, 101, 102]
+        prefs = {'dijkstra': {'color': 'red', 'style': 'solid'}, 'astar': {'color': 'green', 'style': 'dashed'}}
+        plotter = RoutePlotter(self.G, self.transformer, prefs, compact_graph=self.cg, compact=True)
+
+        collection = plotter.routes_geojson(routes, algorithms, limit=2)
+        self.assertEqual([f['properties']['algorithms'] for f in collection['features']],
+                         [algorithms, ['dijkstra', 'astar'], ['alt']])
+        self.assertEqual(collection['features'][0]['properties']['color'], 'red')
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp, mock.patch('webbrowser.open'):
+            os.chdir(tmp)
+            try:
+                file_name = plotter.plot_routes_subset((-22.9, -43.2), routes, [], [], [], algorithms, limit=2)
+                with open(os.path.splitext(file_name)[0] + '.geojson', encoding='utf-8') as f:
+                    self.assertEqual(len(json.load(f)['features']), 3)
+                with open(file_name, encoding='utf-8') as f:
+                    self.assertNotIn('textPath', f.read())
+            finally:
+                os.chdir(cwd)
+
+    def test_search_space_bitsets_and_layers(self):
+        space = SearchSpace(self.cg.number_of_nodes())
+        space.add([0, 1, 2], [5, 4])
+        space.add(np.array([True, True, False, False, False, False]))
+        self.assertEqual(space.nbytes, 4)  # Um byte por sentido e consulta
+        forward, backward = space.query(0)
+        self.assertEqual(forward.tolist(), [0, 1, 2])
+        self.assertEqual(backward.tolist(), [4, 5])
+        self.assertEqual(space.frequency().tolist(), [2, 2, 1, 0, 1, 1])
+        self.assertEqual(int(space.union().sum()), 5)
+
+        stats = {'dijkstra': SearchStats(search_space=space), 'astar': SearchStats()}
+        for layer in RoutePlotter.SEARCH_SPACE_LAYERS:
+            plotter = RoutePlotter(self.G, self.transformer, {}, compact_graph=self.cg, search_space_layer=layer)
+            m = folium.Map(location=(-22.9, -43.2))
+            self.assertEqual(plotter.add_search_space_layers(m, stats, ['dijkstra', 'astar']), {'dijkstra': 5})
+        with self.assertRaises(ValueError):
+            RoutePlotter(self.G, self.transformer, {}, search_space_layer='voronoi')
+
+if __name__ == '__main__':
+    unittest.main()
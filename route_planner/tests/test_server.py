@@ -0,0 +1,110 @@
+# tests/test_server.py
+
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import networkx as nx
+
+from route_planner.graph_cache import GraphCache
+from route_planner.graph_handler import GraphHandler
+from route_planner.poi_finder import POIFinder
+from route_planner.server import AreaStore, RoutingService, create_server
+from route_planner.tests.test_graph_cache import ORIGIN, build_projected_graph
+from route_planner.tests.test_poi_finder import build_features
+
+class TestRoutingService(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        cache = GraphCache(self.cache_dir)
+        self.G = build_projected_graph()
+        cache.save(ORIGIN, 1000, self.G, nx.density(self.G))
+        self.service = RoutingService(AreaStore(capacity=1, graph_cache=cache))
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_queries_share_the_loaded_area(self):
+        target = (ORIGIN[0] + 0.004, ORIGIN[1] + 0.003)
+        area = {'origin': ORIGIN, 'radius': 1000}
+        dijkstra = self.service.route(dict(area, target=target))
+        ch = self.service.route(dict(area, target=target, algorithm='ch'))
+        self.assertAlmostEqual(dijkstra['distance_m'], ch['distance_m'])
+        self.assertAlmostEqual(
+            dijkstra['distance_m'],
+            nx.shortest_path_length(self.G, dijkstra['nodes'][0], dijkstra['nodes'][-1], weight='length')
+        )
+
+        many = self.service.one_to_many(dict(area, targets=[target, ORIGIN], paths=True))
+        self.assertAlmostEqual(many['distances_m'][0], dijkstra['distance_m'])
+        self.assertEqual(many['distances_m'][1], 0.0)
+        self.assertEqual(many['paths'][0], dijkstra['path'])
+
+        [loaded] = self.service.store.describe()
+        self.assertEqual(loaded['queries'], 3)
+        self.assertEqual(loaded['preprocessing'], ['contraction_hierarchy'])
+
+        # Capacidade 1: outra área substitui a anterior
+        self.service.route({'origin': ORIGIN, 'radius': 500, 'target': ORIGIN})
+        self.assertEqual([a['radius'] for a in self.service.store.describe()], [500])
+
+    def test_concurrent_queries(self):
+        area = {'origin': ORIGIN, 'radius': 1000}
+        targets = [(ORIGIN[0] + 0.001 * i, ORIGIN[1] - 0.0008 * i) for i in range(-4, 5)]
+        requests = [dict(area, target=target, algorithm=algorithm)
+                    for algorithm in ('bidirectional_a_star', 'alt', 'bidirectional_alt', 'ch') for target in targets]
+        expected = [self.service.route(dict(request, algorithm='dijkstra'))['distance_m'] for request in requests]
+
+        built = mock.patch.object(GraphHandler, 'contraction_hierarchy', autospec=True,
+                                  side_effect=GraphHandler.contraction_hierarchy)
+        with built as contraction_hierarchy, ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(self.service.route, requests * 3))
+        self.assertEqual(contraction_hierarchy.call_count, 1)
+        for result, distance in zip(results, expected * 3):
+            self.assertAlmostEqual(result['distance_m'], distance, msg=result['algorithm'])
+
+        # Calculadoras devolvidas e reaproveitadas: no máximo uma por consulta simultânea
+        loaded = self.service.store.get(ORIGIN, 1000)
+        self.assertLessEqual(len(loaded._calculators['length']), 8)
+        self.service.route(dict(area, target=targets[0], algorithm='bidirectional_a_star'))
+        self.assertLessEqual(len(loaded._calculators['length']), 8)
+
+    def test_concurrent_poi_queries_snap_once_per_cuisine(self):
+        area = {'origin': ORIGIN, 'radius': 1000}
+        requests = [dict(area, source=ORIGIN, cuisine=cuisine, k=2) for cuisine in ('pizza', 'japanese')] * 6
+        POIFinder._session.clear()
+        with mock.patch('route_planner.poi_finder.ox.features_from_point', return_value=build_features()), \
+                mock.patch.object(POIFinder, 'get_pois', autospec=True, side_effect=POIFinder.get_pois) as get_pois, \
+                ThreadPoolExecutor(max_workers=6) as executor:
+            results = list(executor.map(self.service.nearest_pois, requests))
+        POIFinder._session.clear()
+
+        self.assertEqual(get_pois.call_count, 2)
+        for i, result in enumerate(results):
+            self.assertEqual(result['pois'], results[i % 2]['pois'])
+        self.assertEqual([poi['name'] for poi in results[0]['pois']], ['Pizzaria A', 'Cantina B'])
+        self.assertEqual([poi['name'] for poi in results[1]['pois']], ['Sushi C'])
+
+    def test_http_round_trip(self):
+        server = create_server(port=0, service=self.service)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}"
+            body = json.dumps({'origin': ORIGIN, 'radius': 1000, 'target': ORIGIN}).encode('utf-8')
+            with urllib.request.urlopen(urllib.request.Request(f"{url}/route", data=body)) as response:
+                self.assertEqual(json.load(response)['distance_m'], 0.0)
+            with self.assertRaises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(urllib.request.Request(f"{url}/route", data=b'{"radius": 1000}'))
+            self.assertEqual(error.exception.code, 400)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
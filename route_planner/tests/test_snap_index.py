@@ -0,0 +1,53 @@
+# tests/test_snap_index.py
+
+import unittest
+
+import numpy as np
+
+from route_planner.compact_graph import CompactGraph
+from route_planner.snap_index import SnapIndex
+from route_planner.tests.test_compact_graph import build_test_graph
+
+class TestSnapIndex(unittest.TestCase):
+    def setUp(self):
+        self.cg = CompactGraph.from_networkx(build_test_graph())
+        rng = np.random.default_rng(0)
+        self.x = rng.uniform(-300, 1400, 200)
+        self.y = rng.uniform(-300, 1400, 200)
+
+    def test_built_once_per_graph(self):
+        self.assertIs(SnapIndex.for_graph(self.cg), SnapIndex.for_graph(self.cg))
+
+    def test_nearest_nodes_match_brute_force(self):
+        nodes, distances = SnapIndex.for_graph(self.cg).nearest_nodes(self.x, self.y)
+        brute = np.hypot(self.cg.x[None, :] - self.x[:, None], self.cg.y[None, :] - self.y[:, None])
+        np.testing.assert_allclose(distances, brute.min(axis=1))
+        np.testing.assert_allclose(brute[np.arange(len(self.x)), nodes], brute.min(axis=1))
+
+        # Pontos além da distância máxima são rejeitados
+        nodes, _ = SnapIndex.for_graph(self.cg).nearest_nodes(self.x, self.y, max_distance=50)
+        self.assertTrue(np.all((nodes == -1) == (brute.min(axis=1) > 50)))
+        ids = SnapIndex.for_graph(self.cg).nearest_node_ids(self.x[:5], self.y[:5], max_distance=50)
+        self.assertEqual([node is None for node in ids], (nodes[:5] == -1).tolist())
+
+    def test_nearest_edges_match_brute_force(self):
+        index = SnapIndex.for_graph(self.cg)
+        edges, t, qx, qy, distances = index.nearest_edges(self.x, self.y, k=2)
+        tails, heads = self.cg.edge_sources(), self.cg.indices
+        ax, ay = self.cg.x[tails], self.cg.y[tails]
+        dx, dy = self.cg.x[heads] - ax, self.cg.y[heads] - ay
+        s = np.clip(((self.x[:, None] - ax) * dx + (self.y[:, None] - ay) * dy) / (dx * dx + dy * dy), 0, 1)
+        brute = np.hypot(self.x[:, None] - (ax + s * dx), self.y[:, None] - (ay + s * dy))
+        np.testing.assert_allclose(distances, brute.min(axis=1), atol=1e-9)
+        # O ponto projetado fica sobre a aresta escolhida
+        np.testing.assert_allclose(qx, ax[edges] + t * dx[edges])
+        np.testing.assert_allclose(qy, ay[edges] + t * dy[edges])
+
+        # Extremidade da aresta mais próxima do ponto projetado, com o mesmo limite de distância
+        ids = index.nearest_edge_node_ids(self.x, self.y, max_distance=50)
+        expected = np.where(t < 0.5, tails[edges], heads[edges])
+        for node_id, node, distance in zip(ids, expected, distances):
+            self.assertEqual(node_id, None if distance > 50 else self.cg.node_ids[node])
+
+if __name__ == '__main__':
+    unittest.main()
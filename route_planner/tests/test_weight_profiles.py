@@ -0,0 +1,168 @@
+# tests/test_weight_profiles.py
+
+import os
+import random
+import tempfile
+import unittest
+
+import networkx as nx
+import numpy as np
+
+from route_planner.benchmark import RouteBenchmark
+from route_planner.compact_graph import CompactGraph
+from route_planner.graph_cache import GraphCache
+from route_planner.graph_handler import GraphHandler
+from route_planner.route_calculator import RouteCalculator
+from route_planner.weight_profiles import (
+    DEFAULT_SPEEDS_KPH, add_default_profiles, edge_attributes, evaluate_expression, parse_maxspeed
+)
+
+def build_tagged_graph(size=8, seed=3):
+    """
+    Grade com tags 'highway' e 'maxspeed' variadas (inclusive ausentes e não numéricas).
+    """
+    rng = random.Random(seed)
+    G = nx.MultiDiGraph(crs='epsg:32723')
+    for i in range(size):
+        for j in range(size):
+            G.add_node(i * size + j, x=i * 100.0, y=j * 100.0)
+    kinds = ['primary', 'residential', ['secondary', 'tertiary'], 'service', None]
+    speeds = ['60', '40 mph', 'BR:urban', None, ['30', '50'], None]
+    for i in range(size):
+        for j in range(size):
+            for di, dj in ((1, 0), (0, 1), (-1, 0), (0, -1)):
+                ni, nj = i + di, j + dj
+                if 0 <= ni < size and 0 <= nj < size:
+                    data = {'length': 100.0 * (1 + rng.random())}
+                    kind, speed = rng.choice(kinds), rng.choice(speeds)
+                    if kind is not None:
+                        data['highway'] = kind
+                    if speed is not None:
+                        data['maxspeed'] = speed
+                    G.add_edge(i * size + j, ni * size + nj, **data)
+    return G
+
+class TestWeightProfiles(unittest.TestCase):
+    def setUp(self):
+        self.G = build_tagged_graph()
+        self.cg = CompactGraph.from_networkx(self.G)
+        add_default_profiles(self.cg, self.G)
+
+    def test_parse_maxspeed(self):
+        self.assertEqual(parse_maxspeed('60'), 60.0)
+        self.assertAlmostEqual(parse_maxspeed('40 mph'), 64.37376)
+        self.assertEqual(parse_maxspeed('50;70'), 60.0)
+        self.assertEqual(parse_maxspeed(('30', 'BR:urban', '50')), 40.0)
+        self.assertIsNone(parse_maxspeed('BR:urban'))
+        self.assertIsNone(parse_maxspeed(None))
+
+    def test_travel_time_follows_compact_edge_order(self):
+        # Tempo de percurso de cada aresta calculado diretamente a partir das tags
+        for u, v, data in self.G.edges(data=True):
+            speed = parse_maxspeed(tuple(data['maxspeed']) if isinstance(data.get('maxspeed'), list)
+                                   else data.get('maxspeed'))
+            if speed is None:
+                kind = data.get('highway', '')
+                kind = kind[0] if isinstance(kind, list) else kind
+                speed = DEFAULT_SPEEDS_KPH.get(kind, 30)
+            data['travel_time'] = data['length'] / (speed / 3.6)
+        for source in (0, 27, 63):
+            expected = nx.single_source_dijkstra_path_length(self.G, source, weight='travel_time')
+            calculator = RouteCalculator(self.G, source, list(expected), compact_graph=self.cg, weight='travel_time')
+            for dist, pos in calculator.nearest_destinations():
+                self.assertAlmostEqual(dist, expected[calculator.destination_nodes[pos]], places=6)
+
+    def test_fallback_compact_graph_has_default_profiles(self):
+        calculator = RouteCalculator(self.G, 0, list(self.G.nodes)[5::6], engine='networkx')
+        self.assertIsNone(calculator.compact_graph)
+        self.assertTrue(calculator.nearest_destinations(k=2))
+        self.assertIn('travel_time', calculator.compact_graph.weights)
+
+        calculator = RouteCalculator(self.G, 0, list(self.G.nodes)[5::6], engine='networkx')
+        matrix = calculator.distance_matrix(strategy='one_to_many')
+        self.assertEqual(matrix.distances.shape, (1, len(calculator.destination_nodes)))
+        self.assertIn('travel_time', calculator.compact_graph.weights)
+
+    def test_all_algorithms_use_profile(self):
+        self.cg.set_weights('custom', evaluate_expression(
+            "travel_time + 20 * (highway == 'residential') + where(speed_kph > 50, 0, 5)", edge_attributes(self.G)
+        ))
+        # Arestas na ordem do CompactGraph: ordenação estável pelo nó de origem
+        edges = sorted(self.G.edges(keys=True), key=lambda edge: edge[0])
+        for (u, v, key), w in zip(edges, self.cg.edge_weights('custom')):
+            self.G.edges[u, v, key]['custom'] = w
+
+        targets = list(self.G.nodes)[5::6]
+        expected = nx.single_source_dijkstra_path_length(self.G, 0, weight='custom')
+        calculator = RouteCalculator(self.G, 0, targets, compact_graph=self.cg, weight='custom')
+        algorithms = list(RouteCalculator.COMPACT_ALGORITHMS)
+        calculator.calculate_routes(algorithms)
+        for alg in algorithms:
+            self.assertEqual(len(calculator.routes[alg]), len(targets), msg=alg)
+            for target, route in zip(targets, calculator.routes[alg]):
+                cost = self.cg.path_length([self.cg.index_of(node) for node in route], 'custom')
+                self.assertAlmostEqual(cost, expected[target], places=6, msg=alg)
+        self.assertEqual(calculator.contraction_hierarchy.weight, 'custom')
+        self.assertEqual(calculator.landmark_heuristic.weight, 'custom')
+
+    def test_expression_validation(self):
+        attributes = edge_attributes(self.G)
+        self.assertTrue(np.allclose(evaluate_expression("length if highway in ('primary',) else 2 * length",
+                                                        attributes)[attributes['highway'] == 'primary'],
+                                    attributes['length'][attributes['highway'] == 'primary']))
+        for expression in ("length - 1000", "__import__('os')", "length.real", "unknown * 2", "length +"):
+            with self.assertRaises(ValueError, msg=expression):
+                evaluate_expression(expression, attributes)
+        self.assertLess(evaluate_expression("length - 1000", attributes, allow_negative=True).min(), 0)
+        with self.assertRaises(ValueError):
+            evaluate_expression("length / 0", attributes, allow_negative=True)
+
+    def test_negative_profile_only_for_bellman_ford(self):
+        # Bônus nas arestas para leste, sem ciclos negativos: todo ciclo volta para oeste
+        # tantas vezes quanto vai para leste, e cada aresta para oeste custa ao menos 100
+        eastward = self.cg.x[self.cg.indices] > self.cg.x[self.cg.edge_sources()]
+        self.cg.set_weights('bonus', self.cg.edge_weights() - 150 * eastward)
+        self.assertTrue(self.cg.has_negative_weights('bonus'))
+        self.assertFalse(self.cg.has_negative_weights('length'))
+
+        targets = list(self.G.nodes)[5::6]
+        calculator = RouteCalculator(self.G, 0, targets, compact_graph=self.cg, weight='bonus')
+        with self.assertRaises(ValueError):
+            calculator.calculate_routes(['bellman_ford', 'dijkstra'])
+        with self.assertRaises(ValueError):
+            calculator.nearest_destinations()
+        calculator.calculate_routes(['bellman_ford'])
+        self.assertEqual(len(calculator.routes['bellman_ford']), len(targets))
+
+    def test_benchmark_skips_negative_cycles(self):
+        self.cg.set_weights('cycles', self.cg.edge_weights() - 1000)
+        targets = list(self.G.nodes)[5::6]
+        calculator = RouteCalculator(self.G, 0, targets, compact_graph=self.cg, weight='cycles')
+        benchmark = RouteBenchmark(calculator, repetitions=2, warmup=0)
+        self.assertIsNone(benchmark.measure('bellman_ford', targets[0]))
+        self.assertEqual(benchmark.run(['bellman_ford']), [])
+
+    def test_graph_handler_caches_custom_profile(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            handler = GraphHandler((-22.9, -43.2), 500, cache=GraphCache(os.path.join(tmp, 'grafos')))
+            handler.G_projected, handler.compact_graph = self.G, self.cg
+            profile = handler.weight_profile('lento', "travel_time * 2")
+            self.assertIn('lento', self.cg.weights)
+            np.testing.assert_allclose(self.cg.edge_weights('lento'), 2 * self.cg.edge_weights('travel_time'))
+
+            # Segunda chamada: lida do cache, sem avaliar a expressão
+            other = CompactGraph.from_networkx(self.G)
+            handler.compact_graph, handler.G_projected = other, None
+            handler.weight_profile('lento', "travel_time * 2")
+            np.testing.assert_array_equal(other.edge_weights('lento'), profile.values)
+
+            handler.compact_graph, handler.G_projected = self.cg, self.G
+            with self.assertRaises(ValueError):
+                handler.weight_profile('bonus', "length - 1000")
+            handler.weight_profile('bonus', "length - 1000", allow_negative=True)
+            # Já no cache, mas ainda rejeitado sem 'allow_negative'
+            with self.assertRaises(ValueError):
+                handler.weight_profile('bonus', "length - 1000")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,6 @@
 # route_planner/utils.py
 
 import time
-import tkinter as tk
 
 def timed(func):
     """
@@ -44,6 +43,8 @@ class RedirectText(object):
         Args:
             string (str): A cadeia de caracteres a ser anexada.
         """
+        # Importado aqui para que os módulos sem interface (ex.: 'timed') não carreguem o Tkinter
+        import tkinter as tk
         self.text_widget.insert(tk.END, string)
         self.text_widget.see(tk.END)  # Rolar para o final
 
@@ -0,0 +1,297 @@
+# route_planner/weight_profiles.py
+
+import ast
+import math
+import re
+from functools import lru_cache
+
+import numpy as np
+
+# Perfis de peso das arestas. Cada perfil é um vetor de custos alinhado com as arestas
+# do CompactGraph (ver CompactGraph.weights), calculado uma única vez por grafo a partir
+# dos atributos do OSM e guardado junto com ele no cache. As consultas apenas escolhem
+# o vetor pelo nome, sem consultar as tags das arestas.
+
+# Velocidades de fluxo livre (km/h) por tipo de via quando a aresta não tem 'maxspeed',
+# próximas dos limites do CTB (art. 61) para cada classe de via
+DEFAULT_SPEEDS_KPH = {
+    'motorway': 80,
+    'motorway_link': 60,
+    'trunk': 80,
+    'trunk_link': 50,
+    'primary': 60,
+    'primary_link': 40,
+    'secondary': 40,
+    'secondary_link': 40,
+    'tertiary': 40,
+    'tertiary_link': 30,
+    'unclassified': 30,
+    'residential': 30,
+    'living_street': 10,
+    'service': 20,
+    'road': 30,
+    'track': 15,
+}
+FALLBACK_SPEED_KPH = 30
+
+# Perfis calculados para todo grafo compacto construído (além de 'length')
+DEFAULT_PROFILES = ('travel_time',)
+
+# Funções disponíveis nas expressões de custo
+EXPRESSION_FUNCTIONS = {
+    'min': np.minimum,
+    'max': np.maximum,
+    'where': np.where,
+    'abs': np.abs,
+    'sqrt': np.sqrt,
+    'log1p': np.log1p,
+}
+
+_BINARY_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+    ast.Pow: np.power,
+}
+_COMPARISONS = {
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+}
+
+@lru_cache(maxsize=None)
+def parse_maxspeed(value):
+    """
+    Converte o valor da tag 'maxspeed' do OSM para km/h.
+
+    Aceita números ('60'), unidades ('40 mph'), listas de valores ('50;60') e listas do
+    OSMnx após a simplificação (média dos valores válidos).
+
+    Returns:
+        float or None: Velocidade em km/h, ou None se o valor não for numérico
+        (ex.: 'BR:urban', 'signals').
+    """
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        speeds = [speed for speed in (parse_maxspeed(item) for item in value) if speed is not None]
+        return sum(speeds) / len(speeds) if speeds else None
+    if isinstance(value, (int, float)):
+        return float(value) if value > 0 and not math.isnan(value) else None
+    speeds = []
+    for part in str(value).split(';'):
+        match = re.match(r'\s*(\d+(?:[.,]\d+)?)\s*(mph|km/h|kmh|kph)?\s*$', part, re.IGNORECASE)
+        if match:
+            speed = float(match.group(1).replace(',', '.'))
+            if match.group(2) and match.group(2).lower() == 'mph':
+                speed *= 1.609344
+            if speed > 0:
+                speeds.append(speed)
+    return sum(speeds) / len(speeds) if speeds else None
+
+def _first_tag(value):
+    # Arestas simplificadas pelo OSMnx podem trazer listas de valores
+    if isinstance(value, (list, tuple)):
+        return str(value[0]) if value else ''
+    return '' if value is None else str(value)
+
+def _hashable(value):
+    return tuple(value) if isinstance(value, list) else value
+
+def edge_records(G):
+    """
+    Retorna os atributos das arestas na ordem da estrutura direta do CompactGraph
+    construído a partir de G (ver CompactGraph.from_networkx).
+    """
+    node_index = {node: idx for idx, node in enumerate(G.nodes)}
+    records = [data for _, _, data in G.edges(data=True)]
+    tails = np.fromiter((node_index[u] for u, _ in G.edges()), dtype=np.int64, count=len(records))
+    return [records[pos] for pos in np.argsort(tails, kind='stable').tolist()]
+
+def edge_attributes(G):
+    """
+    Vetores de atributos das arestas, na ordem do CompactGraph, disponíveis nas expressões
+    de custo:
+
+        length: comprimento (m).
+        speed_kph: velocidade de fluxo livre (km/h), de 'maxspeed' ou do tipo de via.
+        travel_time: tempo de percurso em fluxo livre (s).
+        highway: tipo de via (primeiro valor da tag).
+
+    Args:
+        G (networkx.MultiDiGraph): Grafo projetado.
+
+    Returns:
+        dict: Nome -> numpy.ndarray.
+    """
+    records = edge_records(G)
+    count = len(records)
+    length = np.fromiter((data.get('length', 1) for data in records), dtype=np.float64, count=count)
+    highway = np.array([_first_tag(data.get('highway')) for data in records], dtype=str)
+    maxspeed = np.fromiter(
+        (parse_maxspeed(_hashable(data.get('maxspeed'))) or np.nan for data in records),
+        dtype=np.float64, count=count
+    )
+    # Velocidade padrão calculada uma vez por tipo de via, não por aresta
+    kinds, inverse = np.unique(highway, return_inverse=True)
+    defaults = np.array([DEFAULT_SPEEDS_KPH.get(kind, FALLBACK_SPEED_KPH) for kind in kinds], dtype=np.float64)
+    speed = np.where(np.isnan(maxspeed), defaults[inverse], maxspeed)
+    return {
+        'length': length,
+        'speed_kph': speed,
+        'travel_time': length / (speed / 3.6),
+        'highway': highway,
+    }
+
+def evaluate_expression(expression, attributes, allow_negative=False):
+    """
+    Avalia uma expressão de custo sobre os vetores de atributos das arestas, de forma
+    vetorizada. São aceitos apenas números, textos, os nomes de 'attributes', operadores
+    aritméticos e de comparação, 'and'/'or'/'not', 'in' com listas de constantes, a
+    expressão condicional 'a if cond else b' e as funções de EXPRESSION_FUNCTIONS.
+
+    Exemplo: "travel_time + 15 * (highway == 'residential')".
+
+    Custos negativos (ex.: bônus por trechos preferidos) só são aceitos com
+    'allow_negative', e apenas o Bellman-Ford os suporta (ver RouteCalculator).
+
+    Args:
+        expression (str): Expressão de custo.
+        attributes (dict): Vetores de atributos (ver 'edge_attributes').
+        allow_negative (bool): Aceitar custos negativos.
+
+    Returns:
+        numpy.ndarray: Custo de cada aresta.
+
+    Raises:
+        ValueError: Se a expressão for inválida ou produzir custos não finitos (ou
+            negativos, sem 'allow_negative').
+    """
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Expressão de custo inválida: {e}") from e
+    count = len(attributes['length'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.broadcast_to(np.asarray(_evaluate(tree.body, attributes), dtype=np.float64), (count,))
+    if not np.all(np.isfinite(values)):
+        raise ValueError(f"A expressão '{expression}' produziu custos não finitos.")
+    if not allow_negative and np.any(values < 0):
+        raise ValueError(f"A expressão '{expression}' produziu custos negativos.")
+    return np.ascontiguousarray(values)
+
+def _evaluate(node, attributes):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str, bool)):
+        return node.value
+    if isinstance(node, ast.Name):
+        if node.id not in attributes:
+            raise ValueError(f"Atributo desconhecido na expressão de custo: '{node.id}'.")
+        return attributes[node.id]
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        return _BINARY_OPERATORS[type(node.op)](_evaluate(node.left, attributes), _evaluate(node.right, attributes))
+    if isinstance(node, ast.UnaryOp):
+        operand = _evaluate(node.operand, attributes)
+        if isinstance(node.op, ast.USub):
+            return np.negative(operand)
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        if isinstance(node.op, ast.Not):
+            return np.logical_not(operand)
+    if isinstance(node, ast.BoolOp):
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        result = _evaluate(node.values[0], attributes)
+        for value in node.values[1:]:
+            result = combine(result, _evaluate(value, attributes))
+        return result
+    if isinstance(node, ast.Compare):
+        result = True
+        left = _evaluate(node.left, attributes)
+        for op, comparator in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)) and isinstance(comparator, (ast.List, ast.Tuple, ast.Set)):
+                right = [_evaluate(item, attributes) for item in comparator.elts]
+                current = np.isin(left, right, invert=isinstance(op, ast.NotIn))
+            elif type(op) in _COMPARISONS:
+                right = _evaluate(comparator, attributes)
+                current = _COMPARISONS[type(op)](left, right)
+            else:
+                raise ValueError(f"Operador não suportado na expressão de custo: {type(op).__name__}.")
+            result = np.logical_and(result, current)
+            left = right
+        return result
+    if isinstance(node, ast.IfExp):
+        return np.where(_evaluate(node.test, attributes), _evaluate(node.body, attributes),
+                        _evaluate(node.orelse, attributes))
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        if node.func.id not in EXPRESSION_FUNCTIONS:
+            raise ValueError(f"Função não suportada na expressão de custo: '{node.func.id}'.")
+        return EXPRESSION_FUNCTIONS[node.func.id](*(_evaluate(arg, attributes) for arg in node.args))
+    raise ValueError(f"Construção não suportada na expressão de custo: {type(node).__name__}.")
+
+class WeightProfile:
+    """
+    Perfil de peso personalizado, definido por uma expressão de custo, com persistência
+    em .npz ao lado do grafo (ver GraphHandler.weight_profile).
+
+    Args:
+        name (str): Nome do perfil (usado como 'weight' nos algoritmos).
+        values (numpy.ndarray): Custo de cada aresta, na ordem do CompactGraph.
+        expression (str): Expressão que originou os custos.
+    """
+    def __init__(self, name, values, expression=None):
+        self.name = name
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.expression = expression
+
+    @classmethod
+    def from_expression(cls, name, expression, attributes, allow_negative=False):
+        """
+        Calcula o perfil avaliando a expressão sobre os atributos das arestas.
+        """
+        return cls(name, evaluate_expression(expression, attributes, allow_negative), expression=expression)
+
+    def attach(self, cg):
+        """
+        Registra o perfil no grafo compacto, tornando-o disponível para os algoritmos.
+        """
+        cg.set_weights(self.name, self.values)
+        return self
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez(f, values=self.values, name=np.array(self.name), expression=np.array(self.expression or ''))
+
+    @classmethod
+    def load(cls, cg, path):
+        """
+        Carrega um perfil salvo com 'save'.
+
+        Raises:
+            ValueError: Se o perfil foi calculado para outro grafo.
+        """
+        with np.load(path) as data:
+            profile = cls(str(data['name']), data['values'], expression=str(data['expression']) or None)
+        if len(profile.values) != cg.number_of_edges():
+            raise ValueError("O perfil de peso não corresponde ao grafo compacto.")
+        return profile
+
+def add_default_profiles(cg, G):
+    """
+    Calcula e registra no grafo compacto os perfis de DEFAULT_PROFILES ausentes.
+
+    Args:
+        cg (CompactGraph): Grafo compacto construído a partir de G.
+        G (networkx.MultiDiGraph): Grafo projetado com os atributos do OSM.
+
+    Returns:
+        list: Nomes dos perfis adicionados.
+    """
+    missing = [name for name in DEFAULT_PROFILES if name not in cg.weights]
+    if missing:
+        attributes = edge_attributes(G)
+        for name in missing:
+            cg.set_weights(name, attributes[name])
+    return missing